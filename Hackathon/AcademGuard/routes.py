@@ -312,6 +312,12 @@ def update_verification_request(request_id):
             student_id = result['student_id']
             # Update the user's verification status
             cur.execute('UPDATE user SET verified = 1 WHERE id = %s', (student_id,))
+            # Tell the face recognition service to (re)load this student's photo
+            try:
+                cur.execute('INSERT INTO face_gallery_changes (student_id) VALUES (%s)', (student_id,))
+            except Exception as e:
+                # Table not created yet by the face service: it loads everyone on start
+                print(f"[WARN] Could not record gallery change: {e}", file=sys.stderr)
     
     mysql.connection.commit()
     cur.close()
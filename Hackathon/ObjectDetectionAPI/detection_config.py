@@ -0,0 +1,82 @@
+"""
+Per-client object detection settings, applied from the client's config events
+
+Shared by the object service (flaskws.py) and the proctoring service's
+object analyzer, so both accept the same config keys and read the same
+environment variables.
+"""
+import os
+from preprocessing import FramePreprocessor
+from object_events import ObjectEventTracker
+
+def inference_size_from_env():
+    """
+    Default shorter side frames are downscaled to before detection (INFERENCE_SIZE)
+
+    None, the default, keeps frames as sent: downscaling speeds up detection
+    but loses small objects, so clients opt in with their config event or
+    the server with INFERENCE_SIZE=320 (the model input).
+    """
+    return int(os.environ.get('INFERENCE_SIZE', 0)) or None
+
+def event_options_from_env():
+    """
+    ObjectEventTracker settings from the environment
+
+    Objects are reported as appeared / disappeared events once they have
+    been seen (or missed) for a while.
+    """
+    return {
+        "enter_score": float(os.environ.get('OBJECT_ENTER_SCORE', 0.6)),
+        "exit_score": float(os.environ.get('OBJECT_EXIT_SCORE', 0.5)),
+        "min_duration": float(os.environ.get('OBJECT_MIN_DURATION', 1.0)),
+        "missing_duration": float(os.environ.get('OBJECT_MISSING_DURATION', 2.0))
+    }
+
+def new_detection_config(inference_size=None, event_options=None):
+    """
+    Settings of a client before its first config event
+
+    Args:
+        inference_size (int): Default shorter side of the detection input,
+            None to keep the frame resolution
+        event_options (dict): ObjectEventTracker keyword arguments
+
+    Returns:
+        dict: Excluded categories, preprocessor, object event tracker and
+            whether per-frame detections are sent
+    """
+    return {"exclude_categories": [], "preprocessor": FramePreprocessor(inference_size),
+            "events": ObjectEventTracker(**(event_options or {})), "per_frame": False}
+
+def apply_detection_config(config, data):
+    """
+    Apply a client's config event; settings it does not mention are kept
+
+    Config keys:
+        exclude_categories: Categories never reported, an empty list clears
+            the filter for this client only
+        roi: Region of interest as (x, y, width, height) fractions of the
+            frame, null for the whole frame
+        inference_size: Shorter side of the detection input, 0 keeps the
+            sent resolution
+        per_frame: Also send the detections and annotated image of every frame
+
+    Raises:
+        TypeError, ValueError: Invalid roi or inference_size, in which case
+            nothing is changed
+
+    Returns:
+        dict: The client's settings, to echo back
+    """
+    preprocessor = config["preprocessor"]
+    if "roi" in data or "inference_size" in data:
+        preprocessor = FramePreprocessor(data.get("inference_size", preprocessor.inference_size) or None,
+                                         data.get("roi", preprocessor.roi))
+    config["preprocessor"] = preprocessor
+    if "exclude_categories" in data:
+        config["exclude_categories"] = [cat.lower() for cat in data["exclude_categories"]]
+    if "per_frame" in data:
+        config["per_frame"] = bool(data["per_frame"])
+    return {"exclude_categories": config["exclude_categories"], "roi": preprocessor.roi,
+            "inference_size": preprocessor.inference_size, "per_frame": config["per_frame"]}
@@ -1,42 +1,80 @@
+import os
+import sys
+import time
+import queue
 import base64
 import cv2
 import numpy as np
-import socketio
 import eventlet
+from eventlet import tpool
 import logging
-from flask import Flask
-from objectDetection import ObjectDetector
+from objectDetection import ObjectDetector, DetectorPool, RUNNING_MODES, download_model
+from detection_config import (inference_size_from_env, event_options_from_env, new_detection_config,
+                              apply_detection_config)
+
+# The pre-fork server package sits next to the services
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from prefork import service_app
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, 
                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("ObjectDetectionWebSocket")
 
-sio = socketio.Server(cors_allowed_origins="*")
-app = Flask(__name__)
-app.wsgi_app = socketio.WSGIApp(sio, app.wsgi_app)
+# Served alone or by the pre-fork server: python -m prefork objects
+WORKER, sio, app = service_app(__name__)
+
+DETECTOR_OPTIONS = {
+    "model_path": 'efficientdet_lite0.tflite',
+    "score_threshold": 0.5,
+    "max_results": 5,
+    "exclude_categories": None
+}
+
+# 'image': each frame event waits for its detection on a pooled detector
+# 'live_stream': frames are submitted to a per-client MediaPipe live stream
+# detector and answered from its result callback, so decoding the next
+# frame overlaps inference and frames arriving while busy are dropped
+DETECTOR_MODE = os.environ.get('DETECTOR_MODE', 'image')
+if DETECTOR_MODE not in RUNNING_MODES:
+    raise ValueError(f"DETECTOR_MODE must be one of {list(RUNNING_MODES)}, got {DETECTOR_MODE!r}")
+
+# The object detectors, one per frame processed in parallel (created by start_worker)
+detector_pool = None
+
+INFERENCE_SIZE = inference_size_from_env()
+# Clients receive object events, and opt in to per-frame results and images
+EVENT_OPTIONS = event_options_from_env()
 
-# Initialize object detector
-detector = ObjectDetector(
-    model_path='efficientdet_lite0.tflite',
-    score_threshold=0.5,
-    max_results=5,
-    exclude_categories=None  # Will be updated based on client request
-)
+# Excluded categories, preprocessing and object events of each client, set
+# through the config event
+client_configs = {}
+
+def new_client_config():
+    return new_detection_config(INFERENCE_SIZE, EVENT_OPTIONS)
+
+# Live stream detectors by client, and the results their callbacks produce
+live_detectors = {}
+live_results = queue.Queue()
 
 @sio.on('connect')
 def connect(sid, environ):
+    client_configs[sid] = new_client_config()
+    if DETECTOR_MODE == 'live_stream':
+        # Loaded before the client's first frame rather than on it
+        open_live_detector(sid)
     logger.info(f"Client connected: {sid}")
 
 @sio.on('config')
 def handle_config(sid, data):
-    exclude_list = data.get("exclude_categories", [])
-    if exclude_list:
-        # Update detector with excluded categories
-        detector.exclude_categories = [cat.lower() for cat in exclude_list]
-        logger.info(f"Updated excluded categories: {detector.exclude_categories}")
-    
-    return {"status": "success", "excluded": detector.exclude_categories}
+    config = client_configs.setdefault(sid, new_client_config())
+    try:
+        settings = apply_detection_config(config, data)
+    except (TypeError, ValueError) as e:
+        return {"status": "error", "message": str(e)}
+    logger.info(f"Updated settings for {sid}: {settings}")
+    excluded = settings.pop("exclude_categories")
+    return {"status": "success", "excluded": excluded, **settings}
 
 @sio.on('frame')
 def handle_frame(sid, data):
@@ -44,13 +82,41 @@ def handle_frame(sid, data):
     img_bytes = base64.b64decode(img_data)
     np_arr = np.frombuffer(img_bytes, np.uint8)
     frame = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
+    received_at = time.time()
     
-    # Process frame using object detector
-    processed_frame = detector.detect_objects(frame)
+    config = client_configs.get(sid) or new_client_config()
+    excluded = config["exclude_categories"]
     
-    # Get detected objects from detector
-    detected_objects = detector.last_detections
+    if DETECTOR_MODE == 'live_stream':
+        detector = live_detectors.get(sid)
+        if detector is None:
+            # Disconnected, or still connecting: never create one here, it
+            # would outlive the client
+            logger.debug(f"Dropping a frame from {sid}: no live detector")
+            return
+        # Returns at once, the response is sent by emit_live_results
+        detector.submit(
+            frame, lambda frame, detected: live_results.put((sid, frame, detected, excluded, received_at)),
+            excluded, config["preprocessor"])
+        return
     
+    # Process frame on an idle detector, in a native thread so other
+    # clients' frames keep being served meanwhile
+    detected_objects = tpool.execute(detector_pool.detect, frame, excluded, config["preprocessor"])
+    publish(sid, frame, detected_objects, excluded, received_at)
+
+def publish(sid, frame, detected_objects, excluded, received_at):
+    """Send a client the object events its frame completed, and the frame itself if it opted in"""
+    config = client_configs.get(sid)
+    if config is None:
+        return
+    events = config["events"].update(detected_objects, received_at)
+    if events:
+        sio.emit("objects", {"events": events, "present": config["events"].present}, to=sid)
+    if config["per_frame"]:
+        send_response(sid, ObjectDetector.draw_detections(frame, detected_objects), detected_objects, excluded)
+
+def send_response(sid, processed_frame, detected_objects, excluded):
     # Encode frame to send back
     _, buffer = cv2.imencode('.jpg', processed_frame)
     jpg_as_text = base64.b64encode(buffer).decode('utf-8')
@@ -59,11 +125,47 @@ def handle_frame(sid, data):
     sio.emit("response", {
         "image": "data:image/jpeg;base64," + jpg_as_text, 
         "detected": detected_objects,
-        "excluded": detector.exclude_categories
+        "excluded": excluded
     }, to=sid)
 
+def open_live_detector(sid):
+    """Create the live stream detector of a connecting client"""
+    # Loading the MediaPipe graph takes a while: in a native thread, so
+    # the other clients keep being served meanwhile
+    detector = tpool.execute(ObjectDetector, running_mode='live_stream', **DETECTOR_OPTIONS)
+    if sid not in client_configs:
+        # The client disconnected while its detector was loading
+        tpool.execute(detector.close)
+        return
+    live_detectors[sid] = detector
+
+def next_live_result():
+    # Bounded wait so the thread pool can still be shut down
+    try:
+        return live_results.get(timeout=1.0)
+    except queue.Empty:
+        return None
+
+def emit_live_results():
+    """Answer live stream frames as MediaPipe's callbacks deliver them"""
+    while True:
+        # Results come from MediaPipe's threads: wait for them in a native thread
+        result = tpool.execute(next_live_result)
+        if result is None:
+            continue
+        publish(*result)
+
 @sio.on('disconnect')
 def disconnect(sid):
+    config = client_configs.pop(sid, None)
+    if config is not None:
+        events = config["events"]
+        events.close()
+        logger.info(f"Object events for {sid}: {events.events} events over {events.frames} frames")
+    detector = live_detectors.pop(sid, None)
+    if detector is not None:
+        tpool.execute(detector.close)
+        logger.info(f"Live stream for {sid}: {detector.completed} frames answered, {detector.dropped} dropped")
     logger.info(f"Client disconnected: {sid}")
 
 # Add a route to serve a simple test client
@@ -118,7 +220,8 @@ def index():
         </div>
         
         <script>
-            const socket = io.connect(window.location.origin);
+            // Websocket only, as required by a server with several workers (python -m prefork)
+            const socket = io.connect(window.location.origin, { transports: ["websocket"] });
             const video = document.getElementById('videoElement');
             const canvas = document.getElementById('canvasElement');
             const context = canvas.getContext('2d');
@@ -165,6 +268,7 @@ def index():
                 }
                 
                 socket.emit('config', {
+                    per_frame: true,
                     exclude_categories: excludeCategories
                 });
             }
@@ -214,6 +318,25 @@ def index():
     </html>
     """
 
+def warm_up():
+    """
+    Pre-fork server hook: fetch the model once for all workers
+
+    MediaPipe graphs start their own threads, which a forked worker would
+    not have, so the detectors themselves are created by each worker.
+    """
+    download_model(DETECTOR_OPTIONS["model_path"])
+
+def start_worker():
+    """Create and warm up the detectors of a serving process (__main__ or a pre-forked worker)"""
+    global detector_pool
+    if DETECTOR_MODE == 'live_stream':
+        sio.start_background_task(emit_live_results)
+        return
+    detector_pool = DetectorPool(size=WORKER.pool_size('DETECTOR_POOL_SIZE'), **DETECTOR_OPTIONS)
+    detector_pool.warm_up()
+
 if __name__ == '__main__':
+    start_worker()
     print("Object Detection WebSocket Server running on port 5000")
     eventlet.wsgi.server(eventlet.listen(('', 5000)), app)
@@ -0,0 +1,545 @@
+#!/usr/bin/env python
+"""
+Face recognition on several RTSP cameras or video files at once
+
+Each source is read by its own RTSPCamera thread into one bounded frame
+queue. A single FaceProcessorThread takes whatever frames are waiting (up
+to batch_size, from any camera), recognizes the faces of all of them with
+one FaceNet pass and puts the annotated frames on a bounded result queue,
+which the DisplayThread shows (or hands to a callback when headless).
+When the processor falls behind, each camera applies its drop policy:
+  - drop_oldest: evict the oldest waiting frame to make room (live cameras)
+  - drop_newest: skip the new frame
+  - block: wait for room, nothing is lost (video files read offline)
+
+Usage:
+    python multi_camera_system.py rtsp://192.168.1.10/stream exam_room.mp4 [--headless]
+"""
+import os
+import sys
+import json
+import time
+import queue
+import logging
+import argparse
+import threading
+from collections import namedtuple
+import cv2
+
+logger = logging.getLogger(__name__)
+
+# The face recognizer lives in the face service, loaded with the first frame
+FACE_SERVICE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'RFAPI_DB')
+
+DROP_POLICIES = {'drop_oldest', 'drop_newest', 'block'}
+
+# A captured frame; timestamp is time.time() at capture
+CameraFrame = namedtuple('CameraFrame', ['camera_id', 'name', 'index', 'timestamp', 'frame'])
+
+def put_dropping_oldest(target, item):
+    """
+    Put an item without blocking, evicting the oldest items while the queue is full
+
+    Returns:
+        int: Number of evicted items
+    """
+    evicted = 0
+    while True:
+        try:
+            target.put_nowait(item)
+            return evicted
+        except queue.Full:
+            try:
+                target.get_nowait()
+                target.task_done()
+                evicted += 1
+            except queue.Empty:
+                pass
+
+def drain(target):
+    """Discard everything waiting in a queue, returning the number of items"""
+    count = 0
+    while True:
+        try:
+            target.get_nowait()
+        except queue.Empty:
+            return count
+        target.task_done()
+        count += 1
+
+class RTSPCamera(threading.Thread):
+    """
+    Reads one RTSP stream or video file into the shared frame queue
+
+    Streams are reopened after a failure, waiting reconnect_delay seconds and
+    doubling the wait up to max_reconnect_delay while they stay down. Video
+    files end the thread when they end, unless loop is set.
+    """
+
+    def __init__(self, camera_id, rtsp_url, frame_queue, name=None, drop_policy=None, frame_step=1,
+                 realtime=False, loop=False, reconnect_delay=1.0, max_reconnect_delay=30.0):
+        """
+        Args:
+            camera_id: Identifier of the camera in the results
+            rtsp_url (str): RTSP (or any OpenCV) URL, or the path of a video file
+            frame_queue (queue.Queue): Shared queue of CameraFrame
+            name (str): Display name, defaults to "Camera <camera_id>"
+            drop_policy (str): One of DROP_POLICIES, defaults to block for video
+                files read offline and drop_oldest otherwise
+            frame_step (int): Queue one captured frame out of frame_step
+            realtime (bool): Read video files at their own frame rate, like a camera
+            loop (bool): Restart video files when they end
+            reconnect_delay (float): First wait in seconds before reopening a stream
+            max_reconnect_delay (float): Longest wait between reopening attempts
+        """
+        super().__init__(name=f"RTSPCamera-{camera_id}", daemon=True)
+        self.is_file = os.path.isfile(rtsp_url)
+        if drop_policy is None:
+            drop_policy = 'block' if self.is_file and not realtime else 'drop_oldest'
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"drop_policy must be one of {sorted(DROP_POLICIES)}, got {drop_policy}")
+        if frame_step < 1:
+            raise ValueError(f"frame_step must be at least 1, got {frame_step}")
+
+        self.camera_id = camera_id
+        self.rtsp_url = rtsp_url
+        self.frame_queue = frame_queue
+        self.camera_name = name or f"Camera {camera_id}"
+        self.drop_policy = drop_policy
+        self.frame_step = frame_step
+        self.realtime = realtime
+        self.loop = loop
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+
+        self.connected = False
+        self.captured = 0
+        self.queued = 0
+        self.dropped = 0  # Own frames skipped (drop_newest)
+        self.evicted = 0  # Waiting frames, of any camera, evicted for this one's (drop_oldest)
+        self.reconnects = 0
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        delay = self.reconnect_delay
+        while not self._stop_event.is_set():
+            capture = cv2.VideoCapture(self.rtsp_url)
+            if not capture.isOpened():
+                capture.release()
+                if self.is_file:
+                    logger.error(f"{self.camera_name}: cannot open {self.rtsp_url}")
+                    break
+                logger.warning(f"{self.camera_name}: cannot open stream, retrying in {delay:.0f}s")
+                self.reconnects += 1
+                self._stop_event.wait(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+                continue
+
+            logger.info(f"{self.camera_name}: connected to {self.rtsp_url}")
+            self.connected = True
+            delay = self.reconnect_delay
+            try:
+                self._read(capture)
+            finally:
+                capture.release()
+                self.connected = False
+
+            if self.is_file and not self.loop:
+                logger.info(f"{self.camera_name}: end of {self.rtsp_url}")
+                break
+            if not self.is_file and not self._stop_event.is_set():
+                logger.warning(f"{self.camera_name}: stream lost, reconnecting")
+                self.reconnects += 1
+                self._stop_event.wait(delay)
+
+    def _read(self, capture):
+        """Queue frames until the source ends, fails or the camera is stopped"""
+        period = 1.0 / (capture.get(cv2.CAP_PROP_FPS) or 25.0)
+        next_frame = time.monotonic()
+        while not self._stop_event.is_set():
+            ok, frame = capture.read()
+            if not ok:
+                return
+            self.captured += 1
+            if (self.captured - 1) % self.frame_step == 0:
+                self._enqueue(CameraFrame(self.camera_id, self.camera_name, self.captured, time.time(), frame))
+
+            # Pace video files like the camera that recorded them
+            if self.realtime and self.is_file:
+                next_frame += period
+                self._stop_event.wait(max(0.0, next_frame - time.monotonic()))
+
+    def _enqueue(self, item):
+        if self.drop_policy == 'block':
+            while not self._stop_event.is_set():
+                try:
+                    self.frame_queue.put(item, timeout=0.5)
+                    self.queued += 1
+                    return
+                except queue.Full:
+                    continue
+        elif self.drop_policy == 'drop_newest':
+            try:
+                self.frame_queue.put_nowait(item)
+                self.queued += 1
+            except queue.Full:
+                self.dropped += 1
+        else:
+            self.evicted += put_dropping_oldest(self.frame_queue, item)
+            self.queued += 1
+
+    def stats(self):
+        return {"name": self.camera_name, "url": self.rtsp_url, "connected": self.connected,
+                "captured": self.captured, "queued": self.queued, "dropped": self.dropped,
+                "evicted": self.evicted, "reconnects": self.reconnects}
+
+class FaceProcessorThread(threading.Thread):
+    """
+    Recognizes faces on the queued frames of every camera
+
+    Frames waiting in the queue are taken together, up to batch_size, and
+    their faces embedded in one FaceNet pass (FaceRecognizer.identify_frames).
+    A lone frame is processed at once, batching never waits for frames. The
+    recognizer is created when the first frame arrives, so cameras can
+    connect while the models load.
+    """
+
+    def __init__(self, frame_queue, result_queue, students_dir='students_database', threshold=0.7,
+                 batch_size=4, recognizer=None):
+        """
+        Args:
+            frame_queue (queue.Queue): Queue of CameraFrame filled by the cameras
+            result_queue (queue.Queue): Bounded queue of result dicts, the
+                oldest result is dropped when it is full
+            students_dir (str): Student photos directory of the recognizer
+            threshold (float): Recognition threshold of the recognizer
+            batch_size (int): Most frames recognized together
+            recognizer (FaceRecognizer): Recognizer to use instead of creating one
+        """
+        super().__init__(name="FaceProcessor", daemon=True)
+        if batch_size < 1:
+            raise ValueError(f"batch_size must be at least 1, got {batch_size}")
+        self.frame_queue = frame_queue
+        self.result_queue = result_queue
+        self.students_dir = students_dir
+        self.threshold = threshold
+        self.batch_size = batch_size
+        self.recognizer = recognizer
+        self.load_error = None
+
+        self.batches = 0
+        self.processed = {}  # Camera id -> frames processed
+        self.skipped = 0
+        self.results_dropped = 0
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def load_recognizer(self):
+        """The recognizer, created on first use; None if it failed to load"""
+        if self.recognizer is None and self.load_error is None:
+            try:
+                if FACE_SERVICE_DIR not in sys.path:
+                    sys.path.insert(0, FACE_SERVICE_DIR)
+                from face_recognizer import FaceRecognizer
+                self.recognizer = FaceRecognizer(students_dir=self.students_dir, threshold=self.threshold)
+            except Exception as e:
+                self.load_error = e
+                logger.error(f"Cannot load the face recognizer, frames will be skipped: {e}")
+        return self.recognizer
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                batch = [self.frame_queue.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.frame_queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                self.process(batch)
+            except Exception as e:
+                logger.error(f"Error processing {len(batch)} frames: {e}")
+                self.skipped += len(batch)
+            finally:
+                for _ in batch:
+                    self.frame_queue.task_done()
+
+    def process(self, batch):
+        """Recognize the faces of a batch of CameraFrame and queue the results"""
+        recognizer = self.load_recognizer()
+        if recognizer is None:
+            self.skipped += len(batch)
+            return
+
+        self.batches += 1
+        for item, faces in zip(batch, recognizer.identify_frames([item.frame for item in batch])):
+            result = {
+                "camera_id": item.camera_id,
+                "name": item.name,
+                "index": item.index,
+                "timestamp": item.timestamp,
+                "latency": time.time() - item.timestamp,
+                "faces": faces,
+                "frame": recognizer.draw_results(item.frame, faces)
+            }
+            self.processed[item.camera_id] = self.processed.get(item.camera_id, 0) + 1
+            # The display only needs recent results
+            self.results_dropped += put_dropping_oldest(self.result_queue, result)
+
+    def stats(self):
+        frames = sum(self.processed.values())
+        return {"processed": dict(self.processed), "batches": self.batches,
+                "average_batch": round(frames / self.batches, 2) if self.batches else 0.0,
+                "skipped": self.skipped, "results_dropped": self.results_dropped}
+
+class DisplayThread(threading.Thread):
+    """
+    Shows the latest annotated frame of each camera in its own window
+
+    Windows open with the first result of their camera. Headless (show=False)
+    the results only go to on_result. Pressing q in a window sets quit_requested.
+    """
+
+    def __init__(self, result_queue, show=True, on_result=None):
+        """
+        Args:
+            result_queue (queue.Queue): Results of the FaceProcessorThread
+            show (bool): Display the frames with OpenCV windows
+            on_result: Called with each result dict
+        """
+        super().__init__(name="Display", daemon=True)
+        self.result_queue = result_queue
+        self.show = show
+        self.on_result = on_result
+        self.latest = {}  # Camera id -> last result
+        self.displayed = 0
+        self.quit_requested = threading.Event()
+        self._windows = set()
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        try:
+            while not self._stop_event.is_set():
+                try:
+                    result = self.result_queue.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                try:
+                    self.latest[result["camera_id"]] = result
+                    if self.on_result is not None:
+                        self.on_result(result)
+                    if self.show:
+                        self._display(result)
+                    self.displayed += 1
+                except Exception as e:
+                    logger.error(f"Error displaying a frame of {result['name']}: {e}")
+                finally:
+                    self.result_queue.task_done()
+        finally:
+            if self._windows:
+                cv2.destroyAllWindows()
+
+    def _display(self, result):
+        try:
+            cv2.imshow(result["name"], result["frame"])
+        except cv2.error as e:
+            # OpenCV built without GUI support (e.g. opencv-python-headless)
+            logger.warning(f"Cannot open a window, continuing headless: {e}")
+            self.show = False
+            return
+        self._windows.add(result["name"])
+        if cv2.waitKey(1) & 0xFF == ord('q'):
+            self.quit_requested.set()
+
+class MultiCameraSystem:
+    """
+    Coordinates the cameras, the face processor and the display
+
+    Cameras can be added before or while the system runs. A stopped system
+    cannot be started again, create a new one.
+    """
+
+    def __init__(self, students_dir='students_database', threshold=0.7, queue_size=30, batch_size=4,
+                 display=True, recognizer=None, on_result=None):
+        """
+        Args:
+            students_dir (str): Student photos directory of the recognizer
+            threshold (float): Recognition threshold
+            queue_size (int): Capacity of the frame and result queues
+            batch_size (int): Most frames recognized together
+            display (bool): Show the frames in OpenCV windows
+            recognizer (FaceRecognizer): Recognizer to use instead of creating one
+            on_result: Called with each result dict (see FaceProcessorThread.process)
+        """
+        self.students_dir = students_dir
+        self.threshold = threshold
+        self.batch_size = batch_size
+        self.display = display
+        self.recognizer = recognizer
+        self.on_result = on_result
+
+        self.frame_queue = queue.Queue(maxsize=queue_size)
+        self.result_queue = queue.Queue(maxsize=queue_size)
+        self.running = False
+        self.camera_threads = {}  # Camera id -> RTSPCamera
+        self.processor_thread = None
+        self.display_thread = None
+        self._stopped = False
+
+    def add_camera(self, url, camera_id=None, name=None, **options):
+        """
+        Add an RTSP stream or video file
+
+        Args:
+            url (str): RTSP URL or video file path
+            camera_id: Identifier of the camera, defaults to the smallest unused integer
+            name (str): Display name
+            **options: Other RTSPCamera settings (drop_policy, frame_step, realtime, loop...)
+
+        Returns:
+            The camera id
+        """
+        if camera_id is None:
+            camera_id = 0
+            while camera_id in self.camera_threads:
+                camera_id += 1
+        elif camera_id in self.camera_threads:
+            raise ValueError(f"Camera {camera_id} already exists")
+
+        camera = RTSPCamera(camera_id=camera_id, rtsp_url=url, frame_queue=self.frame_queue, name=name, **options)
+        self.camera_threads[camera_id] = camera
+        if self.running:
+            camera.start()
+        logger.info(f"Added camera {camera_id}: {url}")
+        return camera_id
+
+    def start(self):
+        """
+        Start the processor, the display and every camera
+
+        Returns:
+            bool: Whether the system started
+        """
+        if self.running:
+            logger.warning("System is already running")
+            return False
+        if self._stopped:
+            logger.error("A stopped system cannot be restarted")
+            return False
+        if not self.camera_threads:
+            logger.error("No cameras added")
+            return False
+
+        self.processor_thread = FaceProcessorThread(self.frame_queue, self.result_queue, self.students_dir,
+                                                    self.threshold, self.batch_size, self.recognizer)
+        self.display_thread = DisplayThread(self.result_queue, self.display, self.on_result)
+        self.processor_thread.start()
+        self.display_thread.start()
+        for camera in self.camera_threads.values():
+            camera.start()
+
+        self.running = True
+        logger.info(f"Started {len(self.camera_threads)} cameras")
+        return True
+
+    def wait(self, timeout=None):
+        """
+        Block until every camera has ended (video files) and its frames are processed
+
+        Returns:
+            bool: False if the timeout expired or the user quit first
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.running:
+            if self.display_thread is not None and self.display_thread.quit_requested.is_set():
+                return False
+            cameras_done = not any(camera.is_alive() for camera in self.camera_threads.values())
+            if cameras_done and self.frame_queue.unfinished_tasks == 0 and self.result_queue.unfinished_tasks == 0:
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return False
+
+    def stop(self, timeout=5.0):
+        """Stop every thread and discard the frames and results still queued"""
+        self.running = False
+        self._stopped = True
+        for camera in self.camera_threads.values():
+            camera.stop()
+        for thread in (self.processor_thread, self.display_thread):
+            if thread is not None:
+                thread.stop()
+
+        # A camera may be stuck opening a stream, the threads are daemons
+        for thread in [*self.camera_threads.values(), self.processor_thread, self.display_thread]:
+            if thread is not None and thread.ident is not None:
+                thread.join(timeout)
+                if thread.is_alive():
+                    logger.warning(f"{thread.name} did not stop within {timeout}s")
+
+        discarded = drain(self.frame_queue) + drain(self.result_queue)
+        logger.info(f"System stopped, {discarded} queued frames discarded")
+
+    def stats(self):
+        return {
+            "cameras": {camera_id: camera.stats() for camera_id, camera in self.camera_threads.items()},
+            "processor": self.processor_thread.stats() if self.processor_thread is not None else None,
+            "displayed": self.display_thread.displayed if self.display_thread is not None else 0
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.running:
+            self.stop()
+        return False
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('sources', nargs='+', help="RTSP URLs or video files")
+    parser.add_argument('--students-dir', default='students_database')
+    parser.add_argument('--threshold', type=float, default=0.7)
+    parser.add_argument('--queue-size', type=int, default=30)
+    parser.add_argument('--batch-size', type=int, default=4)
+    parser.add_argument('--frame-step', type=int, default=1, help="Process one frame out of N")
+    parser.add_argument('--realtime', action='store_true', help="Read video files at their frame rate")
+    parser.add_argument('--loop', action='store_true', help="Restart video files when they end")
+    parser.add_argument('--headless', action='store_true', help="Log recognized students instead of showing frames")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    def log_result(result):
+        names = [face["name"] for face in result["faces"] if face["recognized"]]
+        if names:
+            logger.info(f"{result['name']} frame {result['index']}: {', '.join(names)}")
+
+    with MultiCameraSystem(args.students_dir, args.threshold, args.queue_size, args.batch_size,
+                           display=not args.headless, on_result=log_result if args.headless else None) as system:
+        for source in args.sources:
+            system.add_camera(source, frame_step=args.frame_step, realtime=args.realtime, loop=args.loop)
+        if not system.start():
+            sys.exit(1)
+        try:
+            system.wait()
+        except KeyboardInterrupt:
+            pass
+        stats = system.stats()
+    print(json.dumps(stats, indent=2, default=str))
+
+if __name__ == "__main__":
+    main()
@@ -5,12 +5,41 @@ import mediapipe as mp
 from mediapipe.tasks import python
 from mediapipe.tasks.python import vision
 import os
+import time
+import queue
+import threading
 import urllib.request
+from contextlib import contextmanager
+from preprocessing import FramePreprocessor
 
 logger = logging.getLogger(__name__)
 
+RUNNING_MODES = {
+    'image': vision.RunningMode.IMAGE,
+    'live_stream': vision.RunningMode.LIVE_STREAM
+}
+
+MODEL_URL = "https://storage.googleapis.com/mediapipe-models/object_detector/efficientdet_lite0/float32/1/efficientdet_lite0.tflite"
+
+def download_model(model_path):
+    """
+    Download the model to model_path if it doesn't exist yet
+
+    The file is written under a temporary name and renamed once complete, so
+    processes starting together never load a partial model.
+    """
+    if os.path.exists(model_path):
+        logger.info(f"Model already exists at {model_path}")
+        return
+    logger.info(f"Downloading model to {model_path}...")
+    partial = f"{model_path}.{os.getpid()}.part"
+    urllib.request.urlretrieve(MODEL_URL, partial)
+    os.replace(partial, model_path)
+    logger.info("Model downloaded successfully")
+
 class ObjectDetector:
-    def __init__(self, model_path='efficientdet_lite0.tflite', score_threshold=0.5, max_results=5, exclude_categories=None):
+    def __init__(self, model_path='efficientdet_lite0.tflite', score_threshold=0.5, max_results=5, exclude_categories=None,
+                 running_mode='image'):
         """
         Initialize object detector with MediaPipe
         
@@ -18,14 +47,21 @@ class ObjectDetector:
             model_path (str): Path to the detection model
             score_threshold (float): Minimum confidence threshold for detections
             max_results (int): Maximum number of detection results
-            exclude_categories (list): List of category names to exclude from detection results
+            exclude_categories (list): Default list of category names to exclude
+                from detection results (callers can pass their own per call)
+            running_mode (str): 'image' to detect synchronously with detect(),
+                'live_stream' to pipeline frames with submit()
         """
+        if running_mode not in RUNNING_MODES:
+            raise ValueError(f"Unknown running mode {running_mode!r}, expected one of {list(RUNNING_MODES)}")
+
         logger.info("Initializing object detection system...")
         
         # Configuration
         self.model_path = model_path
         self.score_threshold = score_threshold
         self.max_results = max_results
+        self.running_mode = running_mode
         self.exclude_categories = exclude_categories or []
         
         # Convert exclude_categories to lowercase for case-insensitive comparison
@@ -40,92 +76,265 @@ class ObjectDetector:
         base_options = python.BaseOptions(model_asset_path=self.model_path)
         options = vision.ObjectDetectorOptions(
             base_options=base_options,
+            running_mode=RUNNING_MODES[running_mode],
             score_threshold=self.score_threshold,
-            max_results=self.max_results
+            max_results=self.max_results,
+            result_callback=self._on_result if running_mode == 'live_stream' else None
         )
         self.detector = vision.ObjectDetector.create_from_options(options)
         
-        # To store last detections for the web interface
-        self.last_detections = []
+        # Live stream state: frames waiting for their result, by timestamp
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._last_timestamp = 0
+        self.submitted = 0
+        self.completed = 0
+        self.dropped = 0
         
-        logger.info("Object detection system initialized")
+        logger.info(f"Object detection system initialized ({running_mode} mode)")
 
-    def detect_objects(self, frame):
+    def detect(self, frame, exclude_categories=None, preprocessor=None):
         """
-        Perform object detection on a frame
+        Perform object detection on a frame without modifying it
         
         Args:
-            frame: Input frame from camera
+            frame: Input BGR frame from camera
+            exclude_categories (list): Category names to drop from the results,
+                defaults to the detector's exclude_categories
+            preprocessor (FramePreprocessor): Crop and downscale applied before
+                inference, boxes are still in frame coordinates
         
         Returns:
-            Processed frame with detection results
+            list: One dict per detection with its category, score and bbox
         """
-        # Clear previous detections
-        self.last_detections = []
+        excluded = self._excluded(exclude_categories)
+        mp_image, transform = self._to_mp_image(frame, preprocessor)
+        
+        try:
+            # Detect objects
+            detection_result = self.detector.detect(mp_image)
+        except Exception as e:
+            logger.error(f"Error during detection: {e}")
+            return []
+
+        return self._to_detections(detection_result, excluded, transform)
+
+    def _excluded(self, exclude_categories):
+        if exclude_categories is None:
+            return self.exclude_categories
+        return [cat.lower() for cat in exclude_categories]
+
+    def _to_mp_image(self, frame, preprocessor=None):
+        if preprocessor is not None:
+            return preprocessor.to_mp_image(frame)
 
         # Convert the frame to RGB for MediaPipe
         rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
         
         # Create MediaPipe image
-        mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb_frame)
-        
-        try:
-            # Detect objects
-            detection_result = self.detector.detect(mp_image)
+        return mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb_frame), None
+
+    def _to_detections(self, detection_result, excluded, transform=None):
+        """Convert a MediaPipe result to detection dicts, dropping excluded categories"""
+        detections = []
+        for detection in detection_result.detections:
+            # Get bounding box
+            bbox = detection.bounding_box
+            x1 = bbox.origin_x
+            y1 = bbox.origin_y
+            x2 = x1 + bbox.width
+            y2 = y1 + bbox.height
+            
+            # Get category
+            category = detection.categories[0]
+            category_name = category.category_name
+            score = category.score
+            
+            # Exclude specified categories
+            if category_name.lower() in excluded:
+                continue
+            
+            bbox = [x1, y1, x2, y2]
+            if transform is not None:
+                bbox = FramePreprocessor.map_box(bbox, transform)
             
-            # Process and draw results
-            for detection in detection_result.detections:
-                # Get bounding box
-                bbox = detection.bounding_box
-                x1 = bbox.origin_x
-                y1 = bbox.origin_y
-                x2 = x1 + bbox.width
-                y2 = y1 + bbox.height
-                
-                # Get category
-                category = detection.categories[0]
-                category_name = category.category_name
-                score = category.score
-                
-                # Exclude specified categories
-                if category_name.lower() in self.exclude_categories:
-                    continue
-                
-                # Store detection info
-                self.last_detections.append({
-                    "category": category_name,
-                    "score": score,
-                    "bbox": [x1, y1, x2, y2]
-                })
-                
-                # Draw bounding box and label
-                color = (0, 255, 0)  # Green
-                cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-                
-                # Format and display label
-                label = f"{category_name} ({score:.2f})"
-                cv2.putText(frame, label, (x1, y1-10), 
-                          cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
-                
-                logger.debug(f"Detected: {category_name} ({score:.2f})")
+            detections.append({
+                "category": category_name,
+                "score": score,
+                "bbox": bbox
+            })
+            logger.debug(f"Detected: {category_name} ({score:.2f})")
 
-        except Exception as e:
-            logger.error(f"Error during detection: {e}")
+        return detections
+
+    @staticmethod
+    def draw_detections(frame, detections):
+        """
+        Draw detection boxes and labels on a frame (modified in place)
+        
+        Returns:
+            The annotated frame
+        """
+        for detection in detections:
+            x1, y1, x2, y2 = detection["bbox"]
+            
+            # Draw bounding box and label
+            color = (0, 255, 0)  # Green
+            cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+            
+            # Format and display label
+            label = f"{detection['category']} ({detection['score']:.2f})"
+            cv2.putText(frame, label, (x1, y1-10), 
+                      cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
 
         # Add header info
         cv2.putText(frame, "Object Detection", (10, 30), 
                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
 
         return frame
+
+    def detect_objects(self, frame, exclude_categories=None, preprocessor=None):
+        """
+        Perform object detection on a frame and draw the results
+        
+        Nothing is stored on the detector, so concurrent callers never see
+        each other's results or filters.
+        
+        Args:
+            frame: Input frame from camera
+            exclude_categories (list): Category names to drop from the results,
+                defaults to the detector's exclude_categories
+            preprocessor (FramePreprocessor): Crop and downscale applied before
+                inference
+        
+        Returns:
+            tuple: (processed frame with detection results, list of detections)
+        """
+        detections = self.detect(frame, exclude_categories, preprocessor)
+        return self.draw_detections(frame, detections), detections
+
+    def submit(self, frame, callback, exclude_categories=None, preprocessor=None):
+        """
+        Queue a frame for detection in live stream mode and return at once
+        
+        Inference runs on MediaPipe's own thread, so the caller can decode the
+        next frame meanwhile. While a frame is being processed MediaPipe drops
+        newer ones: their callback is never called and they are counted in
+        self.dropped.
+        
+        Args:
+            frame: Input BGR frame, kept (not copied) until its result arrives
+            callback: Called from MediaPipe's thread as callback(frame, detections)
+            exclude_categories (list): Category names to drop from the results,
+                defaults to the detector's exclude_categories
+            preprocessor (FramePreprocessor): Crop and downscale applied before
+                inference
+        
+        Returns:
+            int: Timestamp (ms) the frame was submitted with
+        """
+        if self.running_mode != 'live_stream':
+            raise ValueError("submit() needs a detector in 'live_stream' running mode")
+
+        mp_image, transform = self._to_mp_image(frame, preprocessor)
+        with self._pending_lock:
+            # MediaPipe requires strictly increasing timestamps
+            timestamp = max(int(time.monotonic() * 1000), self._last_timestamp + 1)
+            self._last_timestamp = timestamp
+            self._pending[timestamp] = (frame, callback, self._excluded(exclude_categories), transform)
+            self.submitted += 1
+        try:
+            self.detector.detect_async(mp_image, timestamp)
+        except Exception as e:
+            logger.error(f"Error submitting frame for detection: {e}")
+            with self._pending_lock:
+                self._pending.pop(timestamp, None)
+                self.dropped += 1
+        return timestamp
+
+    def _on_result(self, detection_result, output_image, timestamp_ms):
+        with self._pending_lock:
+            # Frames submitted before this one and still pending were dropped
+            for timestamp in [t for t in self._pending if t < timestamp_ms]:
+                del self._pending[timestamp]
+                self.dropped += 1
+            entry = self._pending.pop(timestamp_ms, None)
+            if entry is not None:
+                self.completed += 1
+        if entry is None:
+            return
+
+        frame, callback, excluded, transform = entry
+        try:
+            callback(frame, self._to_detections(detection_result, excluded, transform))
+        except Exception as e:
+            logger.error(f"Error in detection callback: {e}")
+
+    def close(self):
+        """Release the MediaPipe detector (waits for a frame in flight)"""
+        self.detector.close()
+        with self._pending_lock:
+            self.dropped += len(self._pending)
+            self._pending.clear()
     
     def download_model(self):
         """
         Download the model if it doesn't exist locally
         """
-        if not os.path.exists(self.model_path):
-            logger.info(f"Downloading model to {self.model_path}...")
-            model_url = "https://storage.googleapis.com/mediapipe-models/object_detector/efficientdet_lite0/float32/1/efficientdet_lite0.tflite"
-            urllib.request.urlretrieve(model_url, self.model_path)
-            logger.info("Model downloaded successfully")
-        else:
-            logger.info(f"Model already exists at {self.model_path}")
\ No newline at end of file
+        download_model(self.model_path)
+
+class DetectorPool:
+    """
+    Fixed set of ObjectDetector instances shared by all sessions
+
+    A MediaPipe detector must not run two frames at once, so each call
+    borrows an idle instance and blocks until one is free. Calls made from
+    several threads (e.g. eventlet's thread pool) run in parallel, one per
+    instance.
+    """
+
+    def __init__(self, size=None, **detector_options):
+        """
+        Args:
+            size (int): Number of detector instances, defaults to the CPU count
+            **detector_options: ObjectDetector keyword arguments
+        """
+        self.size = size or os.cpu_count() or 1
+        self._idle = queue.Queue()
+        for _ in range(self.size):
+            self._idle.put(ObjectDetector(**detector_options))
+        logger.info(f"Detector pool ready with {self.size} instances")
+
+    @property
+    def busy(self):
+        return self.size - self._idle.qsize()
+
+    def warm_up(self, frame_size=(480, 640)):
+        """Run one detection on every instance, so no client frame pays for a first inference"""
+        frame = np.zeros((*frame_size, 3), dtype=np.uint8)
+        detectors = [self._idle.get() for _ in range(self.size)]
+        try:
+            for detector in detectors:
+                detector.detect(frame)
+        finally:
+            for detector in detectors:
+                self._idle.put(detector)
+
+    @contextmanager
+    def acquire(self):
+        """Borrow an idle detector for the duration of a with block"""
+        detector = self._idle.get()
+        try:
+            yield detector
+        finally:
+            self._idle.put(detector)
+
+    def detect(self, frame, exclude_categories=None, preprocessor=None):
+        """ObjectDetector.detect on the next idle instance"""
+        with self.acquire() as detector:
+            return detector.detect(frame, exclude_categories, preprocessor)
+
+    def detect_objects(self, frame, exclude_categories=None, preprocessor=None):
+        """ObjectDetector.detect_objects on the next idle instance"""
+        with self.acquire() as detector:
+            return detector.detect_objects(frame, exclude_categories, preprocessor)
@@ -0,0 +1,123 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+class ObjectEventTracker:
+    """
+    Turns per-frame detections of one stream into appeared / disappeared events
+
+    A category must be seen with score >= enter_score for min_duration
+    seconds before it counts as present; the "appeared" event then carries
+    the time it was first seen. Once present, detections down to exit_score
+    keep it present, and it only disappears after missing_duration seconds
+    without one; the "disappeared" event carries the time it was last seen.
+    Short glimpses and single-frame misses therefore produce no events.
+    Thresholds can be overridden per category.
+    """
+
+    def __init__(self, enter_score=0.6, exit_score=0.5, min_duration=1.0, missing_duration=2.0, overrides=None):
+        """
+        Args:
+            enter_score (float): Score a detection needs to start a presence
+            exit_score (float): Score that keeps a present category present
+            min_duration (float): Seconds a category must be seen before it
+                is reported as appeared
+            missing_duration (float): Seconds without a detection before a
+                present category is reported as disappeared
+            overrides (dict): Category name -> dict of the settings above
+        """
+        self.defaults = {"enter_score": enter_score, "exit_score": exit_score,
+                         "min_duration": min_duration, "missing_duration": missing_duration}
+        self.overrides = {category.lower(): settings for category, settings in (overrides or {}).items()}
+        for settings in [self.defaults, *self.overrides.values()]:
+            unknown = set(settings) - set(self.defaults)
+            if unknown:
+                raise ValueError(f"Unknown object event settings: {sorted(unknown)}")
+        # Category -> {"state": "candidate" | "present", "first_seen", "last_seen", "score", "count"}
+        self.tracks = {}
+        self.frames = 0
+        self.events = 0
+
+    def settings(self, category):
+        return {**self.defaults, **self.overrides.get(category, {})}
+
+    @property
+    def present(self):
+        """Categories currently reported as present"""
+        return sorted(category for category, track in self.tracks.items() if track["state"] == "present")
+
+    def update(self, detections, timestamp):
+        """
+        Feed the detections of one analyzed frame
+
+        Args:
+            detections (list): Detection dicts with "category" and "score"
+            timestamp (float): Time of the frame in seconds (e.g. time.time())
+
+        Returns:
+            list: Events this frame completed, oldest first
+        """
+        self.frames += 1
+        seen = {}
+        for detection in detections:
+            category = detection["category"].lower()
+            best, count = seen.get(category, (0.0, 0))
+            seen[category] = (max(best, detection["score"]), count + 1)
+
+        events = []
+        for category, (score, count) in seen.items():
+            settings = self.settings(category)
+            track = self.tracks.get(category)
+            threshold = settings["exit_score"] if track and track["state"] == "present" else settings["enter_score"]
+            if score < threshold:
+                continue
+            if track is None:
+                track = self.tracks[category] = {"state": "candidate", "first_seen": timestamp,
+                                                 "last_seen": timestamp, "score": score, "count": count}
+            else:
+                # Frames may be analyzed slightly out of order
+                track["last_seen"] = max(track["last_seen"], timestamp)
+                track["score"] = max(track["score"], score)
+                track["count"] = max(track["count"], count)
+            if track["state"] == "candidate" and timestamp - track["first_seen"] >= settings["min_duration"]:
+                track["state"] = "present"
+                events.append(self._event("appeared", category, track, track["first_seen"]))
+
+        for category, track in list(self.tracks.items()):
+            if track["last_seen"] == timestamp:
+                continue
+            settings = self.settings(category)
+            if timestamp - track["last_seen"] < settings["missing_duration"]:
+                continue
+            del self.tracks[category]
+            # A candidate was a glimpse shorter than min_duration: no event
+            if track["state"] == "present":
+                events.append(self._event("disappeared", category, track, track["last_seen"]))
+
+        self.events += len(events)
+        return events
+
+    def close(self):
+        """
+        End the stream: every present category disappears at its last sighting
+
+        Returns:
+            list: The disappeared events
+        """
+        events = [self._event("disappeared", category, track, track["last_seen"])
+                  for category, track in self.tracks.items() if track["state"] == "present"]
+        self.tracks.clear()
+        self.events += len(events)
+        return events
+
+    def _event(self, kind, category, track, time):
+        event = {"event": kind, "category": category, "time": time,
+                 "score": round(track["score"], 3), "count": track["count"]}
+        if kind == "disappeared":
+            event["started_at"] = track["first_seen"]
+            event["duration"] = round(track["last_seen"] - track["first_seen"], 3)
+        logger.debug(f"Object {kind}: {category} at {time:.2f}")
+        return event
+
+    def stats(self):
+        return {"frames": self.frames, "events": self.events, "present": self.present}
@@ -0,0 +1,106 @@
+import logging
+import threading
+import cv2
+import mediapipe as mp
+
+logger = logging.getLogger(__name__)
+
+class FramePreprocessor:
+    """
+    Per-session crop, downscale and RGB conversion ahead of detection
+
+    Client frames are often larger than the model input (320x320 for
+    EfficientDet-Lite0) and only part of them, the desk, matters. The frame
+    is cropped to the region of interest, shrunk until its shorter side
+    reaches inference_size (never below, so nothing the model would see is
+    lost), and converted to RGB. The resized and RGB images are written to
+    buffers kept between frames instead of being allocated each time.
+    Detections are mapped back to the coordinates of the original frame.
+    """
+
+    def __init__(self, inference_size=None, roi=None):
+        """
+        Args:
+            inference_size (int): Shorter side of the image given to the model,
+                None to keep the frame resolution
+            roi (tuple): Region of interest (x, y, width, height) as fractions
+                of the frame size, None for the whole frame
+        """
+        if inference_size is not None and inference_size <= 0:
+            raise ValueError(f"inference_size must be positive, got {inference_size}")
+        self.inference_size = inference_size
+        self.roi = self.validate_roi(roi)
+
+        # Buffers reused from frame to frame, reallocated when the size changes
+        self._resized = None
+        self._rgb = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def validate_roi(roi):
+        if roi is None:
+            return None
+        x, y, width, height = (float(v) for v in roi)
+        if not (0 <= x < 1 and 0 <= y < 1 and 0 < width <= 1 - x + 1e-9 and 0 < height <= 1 - y + 1e-9):
+            raise ValueError(f"roi must be (x, y, width, height) fractions inside the frame, got {roi}")
+        return (x, y, width, height)
+
+    def crop_box(self, frame_width, frame_height):
+        """Pixel box (x1, y1, x2, y2) of the region of interest in a frame"""
+        if self.roi is None:
+            return 0, 0, frame_width, frame_height
+        x, y, width, height = self.roi
+        x1, y1 = int(x * frame_width), int(y * frame_height)
+        x2 = max(x1 + 1, min(frame_width, round((x + width) * frame_width)))
+        y2 = max(y1 + 1, min(frame_height, round((y + height) * frame_height)))
+        return x1, y1, x2, y2
+
+    def target_size(self, width, height):
+        """Size (width, height) a crop is resized to"""
+        if self.inference_size is None:
+            return width, height
+        scale = self.inference_size / min(width, height)
+        if scale >= 1:
+            return width, height
+        return max(1, round(width * scale)), max(1, round(height * scale))
+
+    @staticmethod
+    def _buffer(buffer, shape):
+        if buffer is None or buffer.shape != shape:
+            return None
+        return buffer
+
+    def to_mp_image(self, frame):
+        """
+        Preprocess a BGR frame into a MediaPipe image
+
+        Returns:
+            tuple: (mp.Image, transform) where transform maps boxes of that
+            image back to the frame, see map_box
+        """
+        frame_height, frame_width = frame.shape[:2]
+        x1, y1, x2, y2 = self.crop_box(frame_width, frame_height)
+        crop = frame[y1:y2, x1:x2]
+        width, height = self.target_size(x2 - x1, y2 - y1)
+
+        # The buffers are shared by the session's frames until MediaPipe has
+        # copied them into its own image
+        with self._lock:
+            source = crop
+            if (width, height) != (x2 - x1, y2 - y1):
+                self._resized = cv2.resize(crop, (width, height), dst=self._buffer(self._resized, (height, width, 3)),
+                                           interpolation=cv2.INTER_LINEAR)
+                source = self._resized
+            self._rgb = cv2.cvtColor(source, cv2.COLOR_BGR2RGB, dst=self._buffer(self._rgb, (height, width, 3)))
+            mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=self._rgb)
+
+        transform = (x1, y1, (x2 - x1) / width, (y2 - y1) / height)
+        return mp_image, transform
+
+    @staticmethod
+    def map_box(bbox, transform):
+        """Map an (x1, y1, x2, y2) box of the preprocessed image to the frame"""
+        offset_x, offset_y, scale_x, scale_y = transform
+        x1, y1, x2, y2 = bbox
+        return [round(offset_x + x1 * scale_x), round(offset_y + y1 * scale_y),
+                round(offset_x + x2 * scale_x), round(offset_y + y2 * scale_y)]
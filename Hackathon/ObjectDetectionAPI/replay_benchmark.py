@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+"""
+Replay recorded frames through the detector in image and live stream mode
+
+Frames from a video file or an image directory are JPEG-encoded once, like
+the payloads the WebSocket clients send, then replayed at a fixed rate
+(--fps, 0 for as fast as possible). Each frame is decoded, detected, drawn
+and re-encoded:
+  - image: synchronously, one frame after the other, as the pooled
+    detector does for one client; late frames queue up
+  - live_stream: decoded and submitted to MediaPipe, which runs inference
+    on its own thread and drops frames arriving while it is busy; drawing
+    and encoding happen in the result callback
+
+Reports answered frames per second, dropped frames and the latency from a
+frame's scheduled arrival to its encoded response. --inference-size and
+--roi apply the same per-session preprocessing as the server.
+
+Usage:
+    python replay_benchmark.py --video exam.mp4 [--frames 300] [--fps 30] [--json out.json]
+    python replay_benchmark.py --images frames/ [--modes image live_stream]
+"""
+import os
+import json
+import time
+import argparse
+import threading
+import cv2
+import numpy as np
+from objectDetection import ObjectDetector, RUNNING_MODES
+from preprocessing import FramePreprocessor
+
+def read_payloads(video=None, images=None, limit=300, width=640):
+    """JPEG-encoded frames, resized to the client's capture width"""
+    frames = []
+    if video:
+        capture = cv2.VideoCapture(video)
+        while len(frames) < limit:
+            ok, frame = capture.read()
+            if not ok:
+                break
+            frames.append(frame)
+        capture.release()
+    else:
+        for name in sorted(os.listdir(images))[:limit]:
+            frame = cv2.imread(os.path.join(images, name))
+            if frame is not None:
+                frames.append(frame)
+
+    payloads = []
+    for frame in frames:
+        if frame.shape[1] != width:
+            frame = cv2.resize(frame, (width, round(frame.shape[0] * width / frame.shape[1])))
+        payloads.append(cv2.imencode('.jpg', frame)[1].tobytes())
+    return payloads
+
+def decode(payload):
+    return cv2.imdecode(np.frombuffer(payload, np.uint8), cv2.IMREAD_COLOR)
+
+def wait_until(deadline):
+    delay = deadline - time.perf_counter()
+    if delay > 0:
+        time.sleep(delay)
+
+def replay_image(detector, payloads, interval, preprocessor):
+    latencies = []
+    start = time.perf_counter()
+    for i, payload in enumerate(payloads):
+        arrival = start + i * interval
+        wait_until(arrival)
+        processed, _ = detector.detect_objects(decode(payload), preprocessor=preprocessor)
+        cv2.imencode('.jpg', processed)
+        latencies.append(time.perf_counter() - arrival)
+    return latencies, time.perf_counter() - start
+
+def replay_live_stream(detector, payloads, interval, preprocessor):
+    latencies = []
+    lock = threading.Lock()
+
+    def on_result(arrival):
+        def callback(frame, detections):
+            cv2.imencode('.jpg', ObjectDetector.draw_detections(frame, detections))
+            with lock:
+                latencies.append(time.perf_counter() - arrival)
+        return callback
+
+    start = time.perf_counter()
+    for i, payload in enumerate(payloads):
+        arrival = start + i * interval
+        wait_until(arrival)
+        detector.submit(decode(payload), on_result(arrival), preprocessor=preprocessor)
+    # Closing waits for the frame still in flight
+    detector.close()
+    return latencies, time.perf_counter() - start
+
+def run(mode, payloads, fps, model_path, preprocessor=None):
+    detector = ObjectDetector(model_path=model_path, running_mode=mode)
+    interval = 1.0 / fps if fps else 0.0
+
+    # Warm-up outside the measurement
+    warm_up = decode(payloads[0])
+    if mode == 'image':
+        detector.detect(warm_up)
+        latencies, elapsed = replay_image(detector, payloads, interval, preprocessor)
+    else:
+        done = threading.Event()
+        detector.submit(warm_up, lambda frame, detections: done.set())
+        done.wait(30)
+        detector.submitted = detector.completed = detector.dropped = 0
+        latencies, elapsed = replay_live_stream(detector, payloads, interval, preprocessor)
+
+    latencies_ms = np.asarray(latencies) * 1000
+    return {
+        "frames": len(payloads),
+        "answered": len(latencies),
+        "dropped": len(payloads) - len(latencies),
+        "seconds": elapsed,
+        "answered_fps": len(latencies) / elapsed,
+        "latency_p50_ms": float(np.percentile(latencies_ms, 50)) if len(latencies) else None,
+        "latency_p95_ms": float(np.percentile(latencies_ms, 95)) if len(latencies) else None,
+        "latency_max_ms": float(latencies_ms.max()) if len(latencies) else None
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay frames through the detector in image and live stream mode")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--video', help="Video file to replay")
+    source.add_argument('--images', help="Directory of frames to replay, in name order")
+    parser.add_argument('--frames', type=int, default=300, help="Maximum number of frames")
+    parser.add_argument('--fps', type=float, default=30, help="Arrival rate, 0 for as fast as possible")
+    parser.add_argument('--width', type=int, default=640, help="Frame width sent by the client")
+    parser.add_argument('--modes', nargs='+', default=list(RUNNING_MODES), choices=list(RUNNING_MODES))
+    parser.add_argument('--inference-size', type=int, default=0,
+                        help="Shorter side frames are downscaled to before detection, 0 to keep them")
+    parser.add_argument('--roi', type=float, nargs=4, default=None, metavar=('X', 'Y', 'W', 'H'),
+                        help="Region of interest as fractions of the frame")
+    parser.add_argument('--model', default='efficientdet_lite0.tflite', help="Detection model path")
+    parser.add_argument('--json', default=None, help="Also write the report to this file")
+    args = parser.parse_args()
+
+    payloads = read_payloads(args.video, args.images, args.frames, args.width)
+    if not payloads:
+        parser.error("no frames could be read")
+    print(f"Replaying {len(payloads)} frames at {args.fps or 'max'} fps")
+
+    preprocessor = None
+    if args.inference_size or args.roi:
+        preprocessor = FramePreprocessor(args.inference_size or None, args.roi)
+
+    report = {"frames": len(payloads), "fps": args.fps, "inference_size": args.inference_size, "roi": args.roi,
+              "modes": {}}
+    for mode in args.modes:
+        stats = report["modes"][mode] = run(mode, payloads, args.fps, args.model, preprocessor)
+        latency = (f"latency p50 {stats['latency_p50_ms']:7.1f} ms  p95 {stats['latency_p95_ms']:7.1f} ms"
+                   if stats["answered"] else "no frame answered")
+        print(f"{mode:>12}: {stats['answered_fps']:6.1f} answered fps   "
+              f"{stats['dropped']:4d}/{stats['frames']} dropped   {latency}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
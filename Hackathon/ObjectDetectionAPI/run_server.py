@@ -26,6 +26,7 @@ if __name__ == "__main__":
     print("Starting Object Detection WebSocket Server...")
     print("Access the web interface at: http://localhost:5000")
     
-    from flaskws import app
+    from flaskws import app, start_worker
     import eventlet
+    start_worker()
     eventlet.wsgi.server(eventlet.listen(('', 5000)), app)
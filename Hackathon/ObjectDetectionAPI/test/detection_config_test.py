@@ -0,0 +1,42 @@
+import os
+import unittest
+from unittest import mock
+from detection_config import (new_detection_config, apply_detection_config, event_options_from_env,
+                              inference_size_from_env)
+
+class TestDetectionConfig(unittest.TestCase):
+    def test_absent_keys_are_kept(self):
+        """Test a config event only changes the settings it names"""
+        config = new_detection_config(320)
+        apply_detection_config(config, {"exclude_categories": ["Person"], "per_frame": True})
+        settings = apply_detection_config(config, {"roi": [0.5, 0, 0.5, 1]})
+        self.assertEqual(settings, {"exclude_categories": ["person"], "roi": (0.5, 0.0, 0.5, 1.0),
+                                    "inference_size": 320, "per_frame": True})
+        settings = apply_detection_config(config, {"inference_size": 0})
+        self.assertEqual((settings["roi"], settings["inference_size"]), ((0.5, 0.0, 0.5, 1.0), None))
+
+    def test_invalid_config_changes_nothing(self):
+        """Test an invalid roi is rejected without applying the rest of the event"""
+        config = new_detection_config(320)
+        with self.assertRaises(ValueError):
+            apply_detection_config(config, {"roi": [0.5, 0.5, 0.8, 0.8], "exclude_categories": ["book"],
+                                            "per_frame": True})
+        self.assertEqual((config["exclude_categories"], config["per_frame"]), ([], False))
+        self.assertIsNone(config["preprocessor"].roi)
+
+    def test_environment(self):
+        """Test the defaults read from the environment"""
+        with mock.patch.dict(os.environ, {"OBJECT_MIN_DURATION": "3", "INFERENCE_SIZE": "0"}):
+            self.assertEqual(event_options_from_env()["min_duration"], 3.0)
+            self.assertIsNone(inference_size_from_env())
+            self.assertEqual(new_detection_config(event_options=event_options_from_env())["events"]
+                             .defaults["min_duration"], 3.0)
+        with mock.patch.dict(os.environ):
+            os.environ.pop("INFERENCE_SIZE", None)
+            # Full frames unless clients or the server opt in to downscaling
+            self.assertIsNone(inference_size_from_env())
+            self.assertEqual(new_detection_config(inference_size_from_env())["preprocessor"].target_size(1280, 720),
+                             (1280, 720))
+
+if __name__ == '__main__':
+    unittest.main()
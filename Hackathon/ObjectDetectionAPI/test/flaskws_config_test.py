@@ -0,0 +1,96 @@
+import base64
+import threading
+import unittest
+from unittest.mock import patch
+import cv2
+import numpy as np
+import flaskws
+
+class TestClientConfig(unittest.TestCase):
+    def setUp(self):
+        flaskws.client_configs.clear()
+
+    def tearDown(self):
+        flaskws.client_configs.clear()
+
+    def test_partial_config_keeps_exclusions(self):
+        """Test a config without exclude_categories leaves the client's exclusions as they were"""
+        flaskws.connect("sid", {})
+        flaskws.handle_config("sid", {"exclude_categories": ["Person"]})
+        answer = flaskws.handle_config("sid", {"roi": [0.25, 0.25, 0.5, 0.5]})
+        self.assertEqual(answer["status"], "success")
+        self.assertEqual(answer["excluded"], ["person"])
+        self.assertEqual(answer["roi"], (0.25, 0.25, 0.5, 0.5))
+        self.assertEqual(flaskws.client_configs["sid"]["exclude_categories"], ["person"])
+
+    def test_empty_list_clears_exclusions(self):
+        """Test an explicit empty exclude_categories clears the filter"""
+        flaskws.handle_config("sid", {"exclude_categories": ["person"]})
+        self.assertEqual(flaskws.handle_config("sid", {"exclude_categories": []})["excluded"], [])
+
+class FakeLiveDetector:
+    def __init__(self, **options):
+        self.thread = threading.current_thread()
+        self.submitted = []
+        self.closed = False
+        self.completed = self.dropped = 0
+
+    def submit(self, frame, callback, exclude_categories=None, preprocessor=None):
+        self.submitted.append(frame.shape)
+
+    def close(self):
+        self.closed = True
+
+def frame_message():
+    _, buffer = cv2.imencode('.jpg', np.zeros((48, 64, 3), dtype=np.uint8))
+    return {"image": "data:image/jpeg;base64," + base64.b64encode(buffer).decode('utf-8')}
+
+class TestLiveDetectors(unittest.TestCase):
+    def setUp(self):
+        for target, value in [("DETECTOR_MODE", "live_stream"), ("ObjectDetector", FakeLiveDetector)]:
+            patcher = patch.object(flaskws, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        flaskws.client_configs.clear()
+        flaskws.live_detectors.clear()
+
+    def test_detector_created_at_connect_off_the_hub(self):
+        """Test a live stream client's detector is loaded when it connects, in a native thread"""
+        flaskws.connect("sid", {})
+        detector = flaskws.live_detectors["sid"]
+        self.assertIsNot(detector.thread, threading.main_thread())
+
+        flaskws.handle_frame("sid", frame_message())
+        self.assertIs(flaskws.live_detectors["sid"], detector)
+        self.assertEqual(detector.submitted, [(48, 64, 3)])
+
+    def test_frame_without_detector_is_dropped(self):
+        """Test a frame of a disconnected client is dropped instead of creating a detector"""
+        flaskws.connect("sid", {})
+        detector = flaskws.live_detectors["sid"]
+        flaskws.disconnect("sid")
+        self.assertTrue(detector.closed)
+
+        flaskws.handle_frame("sid", frame_message())
+        self.assertEqual(flaskws.live_detectors, {})
+        self.assertEqual(detector.submitted, [])
+
+    def test_disconnect_while_loading_closes_detector(self):
+        """Test a detector finished after its client left is closed, not kept"""
+        created = []
+
+        def load(**options):
+            # The client leaves while the graph loads
+            flaskws.client_configs.pop("sid", None)
+            created.append(FakeLiveDetector(**options))
+            return created[-1]
+
+        with patch.object(flaskws, "ObjectDetector", side_effect=load):
+            flaskws.connect("sid", {})
+        self.assertNotIn("sid", flaskws.live_detectors)
+        self.assertTrue(created[0].closed)
+
+if __name__ == '__main__':
+    unittest.main()
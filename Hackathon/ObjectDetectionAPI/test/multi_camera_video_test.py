@@ -0,0 +1,241 @@
+import os
+import time
+import queue
+import shutil
+import logging
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+import cv2
+import numpy as np
+from multi_camera_system import MultiCameraSystem, RTSPCamera
+
+FRAMES = 12
+FPS = 20
+
+class StubRecognizer:
+    """Finds no faces, records the size of each batch"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.batches = []
+
+    def identify_frames(self, frames):
+        self.batches.append(len(frames))
+        time.sleep(self.delay)
+        return [[] for _ in frames]
+
+    def draw_results(self, frame, faces):
+        return frame
+
+class RecordingEvent(threading.Event):
+    """Stop event recording each wait, set after the given number of waits"""
+
+    def __init__(self, waits):
+        super().__init__()
+        self.waits = waits
+        self.delays = []
+
+    def wait(self, timeout=None):
+        self.delays.append(timeout)
+        if len(self.delays) >= self.waits:
+            self.set()
+        return self.is_set()
+
+class FakeCapture:
+    """A stream that opens on the given attempt and is lost at once"""
+    attempts = 0
+    opens_on = None
+
+    def __init__(self, url):
+        FakeCapture.attempts += 1
+
+    def isOpened(self):
+        return FakeCapture.attempts == FakeCapture.opens_on
+
+    def read(self):
+        return False, None
+
+    def get(self, prop):
+        return 0.0
+
+    def release(self):
+        pass
+
+class TestMultiCameraVideo(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.mkdtemp()
+        cls.video = os.path.join(cls.tmpdir, 'exam_room.avi')
+        writer = cv2.VideoWriter(cls.video, cv2.VideoWriter_fourcc(*'MJPG'), FPS, (64, 48))
+        for i in range(FRAMES):
+            writer.write(np.full((48, 64, 3), i * 20, np.uint8))
+        writer.release()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmpdir)
+
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.results = []
+        self.recognizer = StubRecognizer()
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def new_system(self, **options):
+        system = MultiCameraSystem(display=False, recognizer=self.recognizer,
+                                   on_result=self.results.append, **options)
+        self.addCleanup(lambda: system.stop() if system.running else None)
+        return system
+
+    def read_camera(self, maxsize, **options):
+        """Run a camera over the video without a consumer, returning it and the queued frame indexes"""
+        frames = queue.Queue(maxsize=maxsize)
+        camera = RTSPCamera(0, self.video, frames, **options)
+        camera.run()
+        indexes = []
+        while not frames.empty():
+            indexes.append(frames.get_nowait().index)
+        return camera, indexes
+
+    def test_video_file_processed_to_the_end(self):
+        """Test that a video file read offline delivers every frame and wait returns at its end"""
+        system = self.new_system(queue_size=4, batch_size=4)
+        camera_id = system.add_camera(self.video, name='Room 1')
+        self.assertTrue(system.start())
+
+        self.assertTrue(system.wait(timeout=10))
+        camera = system.camera_threads[camera_id]
+        self.assertFalse(camera.is_alive())
+        self.assertEqual([result["index"] for result in self.results], list(range(1, FRAMES + 1)))
+        self.assertTrue(all(result["name"] == 'Room 1' for result in self.results))
+        stats = system.stats()
+        self.assertEqual(stats["cameras"][camera_id]["captured"], FRAMES)
+        self.assertEqual(stats["cameras"][camera_id]["queued"], FRAMES)
+        self.assertEqual(stats["cameras"][camera_id]["dropped"], 0)
+        self.assertEqual(stats["processor"]["processed"], {camera_id: FRAMES})
+        self.assertEqual(sum(self.recognizer.batches), FRAMES)
+        self.assertTrue(all(size <= 4 for size in self.recognizer.batches))
+        self.assertEqual(stats["displayed"], FRAMES)
+
+    def test_frame_step(self):
+        """Test that frame_step queues one captured frame out of N"""
+        camera, indexes = self.read_camera(FRAMES, frame_step=3)
+        self.assertEqual(indexes, [1, 4, 7, 10])
+        self.assertEqual(camera.captured, FRAMES)
+        self.assertEqual(camera.queued, 4)
+
+    def test_realtime_pacing(self):
+        """Test that realtime reads a video file at its frame rate and offline reads do not wait"""
+        start = time.monotonic()
+        camera, indexes = self.read_camera(FRAMES, realtime=True)
+        paced = time.monotonic() - start
+        self.assertEqual(len(indexes), FRAMES)
+        self.assertEqual(camera.drop_policy, 'drop_oldest')
+        self.assertGreaterEqual(paced, (FRAMES - 1) / FPS)
+
+        start = time.monotonic()
+        self.read_camera(FRAMES)
+        self.assertLess(time.monotonic() - start, paced)
+
+    def test_drop_newest_keeps_first_frames(self):
+        """Test that drop_newest skips the frames arriving while the queue is full"""
+        camera, indexes = self.read_camera(3, drop_policy='drop_newest')
+        self.assertEqual(indexes, [1, 2, 3])
+        self.assertEqual(camera.queued, 3)
+        self.assertEqual(camera.dropped, FRAMES - 3)
+        self.assertEqual(camera.evicted, 0)
+
+    def test_drop_oldest_keeps_latest_frames(self):
+        """Test that drop_oldest evicts the oldest waiting frames for the new ones"""
+        camera, indexes = self.read_camera(3, drop_policy='drop_oldest')
+        self.assertEqual(indexes, [FRAMES - 2, FRAMES - 1, FRAMES])
+        self.assertEqual(camera.queued, FRAMES)
+        self.assertEqual(camera.evicted, FRAMES - 3)
+        self.assertEqual(camera.dropped, 0)
+
+    def test_block_keeps_every_frame(self):
+        """Test that block waits for room in the queue and loses no frame"""
+        frames = queue.Queue(maxsize=2)
+        camera = RTSPCamera(0, self.video, frames)
+        self.assertEqual(camera.drop_policy, 'block')
+        camera.start()
+
+        indexes = []
+        while camera.is_alive() or not frames.empty():
+            try:
+                indexes.append(frames.get(timeout=0.1).index)
+            except queue.Empty:
+                continue
+            # The camera waits for the slow consumer
+            self.assertLessEqual(camera.captured - len(indexes), 3)
+            time.sleep(0.01)
+        camera.join(5)
+        self.assertEqual(indexes, list(range(1, FRAMES + 1)))
+        self.assertEqual(camera.dropped + camera.evicted, 0)
+
+    @patch('multi_camera_system.cv2.VideoCapture', FakeCapture)
+    def test_reconnect_backoff(self):
+        """Test that reopening a stream doubles the wait up to the maximum"""
+        FakeCapture.attempts, FakeCapture.opens_on = 0, None
+        camera = RTSPCamera(0, 'rtsp://camera.invalid/stream', queue.Queue(), reconnect_delay=1.0,
+                            max_reconnect_delay=8.0)
+        camera._stop_event = RecordingEvent(waits=6)
+        camera.run()
+        self.assertEqual(camera._stop_event.delays, [1.0, 2.0, 4.0, 8.0, 8.0, 8.0])
+        self.assertEqual(camera.reconnects, 6)
+
+    @patch('multi_camera_system.cv2.VideoCapture', FakeCapture)
+    def test_reconnect_delay_resets_after_connecting(self):
+        """Test that a stream lost after connecting is reopened after the first delay again"""
+        FakeCapture.attempts, FakeCapture.opens_on = 0, 3
+        camera = RTSPCamera(0, 'rtsp://camera.invalid/stream', queue.Queue(), reconnect_delay=0.5,
+                            max_reconnect_delay=8.0)
+        camera._stop_event = RecordingEvent(waits=4)
+        camera.run()
+        # Two failed opens, the stream lost, one more failed open
+        self.assertEqual(camera._stop_event.delays, [0.5, 1.0, 0.5, 0.5])
+        self.assertEqual(camera.reconnects, 4)
+        self.assertFalse(camera.connected)
+
+    def test_wait_times_out_while_cameras_run(self):
+        """Test that wait returns False when the timeout expires before the cameras end"""
+        system = self.new_system()
+        system.add_camera(self.video, loop=True, realtime=True)
+        system.start()
+        start = time.monotonic()
+        self.assertFalse(system.wait(timeout=0.2))
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+        self.assertTrue(system.running)
+
+    def test_wait_returns_when_quit_requested(self):
+        """Test that wait returns False once the user quits"""
+        system = self.new_system()
+        system.add_camera(self.video, loop=True, realtime=True)
+        system.start()
+        system.display_thread.quit_requested.set()
+        self.assertFalse(system.wait(timeout=5))
+
+    def test_stop_joins_every_thread(self):
+        """Test that stop ends the cameras, the processor and the display and empties the queues"""
+        self.recognizer.delay = 0.02
+        system = self.new_system(queue_size=4)
+        system.add_camera(self.video, loop=True)
+        system.add_camera(self.video, loop=True, realtime=True, drop_policy='drop_newest')
+        system.start()
+        while not self.results:
+            time.sleep(0.01)
+
+        threads = [*system.camera_threads.values(), system.processor_thread, system.display_thread]
+        system.stop(timeout=5)
+        self.assertFalse(any(thread.is_alive() for thread in threads))
+        self.assertFalse(system.running)
+        self.assertEqual(system.frame_queue.unfinished_tasks, 0)
+        self.assertEqual(system.result_queue.unfinished_tasks, 0)
+        self.assertFalse(system.start())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import time
+import threading
+import unittest
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+import numpy as np
+from objectDetection import ObjectDetector, DetectorPool
+
+def detection(category, x):
+    return SimpleNamespace(bounding_box=SimpleNamespace(origin_x=x, origin_y=10, width=20, height=20),
+                           categories=[SimpleNamespace(category_name=category, score=0.9)])
+
+class FakeMediaPipeDetector:
+    """Finds a person and a phone, recording how many frames each instance runs at once"""
+    lock = threading.Lock()
+    running = 0
+    most_running = 0
+
+    def __init__(self):
+        self.active = 0
+        self.overlaps = 0
+        self.frames = 0
+
+    def detect(self, image):
+        cls = FakeMediaPipeDetector
+        with cls.lock:
+            self.active += 1
+            self.frames += 1
+            if self.active > 1:
+                self.overlaps += 1
+            cls.running += 1
+            cls.most_running = max(cls.most_running, cls.running)
+        time.sleep(0.01)
+        with cls.lock:
+            self.active -= 1
+            cls.running -= 1
+        return SimpleNamespace(detections=[detection("person", 0), detection("cell phone", 40)])
+
+class TestDetectorPool(unittest.TestCase):
+    def setUp(self):
+        FakeMediaPipeDetector.running = FakeMediaPipeDetector.most_running = 0
+        self.instances = []
+
+        def create(options):
+            self.instances.append(FakeMediaPipeDetector())
+            return self.instances[-1]
+
+        for target, replacement in [("objectDetection.download_model", lambda path: None),
+                                    ("objectDetection.vision.ObjectDetector.create_from_options", create)]:
+            patcher = patch(target, side_effect=replacement)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.frame = np.zeros((48, 64, 3), dtype=np.uint8)
+
+    def categories(self, detections):
+        return [detected["category"] for detected in detections]
+
+    def test_concurrent_calls_never_share_an_instance(self):
+        """Test concurrent detect calls run in parallel, one per instance, each with its own filter"""
+        pool = DetectorPool(size=2)
+        filters = [["person"], ["Cell Phone"], None, []] * 4
+        with ThreadPoolExecutor(8) as executor:
+            results = list(executor.map(lambda excluded: pool.detect(self.frame, excluded), filters))
+
+        self.assertEqual(len(self.instances), 2)
+        self.assertEqual([instance.overlaps for instance in self.instances], [0, 0])
+        self.assertEqual(sum(instance.frames for instance in self.instances), len(filters))
+        self.assertEqual(FakeMediaPipeDetector.most_running, 2)
+        self.assertEqual([self.categories(detections) for detections in results[:4]],
+                         [["cell phone"], ["person"], ["person", "cell phone"], ["person", "cell phone"]])
+        self.assertEqual(pool.busy, 0)
+
+    def test_detect_blocks_while_pool_is_exhausted(self):
+        """Test a call waits for an instance to be returned instead of sharing one"""
+        pool = DetectorPool(size=1)
+        done = threading.Event()
+        with pool.acquire() as detector:
+            worker = threading.Thread(target=lambda: pool.detect(self.frame) and done.set(), daemon=True)
+            worker.start()
+            self.assertFalse(done.wait(0.2))
+            self.assertEqual(pool.busy, 1)
+            self.assertEqual(self.instances[0].frames, 0)
+        worker.join(5)
+        self.assertTrue(done.is_set())
+        self.assertEqual(self.instances[0].frames, 1)
+        self.assertIs(detector.detector, self.instances[0])
+
+    def test_per_call_exclusions_keep_defaults(self):
+        """Test exclude_categories of a call never changes the detector's default filter"""
+        detector = ObjectDetector(exclude_categories=["Person"])
+        self.assertEqual(self.categories(detector.detect(self.frame, ["Cell Phone"])), ["person"])
+        self.assertEqual(self.categories(detector.detect(self.frame, [])), ["person", "cell phone"])
+        self.assertEqual(self.categories(detector.detect(self.frame)), ["cell phone"])
+        _, detections = detector.detect_objects(self.frame.copy(), ["cell phone"])
+        self.assertEqual(self.categories(detections), ["person"])
+        self.assertEqual(detector.exclude_categories, ["person"])
+
+        pool = DetectorPool(size=1, exclude_categories=["person"])
+        self.assertEqual(self.categories(pool.detect(self.frame, [])), ["person", "cell phone"])
+        self.assertEqual(self.categories(pool.detect(self.frame)), ["cell phone"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+from object_events import ObjectEventTracker
+
+def phone(score=0.9):
+    return {"category": "cell phone", "score": score, "bbox": [0, 0, 10, 10]}
+
+class TestObjectEventTracker(unittest.TestCase):
+    def feed(self, tracker, frames, step=0.5):
+        """Feed one detection list per frame, step seconds apart; return all events"""
+        events = []
+        for i, detections in enumerate(frames):
+            events.extend(tracker.update(detections, i * step))
+        return events
+
+    def test_glimpse_produces_no_event(self):
+        """Test an object seen for less than min_duration is never reported"""
+        tracker = ObjectEventTracker(min_duration=1.0, missing_duration=1.0)
+        events = self.feed(tracker, [[phone()], [phone()], [], [], [], []])
+        self.assertEqual(events, [])
+        self.assertEqual(tracker.tracks, {})
+
+    def test_appeared_and_disappeared(self):
+        """Test one appeared and one disappeared event per presence, with first and last sighting times"""
+        tracker = ObjectEventTracker(min_duration=1.0, missing_duration=1.0)
+        events = self.feed(tracker, [[phone()]] * 5 + [[]] * 3)
+        self.assertEqual([(e["event"], e["time"]) for e in events], [("appeared", 0.0), ("disappeared", 2.0)])
+        self.assertEqual(events[1]["duration"], 2.0)
+        self.assertEqual(tracker.present, [])
+
+    def test_short_miss_keeps_presence(self):
+        """Test a missed frame shorter than missing_duration does not split the presence"""
+        tracker = ObjectEventTracker(min_duration=0.5, missing_duration=1.0)
+        events = self.feed(tracker, [[phone()], [phone()], [], [phone()], [phone()]])
+        self.assertEqual([e["event"] for e in events], ["appeared"])
+        self.assertEqual(tracker.present, ["cell phone"])
+
+    def test_score_hysteresis(self):
+        """Test a low score cannot start a presence but keeps an existing one"""
+        tracker = ObjectEventTracker(enter_score=0.7, exit_score=0.5, min_duration=0.5, missing_duration=1.0)
+        self.assertEqual(self.feed(tracker, [[phone(0.6)]] * 4), [])
+        tracker = ObjectEventTracker(enter_score=0.7, exit_score=0.5, min_duration=0.5, missing_duration=1.0)
+        events = self.feed(tracker, [[phone(0.8)], [phone(0.8)]] + [[phone(0.6)]] * 6)
+        self.assertEqual([e["event"] for e in events], ["appeared"])
+
+    def test_category_overrides(self):
+        """Test per-category settings take precedence over the defaults"""
+        tracker = ObjectEventTracker(min_duration=5.0, overrides={"Cell Phone": {"min_duration": 0}})
+        events = tracker.update([phone(), {"category": "book", "score": 0.9}], 0.0)
+        self.assertEqual([e["category"] for e in events], ["cell phone"])
+        with self.assertRaises(ValueError):
+            ObjectEventTracker(overrides={"book": {"min_seconds": 1}})
+
+    def test_close_ends_presences(self):
+        """Test closing the stream reports every present object as disappeared"""
+        tracker = ObjectEventTracker(min_duration=0.5)
+        self.feed(tracker, [[phone()]] * 3)
+        events = tracker.close()
+        self.assertEqual([(e["event"], e["time"]) for e in events], [("disappeared", 1.0)])
+        self.assertEqual(tracker.stats()["events"], 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+import numpy as np
+from preprocessing import FramePreprocessor
+
+def bright_box(image):
+    """(x1, y1, x2, y2) box around the bright pixels of an image"""
+    ys, xs = np.nonzero(image[..., 0] > 128)
+    return [int(xs.min()), int(ys.min()), int(xs.max()) + 1, int(ys.max()) + 1]
+
+class TestFramePreprocessor(unittest.TestCase):
+    def setUp(self):
+        # A 640x480 frame with a white square at (400, 200)-(440, 240)
+        self.frame = np.zeros((480, 640, 3), np.uint8)
+        self.frame[200:240, 400:440] = 255
+
+    def test_map_box_through_crop_and_scale(self):
+        """Test a box of the preprocessed image is mapped back to the frame"""
+        preprocessor = FramePreprocessor(120, roi=(0.5, 0.25, 0.5, 0.5))
+        image, transform = preprocessor.to_mp_image(self.frame)
+        # The 320x240 crop at (320, 120) is halved
+        self.assertEqual((image.width, image.height), (160, 120))
+        self.assertEqual(transform, (320, 120, 2.0, 2.0))
+
+        box = bright_box(image.numpy_view())
+        self.assertEqual(box, [40, 40, 60, 60])
+        self.assertEqual(FramePreprocessor.map_box(box, transform), [400, 200, 440, 240])
+
+    def test_roi_only(self):
+        """Test a crop without downscaling only offsets the boxes"""
+        preprocessor = FramePreprocessor(None, roi=(0.5, 0.25, 0.5, 0.5))
+        image, transform = preprocessor.to_mp_image(self.frame)
+        self.assertEqual((image.width, image.height), (320, 240))
+        self.assertEqual(FramePreprocessor.map_box(bright_box(image.numpy_view()), transform),
+                         [400, 200, 440, 240])
+
+    def test_no_downscale(self):
+        """Test frames keep their resolution by default and are never upscaled"""
+        for preprocessor in (FramePreprocessor(), FramePreprocessor(None), FramePreprocessor(1000)):
+            image, transform = preprocessor.to_mp_image(self.frame)
+            self.assertEqual((image.width, image.height), (640, 480))
+            self.assertEqual(transform, (0, 0, 1.0, 1.0))
+            self.assertEqual(bright_box(image.numpy_view()), [400, 200, 440, 240])
+
+    def test_rgb_conversion(self):
+        """Test the BGR frame is given to the model as RGB"""
+        self.frame[0:10, 0:10] = (255, 0, 0)
+        image, _ = FramePreprocessor().to_mp_image(self.frame)
+        self.assertEqual(image.numpy_view()[5, 5].tolist(), [0, 0, 255])
+
+    def test_invalid_settings(self):
+        """Test invalid regions of interest and inference sizes are rejected"""
+        for roi in [(0.5, 0.5, 0.8, 0.8), (-0.1, 0, 0.5, 0.5), (0, 0, 0, 0.5), (0, 1, 0.5, 0.5),
+                    (0, 0, 0.5), (0, 0, 0.5, 'half')]:
+            with self.subTest(roi=roi), self.assertRaises(ValueError):
+                FramePreprocessor(roi=roi)
+        with self.assertRaises(TypeError):
+            FramePreprocessor(roi=(0, 0, None, 0.5))
+        for size in (0, -320):
+            with self.subTest(inference_size=size), self.assertRaises(ValueError):
+                FramePreprocessor(size)
+        self.assertEqual(FramePreprocessor(roi=[0, 0, 1, 1]).roi, (0.0, 0.0, 1.0, 1.0))
+
+    def test_buffers_reused_across_frames(self):
+        """Test the buffers are kept for frames of the same size and replaced when it changes"""
+        preprocessor = FramePreprocessor(120)
+        first, _ = preprocessor.to_mp_image(self.frame)
+        resized, rgb = preprocessor._resized, preprocessor._rgb
+        self.assertEqual(rgb.shape, (120, 160, 3))
+
+        preprocessor.to_mp_image(np.zeros((480, 640, 3), np.uint8))
+        self.assertIs(preprocessor._resized, resized)
+        self.assertIs(preprocessor._rgb, rgb)
+        # The images already made own their pixels
+        self.assertEqual(bright_box(first.numpy_view()), [100, 50, 110, 60])
+
+        image, transform = preprocessor.to_mp_image(np.zeros((240, 480, 3), np.uint8))
+        self.assertEqual((image.width, image.height), (240, 120))
+        self.assertEqual(transform, (0, 0, 2.0, 2.0))
+        self.assertEqual(preprocessor._rgb.shape, (120, 240, 3))
+        self.assertIsNot(preprocessor._rgb, rgb)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,272 @@
+import time
+import logging
+import service_paths  # noqa: F401  (face and object modules)
+from sessions import ExamSession
+from session_services import face_results
+from objectDetection import ObjectDetector
+from detection_config import new_detection_config, apply_detection_config
+
+logger = logging.getLogger(__name__)
+
+class Analyzer:
+    """
+    One check run on the decoded frames of a session
+
+    An analyzer runs on every `every`-th frame of a session; on the other
+    frames the merged result carries its last result, whose "frame" field
+    tells how old it is. Analyzers run in pipeline order and share a
+    per-frame context, so a later analyzer can reuse what an earlier one
+    computed on the same frame (listed in `requires`), and report one-off
+    events by appending them to context["events"]. An analyzer with
+    requirements counts only the frames where they were computed: gaze
+    with every=2 runs on every other frame the faces were analyzed on.
+    Per-session state lives in the dict returned by start_session().
+    """
+
+    name = None
+    requires = ()
+
+    def __init__(self, every=1):
+        """
+        Args:
+            every (int): Analyze one frame out of `every` (of those with the
+                required inputs)
+        """
+        if every < 1:
+            raise ValueError(f"{self.name} sampling interval must be at least 1, got {every}")
+        self.every = every
+
+    def available(self, context):
+        """Whether this frame's context holds the required inputs"""
+        return all(key in context for key in self.requires)
+
+    def wants(self, count):
+        """Whether to run on the count-th frame of a session it could run on"""
+        # Sample from the first frame on so a new session gets every result at once
+        return (count - 1) % self.every == 0
+
+    def start_session(self):
+        """Per-session state handed to the other methods"""
+        return {}
+
+    def configure(self, state, data):
+        """
+        Apply a client's config event
+
+        Returns:
+            dict: Settings to echo back to the client
+        """
+        return {}
+
+    def analyze(self, frame, state, session, context):
+        """
+        Analyze one decoded BGR frame
+
+        Returns:
+            dict: JSON-serializable result of this analyzer
+        """
+        raise NotImplementedError
+
+    def draw(self, frame, state):
+        """Draw the last result on the frame sent back to annotated clients"""
+        return frame
+
+    def end_session(self, state, session):
+        """Called once when the session disconnects or is evicted"""
+
+class FaceAnalyzer(Analyzer):
+    """Face recognition against the session's exam gallery, with tracking in between"""
+
+    name = "faces"
+
+    def __init__(self, recognizer, find_faces, every=3):
+        """
+        Args:
+            recognizer (FaceRecognizer): Shared MTCNN + FaceNet recognizer
+            find_faces: Called as find_faces(frame, session, timers), returns
+                the identified faces (SessionServices.find_faces)
+            every (int): Analyze one frame out of `every`
+        """
+        super().__init__(every)
+        self.recognizer = recognizer
+        self.find_faces = find_faces
+
+    def start_session(self):
+        return {"faces": []}
+
+    def analyze(self, frame, state, session, context):
+        faces = self.find_faces(frame, session, context["timers"])
+        state["faces"] = faces
+        context["faces"] = faces
+        return face_results(faces)
+
+    def draw(self, frame, state):
+        return self.recognizer.draw_results(frame, state["faces"])
+
+class GazeAnalyzer(Analyzer):
+    """Looking-at-screen checks on the faces found on the same frame, feeding cheating detection"""
+
+    name = "gaze"
+    requires = ("faces",)
+
+    def __init__(self, gaze_analyzer, record_cheating, every=1):
+        """
+        Args:
+            gaze_analyzer (gaze.GazeAnalyzer): Per-face geometric checks
+            record_cheating: Called as record_cheating(session, interval) when
+                a cheating interval ends
+            every (int): Analyze one frame out of `every` of those the faces
+                were analyzed on
+        """
+        super().__init__(every)
+        self.gaze_analyzer = gaze_analyzer
+        self.record_cheating = record_cheating
+
+    def analyze(self, frame, state, session, context):
+        exam_monitor = session.monitor
+        gaze = self.gaze_analyzer.analyze(context["faces"], frame.shape)
+        looking_at_screen = exam_monitor.update_gaze(gaze["face_detected"], gaze["checks"])
+        self.record_cheating(session, exam_monitor.update_cheating(looking_at_screen))
+        return {
+            "looking_at_screen": looking_at_screen,
+            "is_cheating": exam_monitor.is_cheating,
+            "eye_positions": gaze["eye_positions"]
+        }
+
+    def end_session(self, state, session):
+        self.record_cheating(session, session.monitor.end_cheating())
+
+class ObjectAnalyzer(Analyzer):
+    """
+    Object detection (phones, books...) with per-session filters and preprocessing
+
+    The result lists the objects currently present; appeared / disappeared
+    events go to the frame's events. Per-frame detections are only included
+    for sessions configured with per_frame.
+    """
+
+    name = "objects"
+
+    def __init__(self, detector_pool, inference_size=None, every=5, event_options=None):
+        """
+        Args:
+            detector_pool (DetectorPool): Shared MediaPipe detectors
+            inference_size (int): Default shorter side of the detection input,
+                None to keep the frame resolution
+            every (int): Analyze one frame out of `every`
+            event_options (dict): ObjectEventTracker keyword arguments
+        """
+        super().__init__(every)
+        self.detector_pool = detector_pool
+        self.inference_size = inference_size
+        self.event_options = event_options or {}
+
+    def start_session(self):
+        return {**new_detection_config(self.inference_size, self.event_options), "detected": []}
+
+    def configure(self, state, data):
+        return apply_detection_config(state, data)
+
+    def analyze(self, frame, state, session, context):
+        with self.detector_pool.acquire() as detector:
+            detected = detector.detect(frame, state["exclude_categories"], state["preprocessor"])
+        state["detected"] = detected
+        context["events"].extend(state["events"].update(detected, context["timestamp"]))
+        result = {"present": state["events"].present}
+        if state["per_frame"]:
+            result["detected"] = detected
+        return result
+
+    def draw(self, frame, state):
+        return ObjectDetector.draw_detections(frame, state["detected"])
+
+    def end_session(self, state, session):
+        state["events"].close()
+
+class ProctoringSession(ExamSession):
+    """ExamSession with the frame count, state and last result of each analyzer"""
+
+    __slots__ = ('frame_index', 'available', 'analysis', 'results')
+
+    def __init__(self, sid, recognition_options=None, metrics=None):
+        super().__init__(sid, recognition_options, metrics)
+        self.frame_index = 0
+        self.available = {}  # Analyzer name -> frames its inputs were available on
+        self.analysis = None  # Analyzer name -> state, set by FramePipeline.start_session
+        self.results = {}  # Analyzer name -> last result
+
+class FramePipeline:
+    """Runs the analyzers due on each decoded frame and merges their results"""
+
+    def __init__(self, analyzers):
+        names = [analyzer.name for analyzer in analyzers]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Analyzer names must be unique, got {names}")
+        self.analyzers = list(analyzers)
+
+    def start_session(self, session):
+        if session.analysis is None:
+            session.analysis = {analyzer.name: analyzer.start_session() for analyzer in self.analyzers}
+
+    def configure(self, session, data):
+        """Apply a config event to every analyzer, returning their merged settings"""
+        self.start_session(session)
+        settings = {}
+        for analyzer in self.analyzers:
+            settings.update(analyzer.configure(session.analysis[analyzer.name], data))
+        return settings
+
+    def process(self, frame, session, timers, timestamp=None):
+        """
+        Analyze one frame of a session
+
+        Args:
+            frame: Decoded BGR frame, shared read-only by the analyzers
+            session (ProctoringSession): Session the frame belongs to
+            timers (Metrics): Stage timers, one stage per analyzer
+            timestamp (float): Time the frame was received, defaults to now
+
+        Returns:
+            dict: Frame index, analyzers that ran on it, the latest result of
+                every analyzer and the events of this frame (if any)
+        """
+        self.start_session(session)
+        session.frame_index += 1
+        context = {"timers": timers, "timestamp": time.time() if timestamp is None else timestamp, "events": []}
+        analyzed = []
+        for analyzer in self.analyzers:
+            if not analyzer.available(context):
+                continue
+            count = session.available[analyzer.name] = session.available.get(analyzer.name, 0) + 1
+            if not analyzer.wants(count):
+                continue
+            try:
+                with timers.time(analyzer.name):
+                    result = analyzer.analyze(frame, session.analysis[analyzer.name], session, context)
+            except Exception as e:
+                logger.error(f"Error in {analyzer.name} analyzer: {e}")
+                continue
+            result["frame"] = session.frame_index
+            session.results[analyzer.name] = result
+            analyzed.append(analyzer.name)
+
+        response = {"frame": session.frame_index, "analyzed": analyzed, "results": dict(session.results)}
+        if context["events"]:
+            # Sent once, unlike results which repeat until the next analysis
+            response["events"] = context["events"]
+        return response
+
+    def draw(self, frame, session):
+        """Draw every analyzer's last result on the frame (modified in place)"""
+        for analyzer in self.analyzers:
+            frame = analyzer.draw(frame, session.analysis[analyzer.name])
+        return frame
+
+    def end_session(self, session):
+        if session.analysis is None:
+            return
+        for analyzer in self.analyzers:
+            try:
+                analyzer.end_session(session.analysis[analyzer.name], session)
+            except Exception as e:
+                logger.error(f"Error closing {analyzer.name} analyzer of {session.sid}: {e}")
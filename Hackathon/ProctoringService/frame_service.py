@@ -0,0 +1,190 @@
+import os
+import logging
+import eventlet
+from flask import jsonify
+from service_paths import FACE_SERVICE_DIR, OBJECT_SERVICE_DIR
+from face_recognizer import FaceRecognizer, DB_CONFIG
+from exam_galleries import ExamGalleries
+from gallery_feed import GalleryChangeFeed
+from alert_writer import AlertWriter
+from metrics import Metrics
+from sessions import SessionStore
+from gaze import GazeAnalyzer as GazeChecks
+from inference_pool import InferencePool
+from session_services import SessionServices, decode_frame, encode_frame
+from objectDetection import DetectorPool, download_model
+from analyzers import FaceAnalyzer, GazeAnalyzer, ObjectAnalyzer, FramePipeline, ProctoringSession
+from detection_config import inference_size_from_env, event_options_from_env
+from prefork import service_app
+
+# Set up logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("ProctoringService")
+
+# Served alone or by the pre-fork server: python -m prefork proctoring
+WORKER, sio, app = service_app(__name__)
+
+# Per-stage latency histograms, served on /metrics (METRICS_ENABLED=0 turns them off)
+metrics = Metrics(enabled=os.getenv('METRICS_ENABLED', '1') != '0')
+
+# Photo changes recorded by AcademGuard are applied to the live gallery
+gallery_feed = GalleryChangeFeed(DB_CONFIG)
+GALLERY_FEED_INTERVAL = float(os.getenv('GALLERY_FEED_INTERVAL', 5))
+try:
+    gallery_feed.mark()
+except Exception as e:
+    logger.warning(f"Gallery change feed unavailable until the database is reachable: {e}")
+
+# Models are loaded once and shared by all sessions; the embedding cache and
+# the detection model are the ones of the face and object services.
+# Pre-forked workers share a gallery loaded before the fork
+recognizer = FaceRecognizer(students_dir=os.path.join(FACE_SERVICE_DIR, "students_database"), threshold=0.7,
+                            store_path=os.path.join(FACE_SERVICE_DIR, "embeddings_store"), metrics=metrics,
+                            background_load=os.getenv('GALLERY_BACKGROUND_LOAD', '1') != '0' and not WORKER.workers,
+                            quantize=os.getenv('FACENET_QUANTIZE') or None)
+DETECTOR_MODEL_PATH = os.path.join(OBJECT_SERVICE_DIR, 'efficientdet_lite0.tflite')
+# MediaPipe detectors run their own threads: created per process by start_worker
+detector_pool = None
+
+# Sessions of an exam only match against the students registered for it
+exam_galleries = ExamGalleries(recognizer.gallery, DB_CONFIG,
+                               capacity=int(os.getenv('EXAM_GALLERY_CAPACITY', 16)))
+EXAM_PREWARM_MINUTES = int(os.getenv('EXAM_PREWARM_MINUTES', 30))
+
+# Cheating intervals are written to the alerts table in batches
+alert_writer = AlertWriter(DB_CONFIG, max_batch=int(os.getenv('ALERT_BATCH_SIZE', 50)),
+                           flush_interval=float(os.getenv('ALERT_FLUSH_INTERVAL', 10)))
+
+# Frames are analyzed in worker threads so a slow frame never stalls other
+# clients (the pool is created by start_worker)
+INFERENCE_WORKERS = int(os.getenv('INFERENCE_WORKERS', 2))
+inference_pool = None
+
+sessions = SessionStore(idle_timeout=300, metrics=metrics, session_class=ProctoringSession, recognition_options={
+    'change_threshold': float(os.getenv('RECOGNITION_CHANGE_THRESHOLD', 6.0)),
+    'max_interval': int(os.getenv('RECOGNITION_MAX_INTERVAL', 10))
+})
+EVICTION_INTERVAL = 60  # Seconds between idle session sweeps
+
+# Exam scoping, alerts, gallery upkeep and the frame loop of the sessions
+services = SessionServices(sio, sessions, recognizer, exam_galleries, alert_writer, gallery_feed,
+                           prewarm_minutes=EXAM_PREWARM_MINUTES, eviction_interval=EVICTION_INTERVAL,
+                           feed_interval=GALLERY_FEED_INTERVAL)
+
+# Detects objects on the pool start_worker creates, with the settings of the object service
+object_analyzer = ObjectAnalyzer(None, inference_size=inference_size_from_env(),
+                                 every=int(os.getenv('OBJECTS_EVERY', 5)), event_options=event_options_from_env())
+
+# Analyzers in run order, each on one frame out of N; gaze counts only the
+# frames the faces were analyzed on, reusing their MTCNN landmarks
+pipeline = FramePipeline([
+    FaceAnalyzer(recognizer, services.find_faces, every=int(os.getenv('FACE_EVERY', 3))),
+    GazeAnalyzer(GazeChecks(), services.record_cheating, every=int(os.getenv('GAZE_EVERY', 1))),
+    object_analyzer
+])
+# Ended sessions go through every analyzer (the gaze analyzer records the open cheating interval)
+services.end_session = pipeline.end_session
+
+@app.route('/stats')
+def stats():
+    return jsonify({
+        **services.stats(),
+        "analyzers": {analyzer.name: {"every": analyzer.every} for analyzer in pipeline.analyzers},
+        "detectors_busy": detector_pool.busy
+    })
+
+@app.route('/metrics')
+def stage_metrics():
+    """Latency percentiles per stage (decode, each analyzer, encode), server-wide and per session"""
+    return jsonify({
+        "enabled": metrics.enabled,
+        "global": metrics.summary(),
+        "sessions": {session.sid: session.metrics.summary() for session in sessions.all()}
+    })
+
+@sio.on('connect')
+def connect(sid, environ):
+    pipeline.start_session(services.connect(sid, environ))
+    logger.info(f"Client connected: {sid} ({len(sessions)} active sessions)")
+
+@sio.on('config')
+def handle_config(sid, data):
+    session = sessions.get(sid)
+    settings = services.configure(session, data)
+    try:
+        settings.update(pipeline.configure(session, data))
+    except (TypeError, ValueError) as e:
+        return {"status": "error", "message": str(e)}
+    return {"status": "success", **settings}
+
+def process_frame(session, image):
+    """
+    Decode one frame and run the analyzers due on it (runs in an inference worker)
+
+    Returns:
+        dict: The merged response to send, or None if the frame could not be decoded
+    """
+    timers = session.metrics
+    with timers.time('decode'):
+        frame, session.binary = decode_frame(image)
+    if frame is None:
+        return None
+
+    # Frame numbers of the cheating intervals; sampling is up to the analyzers
+    session.monitor.next_frame()
+    response = pipeline.process(frame, session, timers)
+    response["is_cheating"] = session.monitor.is_cheating
+
+    if session.annotated:
+        # Encode frame to send back, as raw bytes to clients that send binary frames
+        with timers.time('encode'):
+            response["image"] = encode_frame(pipeline.draw(frame, session), session.binary)
+    return response
+
+@sio.on('frame')
+def handle_frame(sid, data):
+    # One merged result per frame for all checks
+    services.serve_frame(sid, data["image"], process_frame)
+
+@sio.on('disconnect')
+def disconnect(sid):
+    services.disconnect(sid)
+
+def warm_up():
+    """Pre-fork server hook: run FaceNet and MTCNN once and fetch the detection model before the fork"""
+    recognizer.warm_up()
+    download_model(DETECTOR_MODEL_PATH)
+
+def start_worker():
+    """
+    Start the threads, detectors and background tasks of a serving process,
+    then warm them up
+
+    Called by __main__, or in each worker of the pre-fork server: threads
+    started before a fork do not exist in the forked workers.
+    """
+    global detector_pool, inference_pool
+    recognizer.enable_batching(max_batch_size=int(os.getenv('EMBED_BATCH_SIZE', 32)),
+                               max_wait_ms=float(os.getenv('EMBED_BATCH_WAIT_MS', 10)))
+    detector_pool = DetectorPool(size=WORKER.pool_size('DETECTOR_POOL_SIZE'), model_path=DETECTOR_MODEL_PATH,
+                                 score_threshold=0.5, max_results=5)
+    object_analyzer.detector_pool = detector_pool
+    inference_pool = InferencePool(workers=INFERENCE_WORKERS, torch_threads=WORKER.torch_threads(INFERENCE_WORKERS))
+    services.start(inference_pool)
+    # Through the batcher, this process's torch threads and every detector
+    recognizer.warm_up()
+    detector_pool.warm_up()
+
+def stop_worker():
+    """Write the alerts still buffered"""
+    services.stop()
+
+if __name__ == '__main__':
+    start_worker()
+    port = int(os.getenv('PORT', 5000))
+    logger.info(f"Proctoring frame service running on port {port}")
+    try:
+        eventlet.wsgi.server(eventlet.listen(('', port)), app)
+    finally:
+        stop_worker()
@@ -0,0 +1,43 @@
+"""
+Make the face (RFAPI_DB) and object (ObjectDetectionAPI) modules, and the
+pre-fork server package, importable
+
+Both services are flat directories of modules; the proctoring service runs
+their analysis code in-process instead of receiving its own copy of the
+webcam stream. Import this module before any of theirs.
+
+A module name both directories define (their flaskws.py servers) would be
+imported from whichever comes first on sys.path: such names are refused
+instead of resolving to either service by accident.
+"""
+import os
+import sys
+
+HACKATHON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FACE_SERVICE_DIR = os.path.join(HACKATHON_DIR, 'RFAPI_DB')
+OBJECT_SERVICE_DIR = os.path.join(HACKATHON_DIR, 'ObjectDetectionAPI')
+
+def module_names(directory):
+    return {name[:-3] for name in os.listdir(directory) if name.endswith('.py')}
+
+class AmbiguousModuleFinder:
+    """Import hook refusing the modules defined by more than one service directory"""
+
+    def __init__(self, names):
+        self.names = names
+
+    def find_spec(self, name, path=None, target=None):
+        if name in self.names:
+            raise ImportError(f"{name} is defined by both {FACE_SERVICE_DIR} and {OBJECT_SERVICE_DIR}: "
+                              f"run it from its own service directory", name=name)
+        return None
+
+for path in (OBJECT_SERVICE_DIR, FACE_SERVICE_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+if HACKATHON_DIR not in sys.path:
+    sys.path.append(HACKATHON_DIR)
+
+AMBIGUOUS_MODULES = module_names(FACE_SERVICE_DIR) & module_names(OBJECT_SERVICE_DIR)
+if not any(isinstance(finder, AmbiguousModuleFinder) for finder in sys.meta_path):
+    sys.meta_path.insert(0, AmbiguousModuleFinder(AMBIGUOUS_MODULES))
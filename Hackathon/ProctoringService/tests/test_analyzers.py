@@ -0,0 +1,120 @@
+import unittest
+from contextlib import contextmanager
+import numpy as np
+from analyzers import Analyzer, FramePipeline, ObjectAnalyzer, ProctoringSession
+from metrics import Metrics
+
+class CountingAnalyzer(Analyzer):
+    def __init__(self, name, every=1, requires=(), provides=None):
+        super().__init__(every)
+        self.name = name
+        self.requires = requires
+        self.provides = provides
+        self.frames = []
+
+    def analyze(self, frame, state, session, context):
+        self.frames.append(session.frame_index)
+        if self.provides:
+            context[self.provides] = True
+        return {"calls": len(self.frames)}
+
+class FailingAnalyzer(Analyzer):
+    name = "failing"
+
+    def analyze(self, frame, state, session, context):
+        raise RuntimeError("model crashed")
+
+class FakeDetectorPool:
+    def __init__(self, detections):
+        self.detections = detections
+
+    @contextmanager
+    def acquire(self):
+        yield self
+
+    def detect(self, frame, exclude_categories=None, preprocessor=None):
+        return self.detections
+
+class TestFramePipeline(unittest.TestCase):
+    def setUp(self):
+        self.frame = np.zeros((48, 64, 3), np.uint8)
+        self.timers = Metrics(enabled=False)
+
+    def run_frames(self, pipeline, session, count):
+        return [pipeline.process(self.frame, session, self.timers) for _ in range(count)]
+
+    def test_sampling_rates(self):
+        """Test each analyzer runs on its own share of the frames"""
+        every_frame = CountingAnalyzer("a")
+        third = CountingAnalyzer("b", every=3)
+        pipeline = FramePipeline([every_frame, third])
+        responses = self.run_frames(pipeline, ProctoringSession("sid"), 6)
+        self.assertEqual(every_frame.frames, [1, 2, 3, 4, 5, 6])
+        self.assertEqual(third.frames, [1, 4])
+        self.assertEqual(responses[3]["analyzed"], ["a", "b"])
+        self.assertEqual(responses[4]["analyzed"], ["a"])
+
+    def test_merged_result_keeps_last_results(self):
+        """Test skipped analyzers report their last result with its frame index"""
+        pipeline = FramePipeline([CountingAnalyzer("a"), CountingAnalyzer("b", every=2)])
+        responses = self.run_frames(pipeline, ProctoringSession("sid"), 2)
+        self.assertEqual(responses[1]["frame"], 2)
+        self.assertEqual(responses[1]["analyzed"], ["a"])
+        self.assertEqual(responses[1]["results"]["a"], {"calls": 2, "frame": 2})
+        self.assertEqual(responses[1]["results"]["b"], {"calls": 1, "frame": 1})
+
+    def test_required_inputs(self):
+        """Test an analyzer only runs on frames where its inputs were computed"""
+        faces = CountingAnalyzer("faces", every=2, provides="faces")
+        gaze = CountingAnalyzer("gaze", requires=("faces",))
+        self.run_frames(FramePipeline([faces, gaze]), ProctoringSession("sid"), 4)
+        self.assertEqual(gaze.frames, [1, 3])
+
+    def test_required_inputs_sampling(self):
+        """Test an analyzer with requirements samples the frames where they were computed"""
+        faces = CountingAnalyzer("faces", every=3, provides="faces")
+        gaze = CountingAnalyzer("gaze", every=2, requires=("faces",))
+        self.run_frames(FramePipeline([faces, gaze]), ProctoringSession("sid"), 12)
+        self.assertEqual(faces.frames, [1, 4, 7, 10])
+        self.assertEqual(gaze.frames, [1, 7])
+
+    def test_failing_analyzer_does_not_stop_others(self):
+        """Test an analyzer error is logged and the other results still sent"""
+        counting = CountingAnalyzer("a")
+        response = FramePipeline([FailingAnalyzer(), counting]).process(self.frame, ProctoringSession("sid"),
+                                                                         self.timers)
+        self.assertEqual(response["analyzed"], ["a"])
+
+    def test_unique_names(self):
+        """Test two analyzers cannot share a name"""
+        with self.assertRaises(ValueError):
+            FramePipeline([CountingAnalyzer("a"), CountingAnalyzer("a")])
+
+    def test_object_config_is_per_session(self):
+        """Test object filters and preprocessing are configured per session"""
+        pipeline = FramePipeline([ObjectAnalyzer(detector_pool=None)])
+        first, second = ProctoringSession("a"), ProctoringSession("b")
+        settings = pipeline.configure(first, {"exclude_categories": ["Person"], "roi": [0, 0, 0.5, 0.5]})
+        pipeline.start_session(second)
+        self.assertEqual(settings["exclude_categories"], ["person"])
+        self.assertEqual(settings["roi"], (0.0, 0.0, 0.5, 0.5))
+        self.assertEqual(second.analysis["objects"]["exclude_categories"], [])
+        self.assertIsNone(second.analysis["objects"]["preprocessor"].roi)
+        with self.assertRaises(ValueError):
+            pipeline.configure(first, {"roi": [0.5, 0.5, 0.8, 0.8]})
+
+    def test_object_events_sent_once(self):
+        """Test object events appear on the frame that produced them only, detections on request"""
+        phone = {"category": "cell phone", "score": 0.9, "bbox": [0, 0, 10, 10]}
+        pipeline = FramePipeline([ObjectAnalyzer(FakeDetectorPool([phone]), every=1, event_options={"min_duration": 1.0})])
+        session = ProctoringSession("sid")
+        responses = [pipeline.process(self.frame, session, self.timers, timestamp=t) for t in (0.0, 0.5, 1.0, 1.5)]
+        self.assertEqual([len(r.get("events", [])) for r in responses], [0, 0, 1, 0])
+        self.assertEqual(responses[2]["events"][0]["event"], "appeared")
+        self.assertEqual(responses[3]["results"]["objects"], {"present": ["cell phone"], "frame": 4})
+        pipeline.configure(session, {"per_frame": True})
+        response = pipeline.process(self.frame, session, self.timers, timestamp=2.0)
+        self.assertEqual(response["results"]["objects"]["detected"], [phone])
+
+if __name__ == '__main__':
+    unittest.main()
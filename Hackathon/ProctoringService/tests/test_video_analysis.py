@@ -0,0 +1,94 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+import cv2
+import numpy as np
+from video_analysis import VideoAnalyzer, load_progress
+
+class FakeRecognizer:
+    def identify_faces(self, frame, gallery=None):
+        return [{"box": [1, 2, 3, 4], "student_id": 7, "name": "Alice", "similarity": 0.9, "recognized": True}]
+
+class FakeDetector:
+    """Sees a phone on frames whose top-left pixel is bright"""
+
+    def detect(self, frame, exclude_categories=None, preprocessor=None):
+        if frame[0, 0, 0] > 127:
+            return [{"category": "cell phone", "score": 0.9, "bbox": [0, 0, 10, 10]}]
+        return []
+
+def read_records(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+class TestVideoAnalyzer(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.video = os.path.join(self.directory, "exam.avi")
+        self.output = os.path.join(self.directory, "exam.jsonl")
+        # 10 fps, a phone from frame 20 to frame 59
+        writer = cv2.VideoWriter(self.video, cv2.VideoWriter_fourcc(*'MJPG'), 10, (64, 48))
+        for index in range(100):
+            writer.write(np.full((48, 64, 3), 255 if 20 <= index < 60 else 0, np.uint8))
+        writer.release()
+        self.analyzer = VideoAnalyzer(FakeRecognizer(), FakeDetector(), stride=2)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_strided_frames_and_events(self):
+        summary = self.analyzer.analyze(self.video, self.output)
+        self.assertEqual(summary["status"], "done")
+        self.assertEqual(summary["analyzed"], 50)
+
+        records = read_records(self.output)
+        self.assertEqual(records[0]["type"], "video")
+        self.assertEqual(records[-1]["type"], "end")
+        frames = [record for record in records if record["type"] == "frame"]
+        self.assertEqual([record["frame"] for record in frames], list(range(0, 100, 2)))
+        self.assertEqual(frames[0]["faces"][0]["name"], "Alice")
+
+        events = [event for record in frames for event in record.get("events", [])]
+        self.assertEqual([(event["event"], event["time"]) for event in events],
+                         [("appeared", 2.0), ("disappeared", 5.8)])
+
+    def test_resume_after_interruption(self):
+        self.analyzer.analyze(self.video, self.output)
+        complete = read_records(self.output)
+
+        # Cut the file in the middle of a frame line, as a killed run would
+        with open(self.output) as f:
+            lines = f.readlines()
+        with open(self.output, 'w') as f:
+            f.writelines(lines[:21])
+            f.write(lines[21][:15])
+
+        progress = load_progress(self.output)
+        self.assertEqual(len(progress["frames"]), 20)
+        self.assertIsNone(progress["end"])
+
+        summary = self.analyzer.analyze(self.video, self.output)
+        self.assertEqual(summary["resumed_at"], 39)
+        self.assertEqual(summary["analyzed"], 30)
+        resumed = read_records(self.output)
+        # Same frames and events as the uninterrupted run
+        self.assertEqual(resumed[:-1], complete[:-1])
+        self.assertEqual(resumed[-1]["analyzed"], 50)
+
+    def test_finished_video_is_skipped(self):
+        self.analyzer.analyze(self.video, self.output)
+        self.assertEqual(self.analyzer.analyze(self.video, self.output)["status"], "skipped")
+
+    def test_resume_with_other_settings_is_refused(self):
+        self.analyzer.analyze(self.video, self.output)
+        with open(self.output) as f:
+            lines = f.readlines()
+        with open(self.output, 'w') as f:
+            f.writelines(lines[:-1])
+        with self.assertRaises(ValueError):
+            VideoAnalyzer(FakeRecognizer(), FakeDetector(), stride=5).analyze(self.video, self.output)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,307 @@
+#!/usr/bin/env python
+"""
+Offline face recognition and object detection on recorded exam videos
+
+Videos are analyzed in parallel, one per worker process, each worker
+loading its own FaceRecognizer and ObjectDetector once. Every stride-th
+frame of a video is analyzed and written as one JSON line to
+<output>/<video name>.jsonl as soon as it is done:
+
+    {"type": "video", "path": ..., "fps": 25.0, "frames": 90000, "settings": {...}}
+    {"type": "frame", "frame": 250, "time": 10.0, "faces": [...], "objects": [...], "events": [...]}
+    {"type": "end", "analyzed": 18000, "events": [...], "elapsed": 812.4}
+
+Objects appear and disappear as in the live service (ObjectEventTracker,
+on video time); "events" is only present on frames that produced some.
+Running the same command again resumes each video after its last written
+frame and skips finished ones (use --restart to start over).
+
+Usage:
+    python video_analysis.py recordings/*.mp4 --output analysis/ [--stride 5] [--workers 4] [--exam-id 42]
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import cv2
+from service_paths import FACE_SERVICE_DIR, OBJECT_SERVICE_DIR
+from preprocessing import FramePreprocessor
+from object_events import ObjectEventTracker
+
+logger = logging.getLogger("VideoAnalysis")
+
+MODEL_PATH = os.path.join(OBJECT_SERVICE_DIR, 'efficientdet_lite0.tflite')
+
+def load_progress(output_path):
+    """
+    Read what an earlier run wrote for a video
+
+    A line cut short by an interruption is removed from the file.
+
+    Returns:
+        dict: header (the "video" record or None), frames (the "frame"
+            records) and end (the "end" record or None)
+    """
+    progress = {"header": None, "frames": [], "end": None}
+    if not os.path.exists(output_path):
+        return progress
+
+    valid_bytes = 0
+    with open(output_path, 'rb') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            if not line.endswith(b'\n'):
+                break
+            valid_bytes += len(line)
+            if record["type"] == "video":
+                progress["header"] = record
+            elif record["type"] == "frame":
+                progress["frames"].append(record)
+            elif record["type"] == "end":
+                progress["end"] = record
+
+    if valid_bytes < os.path.getsize(output_path):
+        logger.warning(f"Dropping an incomplete line at the end of {output_path}")
+        with open(output_path, 'r+b') as f:
+            f.truncate(valid_bytes)
+    return progress
+
+class VideoAnalyzer:
+    """Analyzes the sampled frames of one video after the other with one set of models"""
+
+    def __init__(self, recognizer=None, detector=None, gallery=None, stride=5, inference_size=320,
+                 event_options=None, settings=None):
+        """
+        Args:
+            recognizer (FaceRecognizer): Face recognizer, None to skip faces
+            detector (ObjectDetector): Object detector, None to skip objects
+            gallery (FaceGallery): Gallery to match faces against, defaults to
+                the recognizer's full gallery
+            stride (int): Analyze one frame out of `stride`
+            inference_size (int): Shorter side of the detection input, None
+                for the full frame
+            event_options (dict): ObjectEventTracker keyword arguments
+            settings (dict): Options recorded in the header; resuming a video
+                analyzed with other settings is refused
+        """
+        if stride < 1:
+            raise ValueError(f"stride must be at least 1, got {stride}")
+        self.recognizer = recognizer
+        self.detector = detector
+        self.gallery = gallery
+        self.stride = stride
+        self.inference_size = inference_size
+        self.event_options = event_options or {}
+        self.settings = {"stride": stride, "faces": recognizer is not None, "objects": detector is not None,
+                         "inference_size": inference_size, **(settings or {})}
+
+    def analyze_frame(self, frame, preprocessor):
+        """Faces and objects of one BGR frame"""
+        faces = []
+        if self.recognizer is not None:
+            faces = [
+                {"box": face["box"], "student_id": face["student_id"], "name": face["name"],
+                 "similarity": round(face["similarity"], 4), "recognized": face["recognized"]}
+                for face in self.recognizer.identify_faces(frame, self.gallery)
+            ]
+        objects = []
+        if self.detector is not None:
+            objects = self.detector.detect(frame, preprocessor=preprocessor)
+        return faces, objects
+
+    def analyze(self, video_path, output_path):
+        """
+        Analyze a video into its JSONL file, resuming an earlier run
+
+        Returns:
+            dict: Summary with the video, its status ("done", "skipped" or
+                "failed"), the frames analyzed by this run and the elapsed time
+        """
+        started = time.time()
+        summary = {"video": video_path, "output": output_path, "analyzed": 0, "resumed_at": 0}
+        progress = load_progress(output_path)
+        if progress["end"] is not None:
+            return {**summary, "status": "skipped"}
+        if progress["header"] is not None and progress["header"]["settings"] != self.settings:
+            raise ValueError(f"{output_path} was written with other settings "
+                             f"({progress['header']['settings']}), rerun with --restart")
+
+        capture = cv2.VideoCapture(video_path)
+        if not capture.isOpened():
+            return {**summary, "status": "failed", "error": "cannot open video"}
+        fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+
+        # Rebuild the object presence state from the frames already written
+        tracker = ObjectEventTracker(**self.event_options)
+        for record in progress["frames"]:
+            tracker.update(record["objects"], record["time"])
+        start_frame = progress["frames"][-1]["frame"] + 1 if progress["frames"] else 0
+        summary["resumed_at"] = start_frame
+        preprocessor = FramePreprocessor(self.inference_size)
+
+        with open(output_path, 'a', encoding='utf-8') as output:
+            def write(record):
+                output.write(json.dumps(record) + '\n')
+                output.flush()
+
+            if progress["header"] is None:
+                write({"type": "video", "path": os.path.abspath(video_path), "fps": fps,
+                       "frames": int(capture.get(cv2.CAP_PROP_FRAME_COUNT)), "settings": self.settings})
+
+            index = 0
+            try:
+                while True:
+                    # Skipped frames are only grabbed, not converted
+                    if index < start_frame or index % self.stride:
+                        if not capture.grab():
+                            break
+                        index += 1
+                        continue
+                    ok, frame = capture.read()
+                    if not ok:
+                        break
+
+                    timestamp = index / fps
+                    faces, objects = self.analyze_frame(frame, preprocessor)
+                    record = {"type": "frame", "frame": index, "time": round(timestamp, 3),
+                              "faces": faces, "objects": objects}
+                    events = tracker.update(objects, timestamp)
+                    if events:
+                        record["events"] = events
+                    # One line per frame: an interruption loses at most this frame
+                    write(record)
+                    summary["analyzed"] += 1
+                    index += 1
+                    if summary["analyzed"] % 500 == 0:
+                        logger.info(f"{video_path}: {index} frames, {summary['analyzed']} analyzed")
+            finally:
+                capture.release()
+
+            summary["elapsed"] = round(time.time() - started, 2)
+            write({"type": "end", "analyzed": len(progress["frames"]) + summary["analyzed"],
+                   "events": tracker.close(), "elapsed": summary["elapsed"]})
+        return {**summary, "status": "done"}
+
+# Models of a worker process, created once by init_worker
+worker_analyzer = None
+# Ctrl+C reaches every process of the group; an interrupted worker takes no new video
+worker_interrupted = False
+
+def build_analyzer(options):
+    """VideoAnalyzer with the models selected by the command line options"""
+    import torch
+
+    # Workers split the CPU instead of each using every core
+    torch.set_num_threads(options["threads"])
+
+    recognizer = detector = gallery = None
+    if options["faces"]:
+        from face_recognizer import FaceRecognizer, DB_CONFIG
+        recognizer = FaceRecognizer(students_dir=os.path.join(FACE_SERVICE_DIR, "students_database"),
+                                    threshold=options["threshold"],
+                                    store_path=os.path.join(FACE_SERVICE_DIR, "embeddings_store"))
+        if options["exam_id"] is not None:
+            from exam_galleries import ExamGalleries
+            gallery = ExamGalleries(recognizer.gallery, DB_CONFIG, capacity=1).get(options["exam_id"])
+    if options["objects"]:
+        from objectDetection import ObjectDetector
+        detector = ObjectDetector(model_path=MODEL_PATH, score_threshold=options["score_threshold"])
+
+    return VideoAnalyzer(recognizer, detector, gallery, stride=options["stride"],
+                         inference_size=options["inference_size"],
+                         settings={"threshold": options["threshold"], "exam_id": options["exam_id"],
+                                   "score_threshold": options["score_threshold"]})
+
+def init_worker(options):
+    global worker_analyzer
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(processName)s - %(levelname)s - %(message)s')
+    worker_analyzer = build_analyzer(options)
+
+def analyze_in_worker(video_path, output_path):
+    global worker_interrupted
+    if worker_interrupted:
+        return {"video": video_path, "output": output_path, "status": "interrupted"}
+    try:
+        return worker_analyzer.analyze(video_path, output_path)
+    except KeyboardInterrupt:
+        worker_interrupted = True
+        return {"video": video_path, "output": output_path, "status": "interrupted"}
+    except Exception as e:
+        logger.error(f"Error analyzing {video_path}: {e}")
+        return {"video": video_path, "output": output_path, "status": "failed", "error": str(e)}
+
+def output_paths(videos, output_dir):
+    """JSONL file of each video, named after it"""
+    paths = {}
+    for video in videos:
+        path = os.path.join(output_dir, os.path.splitext(os.path.basename(video))[0] + '.jsonl')
+        if path in paths.values():
+            raise ValueError(f"Two videos would be written to {path}, rename one of them")
+        paths[video] = path
+    return paths
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('videos', nargs='+', help="Video files")
+    parser.add_argument('--output', required=True, help="Directory of the JSONL results")
+    parser.add_argument('--stride', type=int, default=5, help="Analyze one frame out of N")
+    parser.add_argument('--workers', type=int, default=0, help="Worker processes (default: CPU count, at most one per video)")
+    parser.add_argument('--threshold', type=float, default=0.7, help="Face recognition threshold")
+    parser.add_argument('--exam-id', type=int, help="Match faces against the students of this exam only")
+    parser.add_argument('--score-threshold', type=float, default=0.5, help="Minimum object detection score")
+    parser.add_argument('--inference-size', type=int, default=320, help="Shorter side of the detection input, 0 for full frames")
+    parser.add_argument('--no-faces', action='store_true')
+    parser.add_argument('--no-objects', action='store_true')
+    parser.add_argument('--restart', action='store_true', help="Discard earlier results instead of resuming")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(processName)s - %(levelname)s - %(message)s')
+    if args.stride < 1:
+        parser.error("--stride must be at least 1")
+    if args.no_faces and args.no_objects:
+        parser.error("nothing to analyze with both --no-faces and --no-objects")
+
+    os.makedirs(args.output, exist_ok=True)
+    outputs = output_paths(args.videos, args.output)
+    if args.restart:
+        for path in outputs.values():
+            if os.path.exists(path):
+                os.remove(path)
+
+    workers = min(args.workers or os.cpu_count() or 1, len(args.videos))
+    options = {
+        "faces": not args.no_faces, "objects": not args.no_objects, "stride": args.stride,
+        "threshold": args.threshold, "exam_id": args.exam_id, "score_threshold": args.score_threshold,
+        "inference_size": args.inference_size or None, "threads": max(1, (os.cpu_count() or 1) // workers)
+    }
+    if options["objects"]:
+        # Downloaded once here rather than by every worker
+        from objectDetection import download_model
+        download_model(MODEL_PATH)
+
+    logger.info(f"Analyzing {len(args.videos)} videos with {workers} workers")
+    failed = 0
+    # Spawned workers start clean instead of inheriting the parent's threads
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=init_worker, initargs=(options,)) as pool:
+        futures = [pool.submit(analyze_in_worker, video, path) for video, path in outputs.items()]
+        try:
+            for future in as_completed(futures):
+                summary = future.result()
+                failed += summary["status"] == "failed"
+                logger.info(json.dumps(summary))
+        except KeyboardInterrupt:
+            logger.warning("Interrupted, run the same command again to resume")
+            pool.shutdown(wait=False, cancel_futures=True)
+            sys.exit(130)
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
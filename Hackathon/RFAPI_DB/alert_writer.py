@@ -0,0 +1,138 @@
+import threading
+import logging
+from collections import deque
+from datetime import datetime
+import mysql.connector
+
+logger = logging.getLogger(__name__)
+
+class AlertWriter:
+    """
+    Write-behind buffer turning cheating intervals into alerts rows
+
+    Intervals are queued in memory and written by a background thread in
+    one multi-row INSERT once max_batch alerts are waiting or flush_interval
+    seconds went by. The queue is bounded: if the database stays down, the
+    oldest pending alerts are dropped (and counted) instead of growing
+    without limit. Failed batches are put back and retried on the next flush.
+    """
+
+    INSERT = ("INSERT INTO alerts (student_id, exam_id, type, timestamp, description) "
+              "VALUES (%s, %s, %s, %s, %s)")
+
+    def __init__(self, db_config, max_batch=50, flush_interval=10.0, max_pending=10000):
+        """
+        Args:
+            db_config (dict): mysql.connector connection arguments
+            max_batch (int): Pending alerts that trigger an immediate flush
+            flush_interval (float): Longest time in seconds an alert waits
+            max_pending (int): Maximum number of alerts kept while unwritten
+        """
+        self.db_config = db_config
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self._pending = deque(maxlen=max_pending)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._running = False
+
+        # Statistics
+        self.written = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.failures = 0
+
+    def __len__(self):
+        return len(self._pending)
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="AlertWriter", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the writer thread after a last flush"""
+        if not self._running:
+            return
+        self._running = False
+        self._wakeup.set()
+        self._thread.join()
+
+    def add(self, student_id, exam_id, interval, alert_type='looking_away'):
+        """
+        Queue one cheating interval (see ExamMonitoring.end_cheating)
+
+        Args:
+            student_id: Student of the session
+            exam_id: Exam of the session
+            interval (dict): start/end frames and wall-clock times
+            alert_type (str): alerts.type value
+        """
+        seconds = interval["ended_at"] - interval["started_at"]
+        description = (f"Not looking at the screen for {seconds:.0f} s "
+                       f"(frames {interval['start_frame']}-{interval['end_frame']})")
+        row = (student_id, exam_id, alert_type, datetime.fromtimestamp(interval["started_at"]), description)
+        with self._lock:
+            if len(self._pending) == self._pending.maxlen:
+                self.dropped += 1
+            self._pending.append(row)
+            full = len(self._pending) >= self.max_batch
+        if full:
+            self._wakeup.set()
+
+    def flush(self):
+        """
+        Write every pending alert in one multi-row INSERT
+
+        Returns:
+            int: Number of alerts written
+        """
+        with self._lock:
+            rows = list(self._pending)
+            self._pending.clear()
+        if not rows:
+            return 0
+
+        try:
+            conn = mysql.connector.connect(**self.db_config)
+            try:
+                cursor = conn.cursor()
+                # executemany folds a simple INSERT ... VALUES into one statement
+                cursor.executemany(self.INSERT, rows)
+                conn.commit()
+                cursor.close()
+            finally:
+                conn.close()
+        except Exception as e:
+            logger.error(f"Error writing {len(rows)} alerts, will retry: {e}")
+            with self._lock:
+                # Put the batch back in front of newer alerts, within the bound
+                room = self._pending.maxlen - len(self._pending)
+                self.dropped += max(0, len(rows) - room)
+                self._pending.extendleft(reversed(rows[len(rows) - room:] if room < len(rows) else rows))
+                self.failures += 1
+            return 0
+
+        with self._lock:
+            self.written += len(rows)
+            self.flushes += 1
+        return len(rows)
+
+    def _run(self):
+        while self._running:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+        self.flush()
+
+    def stats(self):
+        return {
+            "pending": len(self._pending),
+            "written": self.written,
+            "flushes": self.flushes,
+            "failures": self.failures,
+            "dropped": self.dropped
+        }
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+"""
+Compare approximate gallery search with exact search
+
+Builds a synthetic gallery of 512-d unit embeddings grouped around a few
+hundred centers (faces are not uniformly spread in embedding space), then
+queries it with noisy copies of gallery entries, one face per query as in
+the recognition path. Reports recall@1 against exact search and queries
+per second for each nprobe value.
+
+Usage:
+    python benchmark_gallery_index.py [--size 50000] [--nprobe 1 4 8 16 32] [--json out.json]
+"""
+import json
+import time
+import argparse
+import numpy as np
+from gallery import FaceGallery
+from gallery_index import IVFIndex
+
+def synthetic_embeddings(size, dim, clusters, spread, rng):
+    """Unit vectors scattered around `clusters` random centers"""
+    centers = FaceGallery.normalize(rng.normal(size=(clusters, dim)))
+    vectors = centers[rng.integers(clusters, size=size)] + spread * rng.normal(size=(size, dim)) / np.sqrt(dim)
+    return FaceGallery.normalize(vectors)
+
+def build(embeddings, index=None):
+    """Fill a gallery one insert at a time, as load_known_faces does"""
+    gallery = FaceGallery(dim=embeddings.shape[1], capacity=len(embeddings), index=index)
+    start = time.perf_counter()
+    for key, embedding in enumerate(embeddings):
+        gallery.add(key, str(key), embedding)
+    return gallery, time.perf_counter() - start
+
+def run_queries(gallery, queries):
+    """Best key of each query and the achieved queries per second"""
+    start = time.perf_counter()
+    best = [gallery.match(query, k=2)[0][0][0] for query in queries]
+    return np.asarray(best), len(queries) / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the IVF gallery index against exact search")
+    parser.add_argument('--size', type=int, default=50000, help="Number of gallery embeddings")
+    parser.add_argument('--dim', type=int, default=512, help="Embedding dimension")
+    parser.add_argument('--queries', type=int, default=1000, help="Number of queries")
+    parser.add_argument('--clusters', type=int, default=200, help="Number of synthetic embedding clusters")
+    parser.add_argument('--spread', type=float, default=3.0, help="Spread of the embeddings around their cluster")
+    parser.add_argument('--noise', type=float, default=0.8, help="Query noise relative to the gallery entry")
+    parser.add_argument('--nlist', type=int, default=None, help="IVF cells (default sqrt(size))")
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 4, 8, 16, 32], help="Cells scanned per query")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', default=None, help="Also write the report to this file")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    embeddings = synthetic_embeddings(args.size, args.dim, args.clusters, args.spread, rng)
+    targets = rng.integers(args.size, size=args.queries)
+    queries = FaceGallery.normalize(embeddings[targets] + args.noise * rng.normal(size=(args.queries, args.dim)) / np.sqrt(args.dim))
+
+    exact, exact_build = build(embeddings)
+    truth, exact_qps = run_queries(exact, queries)
+    print(f"Gallery: {args.size} x {args.dim}, {args.queries} queries")
+    print(f"{'exact':>10}: build {exact_build:6.2f} s   {exact_qps:9.1f} q/s   "
+          f"recall@1 1.000   (query's own entry found {np.mean(truth == targets):.3f})")
+
+    index = IVFIndex(nlist=args.nlist, min_train_size=min(1024, args.size))
+    approximate, ivf_build = build(embeddings, index)
+    report = {
+        "size": args.size,
+        "dim": args.dim,
+        "queries": args.queries,
+        "exact": {"build_s": exact_build, "qps": exact_qps},
+        "ivf": {"build_s": ivf_build, "nlist": len(index.centroids), "runs": []}
+    }
+    for nprobe in args.nprobe:
+        index.nprobe = nprobe
+        found, qps = run_queries(approximate, queries)
+        recall = float(np.mean(found == truth))
+        report["ivf"]["runs"].append({"nprobe": nprobe, "recall_at_1": recall, "qps": qps,
+                                      "speedup": qps / exact_qps})
+        print(f"{'nprobe ' + str(nprobe):>10}: build {ivf_build:6.2f} s   {qps:9.1f} q/s   "
+              f"recall@1 {recall:.3f}   speedup {qps / exact_qps:5.1f}x")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+"""
+Compare the landmark gaze stage with the previous Haar cascade heuristic
+
+Runs both on the frames of a video (or a directory of images) and reports
+the per-frame latency of each and how often their looking-at-screen
+decisions agree. The MTCNN detection that feeds the landmark stage is
+timed separately since the recognition pass already pays for it.
+
+Usage:
+    python benchmark_gaze.py --video exam.mp4 [--max-frames 500] [--json out.json]
+"""
+import os
+import json
+import time
+import argparse
+import cv2
+import numpy as np
+from PIL import Image
+from facenet_pytorch import MTCNN
+from gaze import GazeAnalyzer
+from sessions import ExamMonitoring
+
+def read_frames(video=None, images=None, max_frames=None):
+    """Yield BGR frames from a video file or an image directory"""
+    count = 0
+    if video:
+        capture = cv2.VideoCapture(video)
+        while max_frames is None or count < max_frames:
+            ok, frame = capture.read()
+            if not ok:
+                break
+            count += 1
+            yield frame
+        capture.release()
+    else:
+        for name in sorted(os.listdir(images)):
+            if max_frames is not None and count >= max_frames:
+                break
+            frame = cv2.imread(os.path.join(images, name))
+            if frame is not None:
+                count += 1
+                yield frame
+
+def haar_looking_at_screen(frame, monitor, face_cascade=None, eye_cascade=None):
+    """
+    The previous flaskws heuristic, kept verbatim for comparison
+
+    When no cascades are passed they are parsed from disk on every call, as
+    the server used to do.
+    """
+    looking_at_screen = False
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    if face_cascade is None:
+        face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+    if eye_cascade is None:
+        eye_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
+
+    faces = face_cascade.detectMultiScale(gray, 1.1, 4)
+    frame_height, frame_width = frame.shape[:2]
+    face_detected = len(faces) > 0
+    eyes_detected = False
+
+    for (x, y, w, h) in faces:
+        roi_gray = gray[y:y+h, x:x+w]
+        eyes = eye_cascade.detectMultiScale(roi_gray, 1.1, 2, minSize=(20, 20))
+        if len(eyes) > 0:
+            eyes_detected = True
+            face_center_x = x + w // 2
+            eye_centers = sorted(((x + ex + ew // 2, y + ey + eh // 2) for (ex, ey, ew, eh) in eyes),
+                                 key=lambda e: e[0])
+            if len(eye_centers) >= 2:
+                left_eye, right_eye = eye_centers[0], eye_centers[1]
+                eye_distance = right_eye[0] - left_eye[0]
+                eye_slope = abs(right_eye[1] - left_eye[1]) / (eye_distance + 0.01)
+                face_size_ratio = (w * h) / (frame_width * frame_height)
+                face_centered = (x > frame_width * 0.1 and x + w < frame_width * 0.9)
+                if (eye_slope < 0.4 and face_size_ratio > 0.01 and face_centered and eye_distance > 10):
+                    monitor.looking_at_screen_count += 1
+                    if monitor.looking_at_screen_count >= 2:
+                        looking_at_screen = True
+                else:
+                    monitor.looking_at_screen_count = max(0, monitor.looking_at_screen_count - 1)
+                    if monitor.looking_at_screen_count < 2:
+                        looking_at_screen = False
+            elif len(eye_centers) == 1 and frame_width * 0.25 < face_center_x < frame_width * 0.75:
+                looking_at_screen = True
+
+    if not eyes_detected:
+        monitor.looking_at_screen_count = max(0, monitor.looking_at_screen_count - 2)
+    if not face_detected:
+        looking_at_screen = False
+        monitor.looking_at_screen_count = 0
+    return looking_at_screen
+
+def summarize(samples):
+    """Mean and percentiles of a list of durations in seconds, in milliseconds"""
+    values = np.asarray(samples) * 1000
+    return {
+        "mean_ms": float(values.mean()),
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "max_ms": float(values.max())
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the landmark gaze stage against Haar cascades")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--video', help="Video file to read frames from")
+    source.add_argument('--images', help="Directory of frame images")
+    parser.add_argument('--max-frames', type=int, default=None, help="Stop after this many frames")
+    parser.add_argument('--json', default=None, help="Also write the report to this file")
+    args = parser.parse_args()
+
+    detector = MTCNN(image_size=160, margin=0, min_face_size=20,
+                     thresholds=[0.6, 0.7, 0.7], factor=0.709, post_process=True, device='cpu')
+    analyzer = GazeAnalyzer()
+    face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+    eye_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
+
+    haar_reload_monitor, haar_cached_monitor, landmark_monitor = ExamMonitoring(), ExamMonitoring(), ExamMonitoring()
+    timings = {"haar_reload": [], "haar_cached": [], "mtcnn_detect": [], "landmark_gaze": []}
+    agreements = 0
+    frames = 0
+
+    for frame in read_frames(args.video, args.images, args.max_frames):
+        frames += 1
+
+        start = time.perf_counter()
+        haar_result = haar_looking_at_screen(frame, haar_reload_monitor)
+        timings["haar_reload"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        haar_looking_at_screen(frame, haar_cached_monitor, face_cascade, eye_cascade)
+        timings["haar_cached"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        pil_img = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        boxes, _, landmarks = detector.detect(pil_img, landmarks=True)
+        timings["mtcnn_detect"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        faces = [] if boxes is None else [
+            {"box": [int(b) for b in box], "landmarks": points.tolist()}
+            for box, points in zip(boxes, landmarks)
+        ]
+        gaze = analyzer.analyze(faces, frame.shape)
+        landmark_result = landmark_monitor.update_gaze(gaze["face_detected"], gaze["checks"])
+        timings["landmark_gaze"].append(time.perf_counter() - start)
+
+        agreements += int(haar_result == landmark_result)
+
+    if frames == 0:
+        parser.error("no frames could be read")
+
+    report = {
+        "frames": frames,
+        "latency": {stage: summarize(samples) for stage, samples in timings.items()},
+        "agreement": agreements / frames
+    }
+
+    print(f"Frames analyzed: {frames}")
+    for stage, stats in report["latency"].items():
+        print(f"{stage:>14}: mean {stats['mean_ms']:8.2f} ms   p50 {stats['p50_ms']:8.2f} ms   "
+              f"p95 {stats['p95_ms']:8.2f} ms")
+    print(f"Agreement with the Haar heuristic: {report['agreement'] * 100:.1f}%")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+"""
+Build or refresh the persistent embedding store ahead of time
+
+Only photos that are new or changed since the last run are embedded, so
+running this before an exam makes the websocket server start instantly.
+"""
+import argparse
+import logging
+from embedding_store import EmbeddingStore
+from face_recognizer import FaceRecognizer
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or refresh the face embedding store")
+    parser.add_argument('--store', default='embeddings_store', help="Directory of the embedding store")
+    parser.add_argument('--device', default=None, help="Device to use ('cpu' or 'cuda')")
+    parser.add_argument('--rebuild', action='store_true', help="Discard the store and embed every photo again")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    if args.rebuild:
+        print(f"Discarding existing store at {args.store}")
+        EmbeddingStore(args.store).clear()
+
+    # Constructing the recognizer loads the gallery and refreshes the store
+    recognizer = FaceRecognizer(device=args.device, store_path=args.store)
+    print(f"Embedding store ready: {len(recognizer.store)} students, "
+          f"{len(recognizer.gallery)} faces in {args.store}")
+
+if __name__ == "__main__":
+    main()
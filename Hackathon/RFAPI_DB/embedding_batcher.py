@@ -0,0 +1,155 @@
+import time
+import queue
+import threading
+import logging
+from collections import deque
+from concurrent.futures import Future
+import numpy as np
+import torch
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingBatcher:
+    """
+    Micro-batching scheduler in front of the FaceNet recognizer
+
+    Callers from any thread submit their aligned face crops and block until
+    their embeddings are ready. A dedicated thread gathers pending crops
+    across callers and runs one forward pass as soon as max_batch_size faces
+    are waiting or the oldest request has waited max_wait_ms.
+    """
+
+    def __init__(self, model, device='cpu', max_batch_size=32, max_wait_ms=10, history=1000):
+        """
+        Args:
+            model: InceptionResnetV1 instance (in eval mode)
+            device (str): Device the model runs on
+            max_batch_size (int): Faces per forward pass that trigger a flush
+            max_wait_ms (float): Longest time a request waits for companions
+            history (int): Number of recent requests kept for latency statistics
+        """
+        self.model = model
+        self.device = device
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._requests = queue.Queue()
+        self._thread = None
+        self._running = False
+
+        # Statistics
+        self._lock = threading.Lock()
+        self._started_at = time.monotonic()
+        self._batches = 0
+        self._faces = 0
+        self._busy_time = 0.0
+        self._latencies = deque(maxlen=history)  # submit -> result, seconds
+        self._batch_sizes = deque(maxlen=history)
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="EmbeddingBatcher", daemon=True)
+        self._thread.start()
+        logger.info(f"Embedding batcher started (max batch {self.max_batch_size}, "
+                    f"max wait {self.max_wait * 1000:.0f} ms)")
+
+    def stop(self):
+        if not self._running:
+            return
+        self._running = False
+        self._requests.put(None)
+        self._thread.join()
+
+    def embed(self, faces):
+        """
+        Embed a batch of aligned faces together with other callers' faces
+
+        Args:
+            faces (torch.Tensor): n x 3 x 160 x 160 face tensor
+
+        Returns:
+            torch.Tensor: n x 512 embeddings on the CPU
+        """
+        future = Future()
+        self._requests.put((faces, future, time.monotonic()))
+        return future.result()
+
+    def _collect(self):
+        """Block for the first request, then gather more until size or deadline"""
+        first = self._requests.get()
+        if first is None:
+            return None
+        batch = [first]
+        count = len(first[0])
+        deadline = first[2] + self.max_wait
+        while count < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request is None:
+                self._running = False
+                break
+            batch.append(request)
+            count += len(request[0])
+        return batch
+
+    def _run(self):
+        while self._running:
+            batch = self._collect()
+            if batch is None:
+                break
+
+            start = time.monotonic()
+            try:
+                with torch.no_grad():
+                    embeddings = self.model(torch.cat([faces for faces, _, _ in batch]).to(self.device)).cpu()
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            done = time.monotonic()
+
+            # Hand each caller back its own slice
+            offset = 0
+            for faces, future, submitted in batch:
+                future.set_result(embeddings[offset:offset + len(faces)])
+                offset += len(faces)
+
+            with self._lock:
+                self._batches += 1
+                self._faces += offset
+                self._busy_time += done - start
+                self._batch_sizes.append(offset)
+                self._latencies.extend(done - submitted for _, _, submitted in batch)
+
+        # Fail whatever is still queued so no caller blocks forever
+        while True:
+            try:
+                request = self._requests.get_nowait()
+            except queue.Empty:
+                break
+            if request is not None:
+                request[1].set_exception(RuntimeError("embedding batcher stopped"))
+
+    def stats(self):
+        """Throughput and latency statistics"""
+        with self._lock:
+            latencies = np.asarray(self._latencies) * 1000
+            elapsed = time.monotonic() - self._started_at
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "batches": self._batches,
+                "faces": self._faces,
+                "mean_batch_size": float(np.mean(self._batch_sizes)) if self._batch_sizes else 0.0,
+                "faces_per_second": self._faces / elapsed if elapsed > 0 else 0.0,
+                "model_utilization": self._busy_time / elapsed if elapsed > 0 else 0.0,
+                "latency_p50_ms": float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+                "latency_p95_ms": float(np.percentile(latencies, 95)) if len(latencies) else 0.0,
+                "latency_max_ms": float(latencies.max()) if len(latencies) else 0.0
+            }
@@ -0,0 +1,165 @@
+import os
+import json
+import shutil
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingStore:
+    """
+    On-disk cache of gallery embeddings keyed by student id and photo hash.
+
+    The store is a directory holding `embeddings.npy` (an N x dim float32
+    matrix, opened memory-mapped) and `index.json` (one entry per row with
+    the student id, display name, photo hash and whether a face was found).
+    """
+
+    INDEX_FILE = 'index.json'
+    EMBEDDINGS_FILE = 'embeddings.npy'
+
+    def __init__(self, path='embeddings_store', dim=512):
+        """
+        Args:
+            path (str): Directory of the store
+            dim (int): Embedding dimension
+        """
+        self.path = path
+        self.dim = dim
+        self._entries = {}  # student_id -> {"name", "photo_hash", "embedding"}
+        self._dirty = False
+
+    def __len__(self):
+        return len(self._entries)
+
+    def load(self):
+        """Load the store from disk if it exists. Returns the number of entries"""
+        index_path = os.path.join(self.path, self.INDEX_FILE)
+        embeddings_path = os.path.join(self.path, self.EMBEDDINGS_FILE)
+        if not (os.path.exists(index_path) and os.path.exists(embeddings_path)):
+            logger.info(f"No embedding store at {self.path}, starting empty")
+            return 0
+
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            embeddings = np.load(embeddings_path, mmap_mode='r')
+            if embeddings.shape != (len(index), self.dim):
+                raise ValueError(f"store shape {embeddings.shape} does not match index")
+        except Exception as e:
+            logger.error(f"Ignoring unreadable embedding store at {self.path}: {e}")
+            return 0
+
+        self._entries = {
+            entry["student_id"]: {
+                "name": entry["name"],
+                "photo_hash": entry["photo_hash"],
+                "embedding": embeddings[row] if entry["has_face"] else None
+            }
+            for row, entry in enumerate(index)
+        }
+        self._dirty = False
+        logger.info(f"Loaded {len(self._entries)} cached embeddings from {self.path}")
+        return len(self._entries)
+
+    def get(self, student_id, photo_hash, name=None):
+        """
+        Look up the cached embedding of a student photo
+
+        Args:
+            student_id: Student id
+            photo_hash (str): Hash of the current photo
+            name (str): Current display name; a hit on a renamed student
+                updates the cached name
+
+        Returns:
+            tuple: (hit, embedding). hit is False when the student is unknown or
+                the photo changed; embedding is None when no face was found
+        """
+        entry = self._entries.get(student_id)
+        if entry is None or entry["photo_hash"] != photo_hash:
+            return False, None
+        if name is not None and entry["name"] != name:
+            entry["name"] = name
+            self._dirty = True
+        return True, entry["embedding"]
+
+    def items(self):
+        """Yield (student_id, name, embedding) for every cached face"""
+        for student_id, entry in self._entries.items():
+            if entry["embedding"] is not None:
+                yield student_id, entry["name"], entry["embedding"]
+
+    def put(self, student_id, name, photo_hash, embedding):
+        """Record the embedding of a student photo (None if no face was found)"""
+        if embedding is not None:
+            if hasattr(embedding, 'detach'):
+                embedding = embedding.detach().cpu().numpy()
+            embedding = np.asarray(embedding, dtype=np.float32).reshape(self.dim)
+        self._entries[student_id] = {
+            "name": name,
+            "photo_hash": photo_hash,
+            "embedding": embedding
+        }
+        self._dirty = True
+
+    def discard(self, student_id):
+        """Forget a student. Returns True if it was present"""
+        if self._entries.pop(student_id, None) is None:
+            return False
+        self._dirty = True
+        return True
+
+    def prune(self, keep_ids):
+        """Drop every student not in keep_ids. Returns the number removed"""
+        keep_ids = set(keep_ids)
+        stale = [student_id for student_id in self._entries if student_id not in keep_ids]
+        for student_id in stale:
+            del self._entries[student_id]
+        if stale:
+            self._dirty = True
+        return len(stale)
+
+    def save(self):
+        """Write the store to disk if it changed since it was loaded"""
+        if not self._dirty:
+            return False
+        os.makedirs(self.path, exist_ok=True)
+
+        index = []
+        embeddings = np.zeros((len(self._entries), self.dim), dtype=np.float32)
+        for row, (student_id, entry) in enumerate(self._entries.items()):
+            has_face = entry["embedding"] is not None
+            if has_face:
+                embeddings[row] = entry["embedding"]
+            index.append({
+                "student_id": student_id,
+                "name": entry["name"],
+                "photo_hash": entry["photo_hash"],
+                "has_face": has_face
+            })
+
+        # Drop references to the old memory map before replacing the files
+        for row, entry in enumerate(self._entries.values()):
+            if entry["embedding"] is not None:
+                entry["embedding"] = embeddings[row]
+
+        # Write to temporary files first so a crash never leaves a torn store
+        index_tmp = os.path.join(self.path, self.INDEX_FILE + '.tmp')
+        embeddings_tmp = os.path.join(self.path, 'embeddings.tmp.npy')
+        np.save(embeddings_tmp, embeddings)
+        with open(index_tmp, 'w', encoding='utf-8') as f:
+            json.dump(index, f)
+        os.replace(embeddings_tmp, os.path.join(self.path, self.EMBEDDINGS_FILE))
+        os.replace(index_tmp, os.path.join(self.path, self.INDEX_FILE))
+
+        self._dirty = False
+        logger.info(f"Saved {len(index)} embeddings to {self.path}")
+        return True
+
+    def clear(self):
+        """Delete the store from memory and disk"""
+        self._entries = {}
+        self._dirty = False
+        if os.path.isdir(self.path):
+            shutil.rmtree(self.path)
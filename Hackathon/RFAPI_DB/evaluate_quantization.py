@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+"""
+Compare the int8 quantized FaceNet models with the float model
+
+Embeds student photos with the float model and with each quantized model,
+then reports:
+  - the cosine similarity between float and int8 embeddings of each face
+  - how often matching against the gallery gives the same best student and
+    the same recognized / unknown decision at the recognition threshold
+  - forward-pass latency at batch sizes 1 and 16
+  - resident memory of a process holding each model
+
+Queries are flipped, brightness-jittered copies of the photos, so they are
+not identical to the gallery entries. The gallery is the stored one
+(embeddings_store) when it covers the photos, otherwise the float
+embeddings of the photos themselves.
+
+Usage:
+    python evaluate_quantization.py [--images photos/ | --limit 500] [--store embeddings_store] [--json out.json]
+"""
+import os
+import io
+import gc
+import ctypes
+import json
+import time
+import argparse
+import tempfile
+import multiprocessing
+import numpy as np
+import torch
+import mysql.connector
+from PIL import Image, ImageEnhance, ImageOps
+from facenet_pytorch import MTCNN, InceptionResnetV1
+from face_recognizer import DB_CONFIG
+from embedding_store import EmbeddingStore
+from gallery import FaceGallery
+from quantization import quantize_model, QUANTIZE_MODES
+
+def read_photos(images=None, limit=500):
+    """Yield (key, PIL image) from an image directory or the etudiant table"""
+    if images:
+        for name in sorted(os.listdir(images))[:limit]:
+            try:
+                yield os.path.splitext(name)[0], Image.open(os.path.join(images, name)).convert('RGB')
+            except OSError:
+                continue
+        return
+    conn = mysql.connector.connect(**DB_CONFIG)
+    try:
+        cursor = conn.cursor(buffered=False)
+        cursor.execute("SELECT id, Photo FROM etudiant WHERE Photo IS NOT NULL LIMIT %s", (limit,))
+        while True:
+            rows = cursor.fetchmany(64)
+            if not rows:
+                break
+            for student_id, photo_blob in rows:
+                yield student_id, Image.open(io.BytesIO(photo_blob)).convert('RGB')
+        cursor.close()
+    finally:
+        conn.close()
+
+def jitter(img, rng):
+    """A live-frame-like variant of a photo: mirrored, with another exposure"""
+    return ImageEnhance.Brightness(ImageOps.mirror(img)).enhance(rng.uniform(0.7, 1.3))
+
+def embed(model, faces, batch_size=32):
+    with torch.no_grad():
+        return torch.cat([model(faces[i:i + batch_size]) for i in range(0, len(faces), batch_size)]).numpy()
+
+def latency(model, faces, batch_size, repeats=10):
+    """Mean and p95 forward-pass time in milliseconds"""
+    batch = faces[:batch_size]
+    times = []
+    with torch.no_grad():
+        model(batch)
+        for _ in range(repeats):
+            start = time.perf_counter()
+            model(batch)
+            times.append((time.perf_counter() - start) * 1000)
+    return {"batch_size": len(batch), "mean_ms": float(np.mean(times)), "p95_ms": float(np.percentile(times, 95))}
+
+def resident_memory():
+    """Current resident set size in MB (Linux), peak RSS elsewhere"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _rss_probe(mode, calibration_path, results):
+    """Load (and quantize) the model in a fresh process and report its RSS"""
+    torch.set_num_threads(1)
+    baseline = resident_memory()
+    model = InceptionResnetV1(pretrained='vggface2').eval()
+    if mode != 'float':
+        model = quantize_model(model, mode, torch.load(calibration_path) if mode == 'static' else None)
+    with torch.no_grad():
+        model(torch.zeros(1, 3, 160, 160))
+    # Memory of a serving process after warm-up: hand the float weights freed
+    # by quantization back to the OS so they do not count (glibc only)
+    gc.collect()
+    try:
+        ctypes.CDLL('libc.so.6').malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+    results.put((mode, baseline, resident_memory()))
+
+def measure_rss(modes, calibration):
+    with tempfile.TemporaryDirectory() as tmp:
+        calibration_path = os.path.join(tmp, 'calibration.pt')
+        torch.save(calibration, calibration_path)
+        context = multiprocessing.get_context('spawn')
+        results = context.Queue()
+        report = {}
+        for mode in modes:
+            process = context.Process(target=_rss_probe, args=(mode, calibration_path, results))
+            process.start()
+            name, baseline, loaded = results.get()
+            process.join()
+            report[name] = {"process_rss_mb": loaded, "model_rss_mb": loaded - baseline}
+        return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate int8 quantized FaceNet against the float model")
+    parser.add_argument('--images', default=None, help="Directory of student photos (default: the etudiant table)")
+    parser.add_argument('--limit', type=int, default=500, help="Maximum number of photos")
+    parser.add_argument('--store', default='embeddings_store', help="Embedding store holding the float gallery")
+    parser.add_argument('--threshold', type=float, default=0.7, help="Recognition threshold")
+    parser.add_argument('--calibration', type=int, default=64, help="Photos used to calibrate static quantization")
+    parser.add_argument('--modes', nargs='+', default=list(QUANTIZE_MODES), choices=QUANTIZE_MODES)
+    parser.add_argument('--no-rss', action='store_true', help="Skip the per-model memory measurement")
+    parser.add_argument('--json', default=None, help="Also write the report to this file")
+    args = parser.parse_args()
+
+    detector = MTCNN(image_size=160, margin=0, min_face_size=20,
+                     thresholds=[0.6, 0.7, 0.7], factor=0.709, post_process=True, device='cpu')
+    rng = np.random.default_rng(0)
+    keys, photos, queries = [], [], []
+    for key, img in read_photos(args.images, args.limit):
+        try:
+            face = detector(img)
+            query = detector(jitter(img, rng))
+        except Exception as e:
+            print(f"Skipping {key}: {e}")
+            continue
+        if face is None or query is None:
+            continue
+        keys.append(key)
+        photos.append(face)
+        queries.append(query)
+    if not keys:
+        parser.error("no faces could be read")
+    photos, queries = torch.stack(photos), torch.stack(queries)
+    print(f"Faces: {len(keys)}")
+
+    float_model = InceptionResnetV1(pretrained='vggface2').eval()
+    models = {"float": float_model}
+    for mode in args.modes:
+        models[mode] = quantize_model(float_model, mode, photos[:args.calibration])
+
+    # Gallery: the stored float embeddings if they cover these students
+    gallery = FaceGallery(capacity=len(keys))
+    store = EmbeddingStore(args.store)
+    stored = {student_id: embedding for student_id, _, embedding in store.items()} if store.load() else {}
+    source = "store" if all(key in stored for key in keys) else "photos"
+    gallery_embeddings = [stored[key] for key in keys] if source == "store" else embed(float_model, photos)
+    for key, embedding in zip(keys, gallery_embeddings):
+        gallery.add(key, str(key), embedding)
+    print(f"Gallery: {len(gallery)} faces from the {source}")
+
+    reference = embed(float_model, queries)
+    reference_matches = gallery.match(reference, k=1)
+    report = {"faces": len(keys), "gallery": source, "threshold": args.threshold, "models": {}}
+
+    for name, model in models.items():
+        embeddings = embed(model, queries)
+        cosine = np.sum(FaceGallery.normalize(embeddings) * FaceGallery.normalize(reference), axis=1)
+        matches = gallery.match(embeddings, k=1)
+        same_best = np.mean([m[0][0] == r[0][0] for m, r in zip(matches, reference_matches)])
+        same_decision = np.mean([(m[0][2] > args.threshold) == (r[0][2] > args.threshold)
+                                 for m, r in zip(matches, reference_matches)])
+        similarity_delta = np.mean([abs(m[0][2] - r[0][2]) for m, r in zip(matches, reference_matches)])
+        correct = np.mean([m[0][0] == key for m, key in zip(matches, keys)])
+        report["models"][name] = {
+            "cosine_mean": float(cosine.mean()),
+            "cosine_min": float(cosine.min()),
+            "same_best_match": float(same_best),
+            "same_decision": float(same_decision),
+            "similarity_delta_mean": float(similarity_delta),
+            "top1_accuracy": float(correct),
+            "latency": [latency(model, queries, 1), latency(model, queries, 16)]
+        }
+
+    if not args.no_rss:
+        for name, memory in measure_rss(list(models), photos[:args.calibration]).items():
+            report["models"][name].update(memory)
+
+    for name, stats in report["models"].items():
+        print(f"{name:>8}: cosine mean {stats['cosine_mean']:.4f} min {stats['cosine_min']:.4f}   "
+              f"same match {stats['same_best_match'] * 100:5.1f}%   same decision {stats['same_decision'] * 100:5.1f}%   "
+              f"top-1 {stats['top1_accuracy'] * 100:5.1f}%")
+        print(f"{'':>8}  latency b1 {stats['latency'][0]['mean_ms']:7.1f} ms   "
+              f"b{stats['latency'][1]['batch_size']} {stats['latency'][1]['mean_ms']:7.1f} ms"
+              + (f"   model RSS {stats['model_rss_mb']:6.1f} MB" if 'model_rss_mb' in stats else ""))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
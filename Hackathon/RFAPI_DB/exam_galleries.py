@@ -0,0 +1,136 @@
+import threading
+import logging
+from collections import OrderedDict
+import mysql.connector
+
+logger = logging.getLogger(__name__)
+
+class ExamGalleries:
+    """
+    Per-exam gallery subsets, loaded on demand and kept in an LRU cache
+
+    Faces seen during an exam are matched only against the students
+    registered for it in student_exams, instead of the whole school.
+    """
+
+    def __init__(self, gallery, db_config, capacity=16):
+        """
+        Args:
+            gallery (FaceGallery): Full gallery the subsets are cut from
+            db_config (dict): mysql.connector connection arguments
+            capacity (int): Maximum number of exam galleries kept in memory
+        """
+        self.gallery = gallery
+        self.db_config = db_config
+        self.capacity = capacity
+        self._galleries = OrderedDict()  # exam_id -> FaceGallery, most recent last
+        self.rosters = {}  # exam_id -> set of registered student ids
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._galleries)
+
+    def __contains__(self, exam_id):
+        return exam_id in self._galleries
+
+    def _query(self, query, params=()):
+        conn = mysql.connector.connect(**self.db_config)
+        try:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+            cursor.close()
+            return rows
+        finally:
+            conn.close()
+
+    def get(self, exam_id):
+        """Return the gallery of an exam, loading it on first use"""
+        with self._lock:
+            gallery = self._galleries.get(exam_id)
+            if gallery is not None:
+                self._galleries.move_to_end(exam_id)
+                return gallery
+        return self.load(exam_id)
+
+    def load(self, exam_id):
+        """(Re)build the gallery of an exam from its registered students"""
+        rows = self._query("SELECT student_id FROM student_exams WHERE exam_id = %s", (exam_id,))
+        roster = {student_id for (student_id,) in rows}
+        gallery = self.gallery.subset(roster)
+        logger.info(f"Loaded gallery for exam {exam_id}: {len(gallery)} of {len(roster)} registered students")
+
+        with self._lock:
+            self._galleries[exam_id] = gallery
+            self.rosters[exam_id] = roster
+            self._galleries.move_to_end(exam_id)
+            while len(self._galleries) > self.capacity:
+                evicted, _ = self._galleries.popitem(last=False)
+                self.rosters.pop(evicted, None)
+                logger.info(f"Evicted least recently used gallery of exam {evicted}")
+        return gallery
+
+    def update_student(self, student_id):
+        """
+        Propagate a change of the full gallery to the cached exam galleries
+
+        The student is re-added (or removed) in every cached exam whose
+        roster contains it.
+
+        Returns:
+            list: Exam ids whose gallery was updated
+        """
+        entry = self.gallery.get(student_id)
+        with self._lock:
+            affected = [(exam_id, self._galleries[exam_id]) for exam_id, roster in self.rosters.items()
+                        if student_id in roster and exam_id in self._galleries]
+        for _, gallery in affected:
+            if entry is None:
+                gallery.remove(student_id)
+            else:
+                gallery.add(student_id, *entry)
+        return [exam_id for exam_id, _ in affected]
+
+    def evict(self, exam_id):
+        with self._lock:
+            self.rosters.pop(exam_id, None)
+            return self._galleries.pop(exam_id, None) is not None
+
+    def prewarm(self, horizon_minutes=30):
+        """
+        Load the galleries of exams starting within the next horizon_minutes
+
+        Returns:
+            list: Exam ids that were loaded
+        """
+        rows = self._query(
+            "SELECT id FROM exams WHERE date BETWEEN NOW() AND NOW() + INTERVAL %s MINUTE",
+            (horizon_minutes,))
+        loaded = []
+        for (exam_id,) in rows:
+            if exam_id not in self._galleries:
+                self.load(exam_id)
+                loaded.append(exam_id)
+        return loaded
+
+    def evict_finished(self):
+        """
+        Drop the galleries of exams whose date + duration (minutes) has passed
+
+        Returns:
+            list: Exam ids that were evicted
+        """
+        with self._lock:
+            cached = list(self._galleries)
+        if not cached:
+            return []
+        placeholders = ', '.join(['%s'] * len(cached))
+        rows = self._query(
+            f"SELECT id FROM exams WHERE id IN ({placeholders}) "
+            f"AND date + INTERVAL duration MINUTE < NOW()", cached)
+        finished = [exam_id for (exam_id,) in rows]
+        for exam_id in finished:
+            self.evict(exam_id)
+        if finished:
+            logger.info(f"Evicted galleries of finished exams: {finished}")
+        return finished
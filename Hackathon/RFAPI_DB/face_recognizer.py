@@ -3,16 +3,33 @@ import numpy as np
 import os
 import time
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import torch
 from PIL import Image
-from facenet_pytorch import MTCNN, InceptionResnetV1
+from facenet_pytorch import MTCNN, InceptionResnetV1, extract_face, fixed_image_standardization
 import mysql.connector
 import io
+from gallery import FaceGallery
+from embedding_store import EmbeddingStore
+from embedding_batcher import EmbeddingBatcher
+from metrics import Metrics
+from quantization import quantize_model, QUANTIZE_MODES
 
 logger = logging.getLogger(__name__)
 
+# MySQL connection settings (same environment variables as AcademGuard)
+DB_CONFIG = {
+    'host': os.getenv('MYSQL_HOST', 'localhost'),
+    'user': os.getenv('MYSQL_USER', 'root'),
+    'password': os.getenv('MYSQL_PASSWORD', ''),
+    'database': os.getenv('MYSQL_DB', 'academguard')
+}
+
 class FaceRecognizer:
-    def __init__(self, students_dir='students_database', threshold=0.8, device=None):
+    def __init__(self, students_dir='students_database', threshold=0.8, device=None,
+                 store_path='embeddings_store', gallery_index=None, metrics=None,
+                 background_load=False, quantize=None):
         """
         Initialize face recognizer with FaceNet and MTCNN
         
@@ -20,6 +37,17 @@ class FaceRecognizer:
             students_dir (str): Directory containing student face images
             threshold (float): Recognition threshold (higher is stricter)
             device (str): Device to use ('cpu' or 'cuda')
+            store_path (str): Directory of the persistent embedding store,
+                or None to embed every photo on each start
+            gallery_index (GalleryIndex): Search strategy of the gallery, exact
+                by default (see gallery_index.IVFIndex for large galleries)
+            metrics (Metrics): Server-wide stage timers, disabled by default
+            background_load (bool): Load the gallery in a background thread so
+                recognition can start on the faces loaded so far (see ready
+                and load_progress)
+            quantize (str): Run FaceNet as an int8 model on the CPU: 'static'
+                (whole network, calibrated on student photos). None keeps the
+                float model
         """
         logger.info("Initializing face recognition system...")
         
@@ -37,56 +65,537 @@ class FaceRecognizer:
         # Initialize FaceNet model for face recognition
         self.recognizer = InceptionResnetV1(pretrained='vggface2').eval().to(self.device)
         
+        # Optional int8 FaceNet for CPU-only nodes
+        self.quantize = quantize
+        if quantize:
+            self.quantize_recognizer(quantize)
+        
         # Configuration
         self.students_dir = students_dir
         self.threshold = threshold
         
-        # Storage for known faces
-        self.known_face_encodings = []
-        self.known_face_names = []
+        # Storage for known faces (one normalized embedding matrix)
+        self.gallery = FaceGallery(index=gallery_index)
+        self.store = EmbeddingStore(store_path) if store_path else None
+        
+        # Optional cross-caller batching of FaceNet forward passes
+        self.batcher = None
+        
+        # Per-stage latency histograms (mtcnn, facenet, matching)
+        self.metrics = metrics if metrics is not None else Metrics(enabled=False)
         
-        # Performance tracking
-        self.fps = 0
-        self.frame_times = []
-        self.last_fps_update = time.time()
+        # Gallery loading state, set once the full gallery is loaded
+        self.ready = threading.Event()
+        self.load_progress = {"total": 0, "cached": 0, "to_embed": 0, "embedded": 0,
+                              "no_face": 0, "failed": 0}
         
         # Load known faces
-        self.load_known_faces()
+        if background_load:
+            threading.Thread(target=self.load_known_faces, name="GalleryLoader", daemon=True).start()
+        else:
+            self.load_known_faces()
         
         logger.info("Face recognition system initialized")
 
-    def load_known_faces(self):
-        """Load known faces from the MySQL database"""
+    @property
+    def known_face_names(self):
+        """Names of all students currently in the gallery"""
+        return self.gallery.names
+
+    def embed_photo(self, photo_blob):
+        """
+        Compute the embedding of a student photo
+
+        Args:
+            photo_blob (bytes): Encoded image as stored in etudiant.Photo
+
+        Returns:
+            torch.Tensor: 1 x 512 embedding, or None if no face was found
+        """
+        img = Image.open(io.BytesIO(photo_blob)).convert('RGB')
+        face = self.detector(img)
+        if face is None:
+            return None
+        return self.embed_faces(face.unsqueeze(0))
+
+    def quantize_recognizer(self, mode):
+        """
+        Replace the FaceNet model with an int8 quantized copy
+
+        Static quantization is calibrated on student photos from the
+        database; if none can be read, the float model is kept.
+        Embeddings already in the store keep being used: see
+        evaluate_quantization.py for their agreement with the int8 model.
+
+        Args:
+            mode (str): 'static'
+        """
+        if self.device != 'cpu':
+            raise ValueError("Quantized inference only runs on the CPU")
+        if mode not in QUANTIZE_MODES:
+            raise ValueError(f"Unknown quantization mode {mode!r}, expected one of {QUANTIZE_MODES}")
+        calibration = None
+        try:
+            calibration = self.calibration_faces()
+        except Exception as e:
+            logger.error(f"Error reading calibration photos: {e}")
+        if calibration is None:
+            logger.warning("No calibration faces available, keeping the float FaceNet model")
+            self.quantize = None
+            return
+        self.recognizer = quantize_model(self.recognizer, mode, calibration)
+        self.quantize = mode
+        logger.info(f"FaceNet running with {mode} int8 quantization")
+
+    def calibration_faces(self, limit=64):
+        """
+        Aligned faces of up to limit student photos, for static quantization
+
+        Returns:
+            torch.Tensor: n x 3 x 160 x 160 faces, or None if none was found
+        """
+        conn = mysql.connector.connect(**DB_CONFIG)
         try:
-            conn = mysql.connector.connect(
-                host='localhost',
-                user='root',  
-                password='',  
-                database='academguard'
-            )
-            cursor = conn.cursor()
-            cursor.execute("SELECT Nom, Prenom, Photo FROM etudiant WHERE Photo IS NOT NULL")
-            rows = cursor.fetchall()
-            logger.info(f"Loading known faces from MySQL: {len(rows)} found")
-            for nom, prenom, photo_blob in rows:
-                name = f"{prenom} {nom}".title()
-                try:
-                    img = Image.open(io.BytesIO(photo_blob))
-                    face = self.detector(img)
+            cursor = conn.cursor(buffered=False)
+            cursor.execute("SELECT Photo FROM etudiant WHERE Photo IS NOT NULL LIMIT %s", (limit,))
+            faces = []
+            while True:
+                rows = cursor.fetchmany(16)
+                if not rows:
+                    break
+                for (photo_blob,) in rows:
+                    face = self._prepare_photo(photo_blob)
                     if face is not None:
-                        with torch.no_grad():
-                            face_encoding = self.recognizer(face.unsqueeze(0).to(self.device))
-                        self.known_face_encodings.append(face_encoding.cpu())
-                        self.known_face_names.append(name)
-                        logger.info(f"Loaded face: {name}")
-                    else:
-                        logger.warning(f"No face detected for {name}")
-                except Exception as e:
-                    logger.error(f"Error processing {name}: {e}")
+                        faces.append(face)
             cursor.close()
+        finally:
             conn.close()
+        return torch.stack(faces) if faces else None
+
+    def load_known_faces(self, rebuild=False, chunk_size=64, workers=None):
+        """
+        Load known faces from the MySQL database
+
+        Embeddings of photos whose hash is unchanged since the last run are
+        read from the embedding store and added first. New or changed photos
+        are then streamed from MySQL chunk_size rows at a time: their decoding
+        and face detection run in a thread pool while the next chunk is
+        fetched, and their faces are embedded in one batch per chunk. At most
+        two chunks of photos are held in memory whatever the school size.
+
+        Faces are added to the gallery as they are embedded, so recognition
+        can run while the load is in progress; ready is set once it is done.
+
+        Args:
+            rebuild (bool): Ignore the store and embed every photo again
+            chunk_size (int): Number of photos fetched and embedded at once
+            workers (int): Decode/detection threads, defaults to the CPU count
+        """
+        self.ready.clear()
+        if self.store is not None and not rebuild:
+            self.store.load()
+
+        try:
+            conn = mysql.connector.connect(**DB_CONFIG)
+            try:
+                # Unbuffered cursors stream rows from the server as they are fetched
+                cursor = conn.cursor(buffered=False)
+                # Hash the photos in the database so unchanged blobs never leave MySQL
+                cursor.execute("SELECT id, Nom, Prenom, SHA1(Photo) FROM etudiant WHERE Photo IS NOT NULL")
+                student_ids = set()
+                pending = {}
+                while True:
+                    rows = cursor.fetchmany(1000)
+                    if not rows:
+                        break
+                    for student_id, nom, prenom, photo_hash in rows:
+                        student_ids.add(student_id)
+                        name = f"{prenom} {nom}".title()
+                        hit, embedding = ((False, None) if self.store is None
+                                          else self.store.get(student_id, photo_hash, name))
+                        if not hit:
+                            pending[student_id] = (name, photo_hash)
+                        elif embedding is not None:
+                            self.gallery.add(student_id, name, embedding)
+                self.load_progress.update(total=len(student_ids), cached=len(student_ids) - len(pending),
+                                          to_embed=len(pending))
+                logger.info(f"Loading known faces from MySQL: {len(student_ids)} found, "
+                            f"{len(student_ids) - len(pending)} loaded from cache, {len(pending)} to embed")
+
+                if pending:
+                    self._embed_pending(cursor, pending, chunk_size, workers)
+                cursor.close()
+            finally:
+                conn.close()
+
+            if self.store is not None:
+                self.store.prune(student_ids)
+                self.store.save()
         except Exception as e:
             logger.error(f"Error connecting to MySQL: {e}")
+            if self.store is not None and len(self.gallery) == 0:
+                # Fall back to the last known gallery so recognition still works
+                for student_id, name, embedding in self.store.items():
+                    self.gallery.add(student_id, name, embedding)
+                logger.info(f"Using {len(self.gallery)} cached faces from {self.store.path}")
+        finally:
+            self.ready.set()
+
+    def _stream_photos(self, cursor, student_ids, chunk_size):
+        """Yield lists of at most chunk_size (id, photo) rows for the given students"""
+        for start in range(0, len(student_ids), chunk_size):
+            chunk = student_ids[start:start + chunk_size]
+            placeholders = ', '.join(['%s'] * len(chunk))
+            cursor.execute(f"SELECT id, Photo FROM etudiant WHERE id IN ({placeholders})", chunk)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+
+    def _prepare_photo(self, photo_blob):
+        """Decode a photo and crop its aligned face (runs in a loader thread)"""
+        img = Image.open(io.BytesIO(photo_blob)).convert('RGB')
+        return self.detector(img)
+
+    def _embed_pending(self, cursor, pending, chunk_size, workers):
+        """Decode/detect photos in parallel and embed them chunk by chunk"""
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1,
+                                thread_name_prefix="GalleryDecode") as pool:
+            in_flight = None
+            for rows in self._stream_photos(cursor, list(pending), chunk_size):
+                # Detection of this chunk overlaps with the fetch of the next one
+                submitted = [(student_id, pool.submit(self._prepare_photo, photo_blob))
+                             for student_id, photo_blob in rows]
+                del rows
+                if in_flight is not None:
+                    self._embed_chunk(in_flight, pending)
+                in_flight = submitted
+
+                done = self.load_progress["embedded"] + self.load_progress["no_face"] + self.load_progress["failed"]
+                rate = done / max(time.monotonic() - started, 1e-6)
+                logger.info(f"Gallery load: {done}/{len(pending)} photos processed ({rate:.1f}/s)")
+            if in_flight is not None:
+                self._embed_chunk(in_flight, pending)
+        logger.info(f"Embedded {self.load_progress['embedded']} new faces in {time.monotonic() - started:.1f} s")
+
+    def _embed_chunk(self, submitted, pending):
+        """Embed the detected faces of one chunk in a single forward pass"""
+        student_ids, faces = [], []
+        for student_id, future in submitted:
+            name, photo_hash = pending[student_id]
+            try:
+                face = future.result()
+            except Exception as e:
+                logger.error(f"Error processing {name}: {e}")
+                self.load_progress["failed"] += 1
+                continue
+            if face is None:
+                logger.warning(f"No face detected for {name}")
+                self.load_progress["no_face"] += 1
+                if self.store is not None:
+                    self.store.put(student_id, name, photo_hash, None)
+                continue
+            student_ids.append(student_id)
+            faces.append(face)
+
+        if not faces:
+            return
+        encodings = self.embed_faces(torch.stack(faces))
+        for student_id, face_encoding in zip(student_ids, encodings):
+            name, photo_hash = pending[student_id]
+            self.gallery.add(student_id, name, face_encoding)
+            if self.store is not None:
+                self.store.put(student_id, name, photo_hash, face_encoding)
+        self.load_progress["embedded"] += len(faces)
+
+    def refresh_student(self, student_id):
+        """
+        Re-read one student from the database and update the live gallery
+
+        Only this student's photo is fetched and embedded (unless its hash
+        is already in the store). Recognition keeps running meanwhile. The
+        store is updated in memory; call store.save() after a batch of changes.
+
+        Args:
+            student_id: etudiant.id of the student
+
+        Returns:
+            str: 'added', 'removed' or 'unchanged'
+        """
+        conn = mysql.connector.connect(**DB_CONFIG)
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT Nom, Prenom, SHA1(Photo) FROM etudiant WHERE id = %s", (student_id,))
+            row = cursor.fetchone()
+            if row is None or row[2] is None:
+                # Student deleted or photo removed
+                cursor.close()
+                removed = self.gallery.remove(student_id)
+                if self.store is not None:
+                    self.store.discard(student_id)
+                return 'removed' if removed else 'unchanged'
+
+            nom, prenom, photo_hash = row
+            name = f"{prenom} {nom}".title()
+            hit, face_encoding = (False, None) if self.store is None else self.store.get(student_id, photo_hash, name)
+            if not hit:
+                cursor.execute("SELECT Photo FROM etudiant WHERE id = %s", (student_id,))
+                (photo_blob,) = cursor.fetchone()
+                face_encoding = self.embed_photo(photo_blob)
+                if self.store is not None:
+                    self.store.put(student_id, name, photo_hash, face_encoding)
+            cursor.close()
+        finally:
+            conn.close()
+
+        if face_encoding is None:
+            logger.warning(f"No face detected for {name}")
+            return 'removed' if self.gallery.remove(student_id) else 'unchanged'
+        self.gallery.add(student_id, name, face_encoding)
+        logger.info(f"Updated face: {name}")
+        return 'added'
+
+    def detect_faces(self, pil_img):
+        """
+        Run MTCNN once on a full frame and crop aligned faces for every box
+
+        Args:
+            pil_img (PIL.Image): RGB frame
+
+        Returns:
+            tuple: (boxes, probabilities, landmarks, faces) where faces is an
+                n x 3 x 160 x 160 tensor ready for the recognizer, or all None
+                if no face was found
+        """
+        boxes, probs, landmarks = self.detector.detect(pil_img, landmarks=True)
+        if boxes is None:
+            return None, None, None, None
+
+        # Crop straight from the detected boxes instead of running MTCNN again per face
+        faces = []
+        for box in boxes:
+            face = extract_face(pil_img, box, self.detector.image_size, self.detector.margin)
+            if self.detector.post_process:
+                face = fixed_image_standardization(face)
+            faces.append(face)
+        return boxes, probs, landmarks, torch.stack(faces)
+
+    def enable_batching(self, max_batch_size=32, max_wait_ms=10):
+        """
+        Route embed_faces through a shared EmbeddingBatcher so faces from
+        concurrent callers (e.g. several sessions) share forward passes
+
+        Args:
+            max_batch_size (int): Faces per forward pass that trigger a flush
+            max_wait_ms (float): Longest time a request waits for companions
+        """
+        if self.batcher is not None:
+            self.batcher.stop()
+        self.batcher = EmbeddingBatcher(self.recognizer, self.device,
+                                        max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+        self.batcher.start()
+        return self.batcher
+
+    def embed_faces(self, faces):
+        """
+        Compute embeddings for a batch of aligned faces
+
+        Args:
+            faces (torch.Tensor): n x 3 x 160 x 160 face tensor
+
+        Returns:
+            torch.Tensor: n x 512 embeddings on the CPU
+        """
+        if self.batcher is not None:
+            return self.batcher.embed(faces)
+        with torch.no_grad():
+            return self.recognizer(faces.to(self.device)).cpu()
+
+    def warm_up(self, frame_size=(480, 640)):
+        """
+        Run MTCNN and FaceNet once, so the first client frame does not pay
+        for their lazy initialization (allocations, kernel selection)
+
+        Args:
+            frame_size (tuple): (height, width) of the frame MTCNN runs on
+        """
+        started = time.time()
+        self.identify_faces(np.zeros((*frame_size, 3), dtype=np.uint8))
+        # A blank frame has no face for FaceNet: embed one directly
+        self.embed_faces(torch.zeros(1, 3, 160, 160))
+        logger.info(f"Face recognition warmed up in {time.time() - started:.2f}s")
+
+    def identify_faces(self, frame, gallery=None, metrics=None):
+        """
+        Detect faces in a frame and match them against the gallery
+
+        Args:
+            frame: Input BGR frame from camera
+            gallery (FaceGallery): Gallery to match against, e.g. the subset of
+                students registered for an exam. Defaults to the full gallery
+            metrics (Metrics): Stage timers to record into, e.g. a session's.
+                Defaults to the recognizer's own
+
+        Returns:
+            list: One dict per detected face with its box, the best match and
+                the runner-up (name and similarity), the margin between them
+                and whether the best match passed the threshold
+        """
+        return self.identify_frames([frame], gallery, metrics)[0]
+
+    def identify_frames(self, frames, gallery=None, metrics=None):
+        """
+        identify_faces for several frames at once, e.g. one per camera
+
+        MTCNN still runs frame by frame (frames may differ in size), but the
+        faces of all frames share one FaceNet forward pass and one gallery match.
+
+        Args:
+            frames (list): BGR frames
+            gallery (FaceGallery): Gallery to match against, defaults to the full gallery
+            metrics (Metrics): Stage timers to record into, defaults to the recognizer's own
+
+        Returns:
+            list: The identify_faces result of each frame, in order
+        """
+        metrics = metrics if metrics is not None else self.metrics
+
+        detections = []
+        with metrics.time('mtcnn'):
+            for frame in frames:
+                # Convert frame for MTCNN
+                rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                pil_img = Image.fromarray(rgb_frame)
+                detections.append(self.detect_faces(pil_img))
+        faces = [faces for _, _, _, faces in detections if faces is not None]
+        if not faces:
+            return [[] for _ in frames]
+
+        # Embed every face of the frames in one batched forward pass
+        with metrics.time('facenet'):
+            encodings = self.embed_faces(faces[0] if len(faces) == 1 else torch.cat(faces))
+
+        # Compare all faces with the gallery in one matrix product
+        with metrics.time('matching'):
+            matches = (gallery if gallery is not None else self.gallery).match(encodings, k=2)
+
+        results = []
+        offset = 0
+        for frame, (boxes, probs, landmarks, frame_faces) in zip(frames, detections):
+            if frame_faces is None:
+                results.append([])
+                continue
+            frame_matches = matches[offset:offset + len(frame_faces)]
+            offset += len(frame_faces)
+            results.append(self._face_results(frame, boxes, probs, landmarks, frame_matches))
+        return results
+
+    def _face_results(self, frame, boxes, probs, landmarks, matches):
+        # Clip boxes to the frame, MTCNN may return coordinates slightly outside it
+        height, width = frame.shape[:2]
+        face_boxes = [
+            [max(0, int(x1)), max(0, int(y1)), min(width, int(x2)), min(height, int(y2))]
+            for x1, y1, x2, y2 in boxes
+        ]
+
+        results = []
+        for box, prob, points, candidates in zip(face_boxes, probs, landmarks, matches):
+            best = candidates[0] if candidates else (None, None, 0.0)
+            runner_up = candidates[1] if len(candidates) > 1 else (None, None, 0.0)
+            results.append({
+                "box": box,
+                "probability": float(prob),
+                "landmarks": [[float(x), float(y)] for x, y in points],
+                "student_id": best[0],
+                "name": best[1],
+                "similarity": best[2],
+                "runner_up": runner_up[1],
+                "runner_up_similarity": runner_up[2],
+                "margin": best[2] - runner_up[2],
+                "recognized": best[1] is not None and best[2] > self.threshold
+            })
+        return results
+
+    def refresh_landmarks(self, frame, faces, margin=0.25):
+        """
+        Re-detect tracked faces inside their boxes, for current landmarks
+
+        MTCNN runs on a crop around each tracked box only, a fraction of the
+        cost of a full-frame pass, and FaceNet does not run: identities stay
+        those of the last full recognition while gaze checks see the eyes
+        and nose where they are now, not where the last full pass saw them.
+
+        Args:
+            frame: BGR frame
+            faces (list): Tracked faces (see tracking.FaceTracker.update)
+            margin (float): Crop padding as a fraction of the box size
+
+        Returns:
+            list: The faces with the box, probability and landmarks found in
+                their crop, or None if a face was not found there (a full
+                recognition is then needed)
+        """
+        height, width = frame.shape[:2]
+        refreshed = []
+        for face in faces:
+            x1, y1, x2, y2 = face["box"]
+            pad_x, pad_y = int((x2 - x1) * margin), int((y2 - y1) * margin)
+            cx1, cy1 = max(0, x1 - pad_x), max(0, y1 - pad_y)
+            cx2, cy2 = min(width, x2 + pad_x), min(height, y2 + pad_y)
+            if cx2 - cx1 < 20 or cy2 - cy1 < 20:
+                return None
+            crop = Image.fromarray(cv2.cvtColor(frame[cy1:cy2, cx1:cx2], cv2.COLOR_BGR2RGB))
+            boxes, probs, landmarks = self.detector.detect(crop, landmarks=True)
+            if boxes is None:
+                return None
+            # The crop holds one face, keep the most confident detection
+            best = int(np.argmax(probs))
+            bx1, by1, bx2, by2 = boxes[best]
+            refreshed.append({
+                **face,
+                "box": [max(0, int(bx1) + cx1), max(0, int(by1) + cy1),
+                        min(width, int(bx2) + cx1), min(height, int(by2) + cy1)],
+                "probability": float(probs[best]),
+                "landmarks": [[float(x) + cx1, float(y) + cy1] for x, y in landmarks[best]]
+            })
+        return refreshed
+
+    def draw_results(self, frame, results):
+        """
+        Draw face boxes, labels and eye landmarks on a frame
+
+        Args:
+            frame: BGR frame to draw on (modified in place)
+            results (list): Output of identify_faces
+
+        Returns:
+            The annotated frame
+        """
+        for result in results:
+            x1, y1, x2, y2 = result["box"]
+            similarity = result["similarity"]
+
+            # Draw results
+            if result["recognized"]:
+                # Known face - green box
+                color = (0, 255, 0)
+                label = f"{result['name']} ({similarity:.2f})"
+            else:
+                # Unknown face - red box
+                color = (0, 0, 255)
+                label = f"Unknown ({similarity:.2f})"
+            # Draw rectangle and label
+            cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+            cv2.putText(frame, label, (x1, y1-10), 
+                      cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
+
+            # Mark eye centers from the MTCNN landmarks
+            for eye_x, eye_y in result["landmarks"][:2]:
+                cv2.circle(frame, (int(eye_x), int(eye_y)), 2, (0, 255, 255), -1)
+
+        return frame
 
     def recognize_face(self, frame, camera_id=None):
         """
@@ -99,84 +608,14 @@ class FaceRecognizer:
         Returns:
             Processed frame with recognition results
         """
-        start_time = time.time()
-
-        # Convert frame for MTCNN
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        pil_img = Image.fromarray(rgb_frame)
-
         try:
-            # Detect faces
-            boxes, _ = self.detector.detect(pil_img)
-            
-            if boxes is not None:
-                for box in boxes:
-                    # Get face coordinates
-                    x1, y1, x2, y2 = [int(b) for b in box]
-                    
-                    # Extract face
-                    face_img = pil_img.crop((x1, y1, x2, y2))
-                    face = self.detector(face_img)
-                    
-                    if face is not None:
-                        # Get face encoding and compare
-                        with torch.no_grad():
-                            face_encoding = self.recognizer(face.unsqueeze(0).to(self.device))
-                        
-                        # Compare with known faces
-                        max_similarity = 0
-                        best_match = None
-                        
-                        for i, known_encoding in enumerate(self.known_face_encodings):
-                            # Calculate cosine similarity
-                            similarity = torch.cosine_similarity(
-                                face_encoding, known_encoding, dim=1
-                            ).item()
-                            
-                            if similarity > max_similarity:
-                                max_similarity = similarity
-                                best_match = self.known_face_names[i]
-                        
-                        # Draw results
-                        if max_similarity > self.threshold:
-                            # Known face - green box
-                            color = (0, 255, 0)
-                            label = f"{best_match} ({max_similarity:.2f})"
-                            logger.info(f"Recognized: {best_match} ({max_similarity:.2f})")
-                        else:
-                            # Unknown face - red box
-                            color = (0, 0, 255)
-                            label = f"Unknown ({max_similarity:.2f})"
-                          # Draw rectangle and label
-                        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-                        cv2.putText(frame, label, (x1, y1-10), 
-                                  cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
-                        
-                        # Eye detection
-                        face_roi = frame[y1:y2, x1:x2]
-                        gray_roi = cv2.cvtColor(face_roi, cv2.COLOR_BGR2GRAY)
-                        
-                        # Use Haar cascade classifier for eye detection
-                        eye_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
-                        eyes = eye_cascade.detectMultiScale(gray_roi, 1.1, 3)
-                        
-                        # Track and draw rectangles around eyes
-                        for (ex, ey, ew, eh) in eyes:
-                            # Draw rectangle around each eye
-                            cv2.rectangle(face_roi, (ex, ey), (ex + ew, ey + eh), (255, 0, 0), 2)
-                            
-                            # Get center of eye for tracking
-                            eye_center_x = x1 + ex + ew // 2
-                            eye_center_y = y1 + ey + eh // 2
-                            
-                            # Mark eye center
-                            cv2.circle(frame, (eye_center_x, eye_center_y), 2, (0, 255, 255), -1)
-
+            results = self.identify_faces(frame)
+            for result in results:
+                if result["recognized"]:
+                    logger.info(f"Recognized: {result['name']} ({result['similarity']:.2f}, "
+                                f"runner-up {result['runner_up']} {result['runner_up_similarity']:.2f})")
+            self.draw_results(frame, results)
         except Exception as e:
             logger.error(f"Error during recognition: {e}")
 
-        
-
-        
-
-        return frame
\ No newline at end of file
+        return frame
@@ -1,206 +1,199 @@
-import base64
-import cv2
-import numpy as np
-import socketio
+import os
+import sys
+import logging
 import eventlet
-from flask import Flask
-from face_recognizer import FaceRecognizer
+from flask import jsonify
+from face_recognizer import FaceRecognizer, DB_CONFIG
+from exam_galleries import ExamGalleries
+from gallery_feed import GalleryChangeFeed
+from alert_writer import AlertWriter
+from gallery_index import IVFIndex
+from metrics import Metrics
+from sessions import SessionStore
+from gaze import GazeAnalyzer
+from inference_pool import InferencePool
+from session_services import SessionServices, decode_frame, encode_frame, face_results
 
-sio = socketio.Server(cors_allowed_origins="*")
-app = Flask(__name__)
-app.wsgi_app = socketio.WSGIApp(sio, app.wsgi_app)
+# The pre-fork server package sits next to the services
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from prefork import service_app
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("FaceRecognitionService")
+
+# Served alone or by the pre-fork server: python -m prefork faces
+WORKER, sio, app = service_app(__name__)
+
+# Large multi-campus galleries can use approximate search (GALLERY_INDEX=ivf)
+if os.getenv('GALLERY_INDEX', 'exact') == 'ivf':
+    gallery_index = IVFIndex(nprobe=int(os.getenv('GALLERY_NPROBE', 8)))
+else:
+    gallery_index = None
+
+# Per-stage latency histograms, served on /metrics (METRICS_ENABLED=0 turns them off)
+metrics = Metrics(enabled=os.getenv('METRICS_ENABLED', '1') != '0')
+
+# Photo changes recorded by AcademGuard (e.g. approved verifications) are
+# applied to the live gallery; mark the feed position before the full load
+gallery_feed = GalleryChangeFeed(DB_CONFIG)
+GALLERY_FEED_INTERVAL = float(os.getenv('GALLERY_FEED_INTERVAL', 5))
+try:
+    gallery_feed.mark()
+except Exception as e:
+    logger.warning(f"Gallery change feed unavailable until the database is reachable: {e}")
 
 # Load face recognition system once
-recognizer = FaceRecognizer(students_dir="students_database", threshold=0.7)
+# The gallery loads in the background: cached faces are available within
+# seconds and new photos are recognized as soon as they are embedded.
+# Pre-forked workers share a gallery loaded before the fork instead
+recognizer = FaceRecognizer(students_dir="students_database", threshold=0.7,
+                            gallery_index=gallery_index, metrics=metrics,
+                            background_load=os.getenv('GALLERY_BACKGROUND_LOAD', '1') != '0' and not WORKER.workers,
+                            # int8 FaceNet on CPU-only nodes: FACENET_QUANTIZE=static
+                            quantize=os.getenv('FACENET_QUANTIZE') or None)
+gaze_analyzer = GazeAnalyzer()
+
+# Sessions of an exam only match against the students registered for it
+exam_galleries = ExamGalleries(recognizer.gallery, DB_CONFIG,
+                               capacity=int(os.getenv('EXAM_GALLERY_CAPACITY', 16)))
+EXAM_PREWARM_MINUTES = int(os.getenv('EXAM_PREWARM_MINUTES', 30))
+
+# Inference runs in worker threads so a slow frame never stalls other clients
+# (the pool is created by start_worker)
+INFERENCE_WORKERS = int(os.getenv('INFERENCE_WORKERS', 2))
+inference_pool = None
+
+# Per-connection cheating detection state
+sessions = SessionStore(idle_timeout=300, metrics=metrics, recognition_options={
+    # Full recognition only on scene change, lost track, or every N checks
+    'change_threshold': float(os.getenv('RECOGNITION_CHANGE_THRESHOLD', 6.0)),
+    'max_interval': int(os.getenv('RECOGNITION_MAX_INTERVAL', 10))
+})
+EVICTION_INTERVAL = 60  # Seconds between idle session sweeps
+
+# Cheating intervals are written to the alerts table in batches, a few
+# writes per minute instead of one per frame
+alert_writer = AlertWriter(DB_CONFIG, max_batch=int(os.getenv('ALERT_BATCH_SIZE', 50)),
+                           flush_interval=float(os.getenv('ALERT_FLUSH_INTERVAL', 10)))
 
-# Global variables for cheating detection
-class ExamMonitoring:
-    def __init__(self):
-        self.total_frames = 0
-        self.last_detailed_check = 0
-        self.is_cheating = False
-        self.cheating_history = []  # Store history of potential cheating events
-        self.consecutive_not_looking_frames = 0
+# Exam scoping, alerts, gallery upkeep and the frame loop of the sessions
+services = SessionServices(sio, sessions, recognizer, exam_galleries, alert_writer, gallery_feed,
+                           prewarm_minutes=EXAM_PREWARM_MINUTES, eviction_interval=EVICTION_INTERVAL,
+                           feed_interval=GALLERY_FEED_INTERVAL)
 
-# Initialize the exam monitoring instance
-exam_monitor = ExamMonitoring()
+@app.route('/stats')
+def stats():
+    """Server-wide statistics: active sessions, inference pool and batching"""
+    return jsonify({
+        **services.stats(),
+        "exam_galleries": {exam_id: len(exam_galleries.rosters.get(exam_id, ()))
+                           for exam_id in list(exam_galleries.rosters)}
+    })
+
+@app.route('/metrics')
+def stage_metrics():
+    """Latency percentiles per frame stage, server-wide and per session"""
+    return jsonify({
+        "enabled": metrics.enabled,
+        "global": metrics.summary(),
+        "sessions": {session.sid: session.metrics.summary() for session in sessions.all()}
+    })
 
 @sio.on('connect')
 def connect(sid, environ):
-    print(f"Client connected: {sid}")
+    services.connect(sid, environ)
+    logger.info(f"Client connected: {sid} ({len(sessions)} active sessions)")
 
-@sio.on('frame')
-def handle_frame(sid, data):
-    global exam_monitor
-    
-    # Increment the total frames counter
-    exam_monitor.total_frames += 1
-    
-    # Determine if this frame should be processed in detail
-    # Process every frame for first 30 frames, then every 3rd frame
-    detailed_check = (exam_monitor.total_frames < 30 or 
-                      exam_monitor.total_frames % 3 == 0)
+@sio.on('config')
+def handle_config(sid, data):
+    return {"status": "success", **services.configure(sessions.get(sid), data)}
+
+def process_frame(session, image):
+    """
+    Decode and analyze one frame of a session (runs in an inference worker)
+
+    Returns:
+        dict: The response to send, or None if the frame could not be decoded
+    """
+    exam_monitor = session.monitor
+    timers = session.metrics
     
     # Parse the image data
-    img_data = data["image"].split(',')[1]
-    img_bytes = base64.b64decode(img_data)
-    np_arr = np.frombuffer(img_bytes, np.uint8)
-    frame = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
+    with timers.time('decode'):
+        frame, session.binary = decode_frame(image)
+    if frame is None:
+        return None
+    
+    # Count the frame and determine if it should be processed in detail
+    detailed_check = exam_monitor.next_frame()
     
     # Process frame using face recognizer
     if detailed_check:
-        frame_with_faces = recognizer.recognize_face(frame)
-        names = recognizer.known_face_names
-        exam_monitor.last_detailed_check = exam_monitor.total_frames
-    else:
-        # For non-detailed checks, just show the frame without recognition
-        frame_with_faces = frame.copy()
-        names = []# Get eye positions using Haar cascade for exam monitoring
-    eye_positions = []
-    looking_at_screen = False
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-    eye_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
-    
-    # Initialize static variable for consecutive frame tracking if not already present
-    if not hasattr(handle_frame, "looking_at_screen_count"):
-        handle_frame.looking_at_screen_count = 0
-    
-    # Detect faces with more relaxed parameters for exam monitoring scenario
-    faces = face_cascade.detectMultiScale(gray, 1.1, 4)  # More relaxed parameters
-    
-    # Define a threshold for determining if looking at screen
-    frame_height, frame_width = frame.shape[:2]
-    center_x = frame_width // 2
-    center_y = frame_height // 2
-    
-    # Face detected flag
-    face_detected = len(faces) > 0
-    eyes_detected = False
-    
-    for (x, y, w, h) in faces:
-        roi_gray = gray[y:y+h, x:x+w]
+        faces = services.find_faces(frame, session, timers)
         
-        # Use more relaxed parameters for eye detection during exams
-        eyes = eye_cascade.detectMultiScale(roi_gray, 1.1, 2, minSize=(20, 20))
+        # Gaze analysis reuses the MTCNN boxes and landmarks of the recognition pass
+        with timers.time('gaze'):
+            gaze = gaze_analyzer.analyze(faces, frame.shape)
+            looking_at_screen = exam_monitor.update_gaze(gaze["face_detected"], gaze["checks"])
+            services.record_cheating(session, exam_monitor.update_cheating(looking_at_screen))
         
-        # If we found any eyes
-        if len(eyes) > 0:
-            eyes_detected = True
-            
-            # Calculate face center
-            face_center_x = x + w // 2
-            face_center_y = y + h // 2
-            
-            # An array to store eye centers for gaze analysis
-            eye_centers = []
-            
-            # Store eye positions for visualization
-            for (ex, ey, ew, eh) in eyes:
-                eye_center_x = x + ex + ew // 2
-                eye_center_y = y + ey + eh // 2
-                
-                eye_positions.append({
-                    "x": int(eye_center_x),
-                    "y": int(eye_center_y)
-                })
-                
-                eye_centers.append((eye_center_x, eye_center_y))
-            
-            # For exam monitoring - we're more interested in detecting if the person is looking away
-            # from the screen (like looking at someone else's paper) rather than exact gaze direction
-            if len(eye_centers) >= 2:
-                # Sort eye centers by x-coordinate (left to right)
-                eye_centers.sort(key=lambda e: e[0])
-                
-                # Calculate eye alignment
-                left_eye, right_eye = eye_centers[0], eye_centers[1]
-                
-                # Calculate horizontal distance between eyes
-                eye_distance = right_eye[0] - left_eye[0]
-                
-                # Calculate vertical difference and slope
-                eye_vertical_diff = abs(right_eye[1] - left_eye[1])
-                eye_slope = eye_vertical_diff / (eye_distance + 0.01)
-                
-                # Check face rotation - if both eyes are visible and roughly level
-                # then the person is likely looking at the screen
-                
-                # Relaxed slope threshold for natural head positions when viewing screen
-                slope_threshold = 0.4  # Increased from 0.2 to allow more natural head positions
-                
-                # Face size check - make sure face is visible enough (but not too strict)
-                face_size_ratio = (w * h) / (frame_width * frame_height)
-                min_face_ratio = 0.01  # Reduced for more flexibility
-                
-                # Conditions for looking at screen (relaxed for exam scenario)
-                face_centered = (x > frame_width * 0.1 and x + w < frame_width * 0.9)
-                reasonable_eye_distance = (eye_distance > 10)  # Minimum eye separation
-                
-                if (eye_slope < slope_threshold and  
-                    face_size_ratio > min_face_ratio and 
-                    face_centered and
-                    reasonable_eye_distance):
-                    
-                    # Increment counter for stable detection
-                    handle_frame.looking_at_screen_count += 1
-                    if handle_frame.looking_at_screen_count >= 2:  # Require 2 consecutive positive frames
-                        looking_at_screen = True
-                else:
-                    # Decrease counter but don't go below 0
-                    handle_frame.looking_at_screen_count = max(0, handle_frame.looking_at_screen_count - 1)
-                    if handle_frame.looking_at_screen_count < 2:
-                        looking_at_screen = False
-            
-            # Special case: if only one eye is visible but face is centered,
-            # person might still be looking at screen (e.g., with head slightly tilted)
-            elif len(eye_centers) == 1 and face_center_x > frame_width * 0.25 and face_center_x < frame_width * 0.75:
-                looking_at_screen = True
-    
-    # If no eyes detected at all in any face, reset the counter
-    if not eyes_detected:
-        handle_frame.looking_at_screen_count = max(0, handle_frame.looking_at_screen_count - 2)
-      # If no face detected, definitely not looking at screen
-    if not face_detected:
-        looking_at_screen = False
-        handle_frame.looking_at_screen_count = 0
-        
-    # Update cheating detection variables only on detailed checks
-    if detailed_check:
-        if not looking_at_screen:
-            exam_monitor.consecutive_not_looking_frames += 1
-            # If not looking at screen for more than 5 consecutive detailed checks
-            if exam_monitor.consecutive_not_looking_frames > 5:
-                exam_monitor.is_cheating = True
-                # Record the cheating event if it's a new one
-                if not exam_monitor.cheating_history or exam_monitor.cheating_history[-1][1] != exam_monitor.total_frames - 1:
-                    exam_monitor.cheating_history.append((exam_monitor.total_frames, exam_monitor.total_frames))
-                else:
-                    # Update the end time of the current cheating event
-                    exam_monitor.cheating_history[-1] = (exam_monitor.cheating_history[-1][0], exam_monitor.total_frames)
-        else:
-            # Reset consecutive frame counter if looking at screen
-            exam_monitor.consecutive_not_looking_frames = max(0, exam_monitor.consecutive_not_looking_frames - 2)
-              # If we've had enough consecutive "looking at screen" frames, mark as not cheating
-            if exam_monitor.consecutive_not_looking_frames <= 1:
-                exam_monitor.is_cheating = False
+        eye_positions = gaze["eye_positions"]
+    else:
+        # For non-detailed checks, just show the frame and keep the last gaze state
+        faces = []
+        eye_positions = []
+        looking_at_screen = exam_monitor.looking_at_screen_count >= 2
     
-    # Encode frame to send back
-    _, buffer = cv2.imencode('.jpg', frame_with_faces)
-    jpg_as_text = base64.b64encode(buffer).decode('utf-8')
-      # Create the simplified response object with only necessary data
+    # Create the simplified response object with only necessary data
     response = {
-        "image": "data:image/jpeg;base64," + jpg_as_text,
-        "names": names,
-        "is_cheating": exam_monitor.is_cheating  # Simple true/false flag
+        **face_results(faces),
+        "is_cheating": exam_monitor.is_cheating,  # Simple true/false flag
+        "detailed_check": detailed_check,
+        "looking_at_screen": looking_at_screen,
+        "eye_positions": eye_positions
     }
     
-    # Send the response
-    sio.emit("response", response, to=sid)
+    if session.annotated:
+        with timers.time('encode'):
+            response["image"] = encode_frame(recognizer.draw_results(frame, faces), session.binary)
+    
+    return response
+
+@sio.on('frame')
+def handle_frame(sid, data):
+    services.serve_frame(sid, data["image"], process_frame)
 
 @sio.on('disconnect')
 def disconnect(sid):
-    print(f"Client disconnected: {sid}")
+    services.disconnect(sid)
+
+def warm_up():
+    """Pre-fork server hook: run the models once before the workers are forked"""
+    recognizer.warm_up()
+
+def start_worker():
+    """
+    Start the threads and background tasks of a serving process, then warm up
+
+    Called by __main__, or in each worker of the pre-fork server: threads
+    started before a fork do not exist in the forked workers.
+    """
+    global inference_pool
+    # Faces from all sessions share FaceNet forward passes
+    recognizer.enable_batching(max_batch_size=int(os.getenv('EMBED_BATCH_SIZE', 32)),
+                               max_wait_ms=float(os.getenv('EMBED_BATCH_WAIT_MS', 10)))
+    inference_pool = InferencePool(workers=INFERENCE_WORKERS, torch_threads=WORKER.torch_threads(INFERENCE_WORKERS))
+    services.start(inference_pool)
+    # Through the batcher and this process's torch threads
+    recognizer.warm_up()
+
+def stop_worker():
+    """Write the alerts still buffered"""
+    services.stop()
 
 if __name__ == '__main__':
-    eventlet.wsgi.server(eventlet.listen(('', 5000)), app)
+    start_worker()
+    try:
+        eventlet.wsgi.server(eventlet.listen(('', 5000)), app)
+    finally:
+        stop_worker()
@@ -0,0 +1,158 @@
+import threading
+import numpy as np
+from gallery_index import ExactIndex
+
+class FaceGallery:
+    """Known-face embeddings kept as one L2-normalized matrix for 1:N matching"""
+
+    def __init__(self, dim=512, capacity=256, index=None):
+        """
+        Initialize an empty gallery
+
+        Args:
+            dim (int): Embedding dimension (512 for InceptionResnetV1)
+            capacity (int): Initial number of preallocated rows
+            index (GalleryIndex): Search strategy, exact search by default
+        """
+        self.dim = dim
+        self._matrix = np.zeros((max(capacity, 1), dim), dtype=np.float32)
+        self._keys = []
+        self._names = []
+        self._rows = {}  # key -> row index in self._matrix
+        self.index = index if index is not None else ExactIndex()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        return key in self._rows
+
+    @property
+    def names(self):
+        return list(self._names)
+
+    @property
+    def keys(self):
+        return list(self._keys)
+
+    @staticmethod
+    def normalize(embeddings):
+        """Return float32 copies of the embeddings scaled to unit length (row-wise)"""
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if embeddings.ndim == 1:
+            embeddings = embeddings[np.newaxis, :]
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings / np.maximum(norms, 1e-12)
+
+    def get(self, key):
+        """
+        Look up one face
+
+        Returns:
+            tuple: (name, normalized embedding copy), or None if the key is unknown
+        """
+        with self._lock:
+            row = self._rows.get(key)
+            if row is None:
+                return None
+            return self._names[row], self._matrix[row].copy()
+
+    def add(self, key, name, embedding):
+        """
+        Add a face to the gallery, replacing any existing entry with the same key
+
+        Args:
+            key: Unique identifier of the student (e.g. database id)
+            name (str): Display name returned on a match
+            embedding: 1 x dim or dim-sized embedding (torch tensor or array-like)
+        """
+        if hasattr(embedding, 'detach'):
+            embedding = embedding.detach().cpu().numpy()
+        vector = self.normalize(embedding)[0]
+
+        with self._lock:
+            row = self._rows.get(key)
+            if row is None:
+                row = len(self._keys)
+                if row == self._matrix.shape[0]:
+                    # Grow geometrically so that repeated inserts stay amortized O(dim)
+                    grown = np.zeros((self._matrix.shape[0] * 2, self.dim), dtype=np.float32)
+                    grown[:row] = self._matrix[:row]
+                    self._matrix = grown
+                self._rows[key] = row
+                self._keys.append(key)
+                self._names.append(name)
+            else:
+                self._names[row] = name
+            self._matrix[row] = vector
+            self.index.add(row, self._matrix, len(self._keys))
+
+    def remove(self, key):
+        """
+        Remove a face from the gallery by moving the last row into its slot
+
+        Returns:
+            bool: True if the key was present
+        """
+        with self._lock:
+            row = self._rows.pop(key, None)
+            if row is None:
+                return False
+            last = len(self._keys) - 1
+            if row != last:
+                self._matrix[row] = self._matrix[last]
+                self._keys[row] = self._keys[last]
+                self._names[row] = self._names[last]
+                self._rows[self._keys[row]] = row
+            self._keys.pop()
+            self._names.pop()
+            self.index.remove(row, last)
+            return True
+
+    def subset(self, keys, index=None):
+        """
+        Build a new gallery holding only the given keys (unknown keys are skipped)
+
+        Args:
+            keys: Iterable of student identifiers
+            index (GalleryIndex): Search strategy of the subset, exact search by default
+
+        Returns:
+            FaceGallery: Independent copy of the selected rows
+        """
+        with self._lock:
+            rows = [self._rows[key] for key in dict.fromkeys(keys) if key in self._rows]
+            subset = FaceGallery(self.dim, capacity=len(rows), index=index)
+            subset._matrix[:len(rows)] = self._matrix[rows]
+            subset._keys = [self._keys[row] for row in rows]
+            subset._names = [self._names[row] for row in rows]
+        subset._rows = {key: i for i, key in enumerate(subset._keys)}
+        for row in range(len(rows)):
+            subset.index.add(row, subset._matrix, row + 1)
+        return subset
+
+    def match(self, embeddings, k=2):
+        """
+        Match query embeddings against the gallery through its index
+
+        Args:
+            embeddings: n x dim query embeddings (torch tensor or array-like)
+            k (int): Number of best candidates to return per query
+
+        Returns:
+            list: For each query, up to k (key, name, similarity) tuples sorted
+                from best to worst
+        """
+        if hasattr(embeddings, 'detach'):
+            embeddings = embeddings.detach().cpu().numpy()
+        queries = self.normalize(embeddings)
+
+        with self._lock:
+            count = len(self._keys)
+            if count == 0:
+                return [[] for _ in range(len(queries))]
+            return [
+                [(self._keys[i], self._names[i], float(s)) for i, s in zip(rows, scores)]
+                for rows, scores in self.index.search(queries, self._matrix, count, k)
+            ]
@@ -0,0 +1,102 @@
+import logging
+import mysql.connector
+
+logger = logging.getLogger(__name__)
+
+# Written by AcademGuard whenever a student's photo may have changed (e.g. an
+# approved identity verification); the id is the change cursor
+CHANGES_TABLE_DDL = """
+CREATE TABLE IF NOT EXISTS face_gallery_changes (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    student_id INT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+class GalleryChangeFeed:
+    """
+    Applies student photo changes to the live gallery without a restart
+
+    Each poll reads the face_gallery_changes rows after the last seen id and
+    refreshes only the students they name: one photo is fetched and embedded
+    per changed student, then inserted into or removed from the gallery.
+    """
+
+    def __init__(self, db_config, batch_size=500):
+        """
+        Args:
+            db_config (dict): mysql.connector connection arguments
+            batch_size (int): Maximum number of change rows read per poll
+        """
+        self.db_config = db_config
+        self.batch_size = batch_size
+        self.cursor = None  # Last applied change id
+        self.applied = 0
+
+    def _connect(self):
+        return mysql.connector.connect(**self.db_config)
+
+    def mark(self):
+        """
+        Create the table if needed and start from its current end
+
+        Call this before the full gallery load so no change made during the
+        load is missed (replaying one is harmless).
+        """
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(CHANGES_TABLE_DDL)
+            cursor.execute("SELECT COALESCE(MAX(id), 0) FROM face_gallery_changes")
+            (self.cursor,) = cursor.fetchone()
+            cursor.close()
+        finally:
+            conn.close()
+        logger.info(f"Gallery change feed starting after change {self.cursor}")
+        return self.cursor
+
+    def poll(self, recognizer, exam_galleries=None):
+        """
+        Apply the changes recorded since the last poll
+
+        Args:
+            recognizer (FaceRecognizer): Owner of the live gallery
+            exam_galleries (ExamGalleries): Cached exam subsets to keep in sync
+
+        Returns:
+            dict: student_id -> 'added' / 'removed' / 'unchanged'
+        """
+        if self.cursor is None:
+            self.mark()
+
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id, student_id FROM face_gallery_changes WHERE id > %s ORDER BY id LIMIT %s",
+                           (self.cursor, self.batch_size))
+            rows = cursor.fetchall()
+            cursor.close()
+        finally:
+            conn.close()
+        if not rows:
+            return {}
+
+        # A student changed several times since the last poll is refreshed once
+        results = {}
+        for change_id, student_id in rows:
+            if student_id not in results:
+                try:
+                    results[student_id] = recognizer.refresh_student(student_id)
+                except Exception as e:
+                    # Leave the cursor before this change so it is retried
+                    logger.error(f"Error applying gallery change {change_id} for student {student_id}: {e}")
+                    break
+                if exam_galleries is not None:
+                    exam_galleries.update_student(student_id)
+            self.cursor = change_id
+            self.applied += 1
+
+        if recognizer.store is not None:
+            recognizer.store.save()
+        logger.info(f"Applied gallery changes up to {self.cursor}: {results}")
+        return results
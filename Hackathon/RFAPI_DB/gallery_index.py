@@ -0,0 +1,177 @@
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+def top_k(scores, k):
+    """
+    Best k columns of each row of a score matrix
+
+    Args:
+        scores: n x m similarity matrix
+        k (int): Number of columns to keep (clamped to m)
+
+    Returns:
+        tuple: (n x k column indices, n x k scores), sorted from best to worst
+    """
+    count = scores.shape[1]
+    k = min(k, count)
+    if k < count:
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        top = np.tile(np.arange(count), (len(scores), 1))
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1)
+    return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+class GalleryIndex:
+    """
+    Search strategy of a FaceGallery
+
+    The gallery owns the normalized embedding matrix and tells its index
+    which rows change; the index decides which rows to score for a query.
+    All methods are called with the gallery lock held.
+    """
+
+    def add(self, row, matrix, count):
+        """Row `row` of matrix was inserted or overwritten (count rows in use)"""
+
+    def remove(self, row, last):
+        """Row `row` was removed and row `last` moved into its slot (row == last if it was the last one)"""
+
+    def search(self, queries, matrix, count, k):
+        """
+        Find the k most similar rows of each query
+
+        Args:
+            queries: n x dim normalized query embeddings
+            matrix: Gallery matrix, only the first count rows are in use
+            count (int): Number of rows in use
+            k (int): Number of candidates per query
+
+        Returns:
+            list: For each query, a (row indices, similarities) pair of arrays
+                sorted from best to worst
+        """
+        raise NotImplementedError
+
+class ExactIndex(GalleryIndex):
+    """Brute-force search: one matrix product against every row"""
+
+    def search(self, queries, matrix, count, k):
+        rows, scores = top_k(queries @ matrix[:count].T, k)
+        return list(zip(rows, scores))
+
+class IVFIndex(GalleryIndex):
+    """
+    Inverted-file approximate search for large galleries
+
+    A spherical k-means coarse quantizer splits the gallery into nlist
+    cells; a query only scores the rows of its nprobe closest cells.
+    nprobe is the recall/speed knob: nprobe == nlist is an exact search.
+
+    Small galleries are searched exactly until min_train_size rows are in
+    use. New rows are assigned to their closest cell as they arrive and the
+    quantizer is retrained once the gallery has doubled since training.
+    """
+
+    def __init__(self, nlist=None, nprobe=8, min_train_size=1024, iterations=10, seed=0):
+        """
+        Args:
+            nlist (int): Number of cells, defaults to sqrt(gallery size) at training time
+            nprobe (int): Number of cells scanned per query
+            min_train_size (int): Gallery size below which search stays exact
+            iterations (int): k-means iterations when training
+            seed (int): Seed of the k-means initialization
+        """
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        self.iterations = iterations
+        self.rng = np.random.default_rng(seed)
+        self.centroids = None
+        self.trained_size = 0
+        self._lists = []  # cell -> list of rows
+        self._where = {}  # row -> (cell, position in its list)
+
+    @property
+    def trained(self):
+        return self.centroids is not None
+
+    def train(self, matrix, count):
+        """Fit the coarse quantizer on the rows in use and reassign them all"""
+        vectors = matrix[:count]
+        nlist = self.nlist or max(1, int(round(np.sqrt(count))))
+        nlist = min(nlist, count)
+
+        # Spherical k-means on a sample, at most 64 points per cell
+        sample = vectors[self.rng.choice(count, min(count, 64 * nlist), replace=False)]
+        centroids = sample[self.rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(self.iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            sizes = np.bincount(assignment, minlength=nlist)
+            # Reseed empty cells with random sample points
+            empty = sizes == 0
+            sums[empty] = sample[self.rng.choice(len(sample), int(empty.sum()))]
+            centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+
+        self.centroids = centroids.astype(np.float32)
+        self.trained_size = count
+        self._lists = [[] for _ in range(nlist)]
+        self._where = {}
+        for row, cell in enumerate(np.argmax(vectors @ self.centroids.T, axis=1)):
+            self._where[row] = (int(cell), len(self._lists[cell]))
+            self._lists[cell].append(row)
+        logger.info(f"Trained IVF index: {count} rows in {nlist} cells")
+
+    def _unlink(self, row):
+        """Remove a row from its cell by swapping the cell's last row into its place"""
+        cell, position = self._where.pop(row)
+        members = self._lists[cell]
+        moved = members.pop()
+        if moved != row:
+            members[position] = moved
+            self._where[moved] = (cell, position)
+
+    def add(self, row, matrix, count):
+        if not self.trained:
+            if count >= self.min_train_size:
+                self.train(matrix, count)
+            return
+        if count >= 2 * self.trained_size:
+            self.train(matrix, count)
+            return
+        if row in self._where:
+            self._unlink(row)
+        cell = int(np.argmax(self.centroids @ matrix[row]))
+        self._where[row] = (cell, len(self._lists[cell]))
+        self._lists[cell].append(row)
+
+    def remove(self, row, last):
+        if not self.trained:
+            return
+        self._unlink(row)
+        if last != row:
+            # The gallery moved its last row into the freed slot
+            cell, position = self._where.pop(last)
+            self._lists[cell][position] = row
+            self._where[row] = (cell, position)
+
+    def search(self, queries, matrix, count, k):
+        if not self.trained:
+            return ExactIndex().search(queries, matrix, count, k)
+
+        nprobe = min(self.nprobe, len(self._lists))
+        cells, _ = top_k(queries @ self.centroids.T, nprobe)
+        results = []
+        for query, probed in zip(queries, cells):
+            candidates = np.fromiter(
+                (row for cell in probed for row in self._lists[cell]), dtype=np.intp)
+            if len(candidates) == 0:
+                results.append((candidates, np.zeros(0, dtype=np.float32)))
+                continue
+            positions, scores = top_k((matrix[candidates] @ query)[np.newaxis, :], k)
+            results.append((candidates[positions[0]], scores[0]))
+        return results
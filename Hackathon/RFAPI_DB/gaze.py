@@ -0,0 +1,92 @@
+class GazeAnalyzer:
+    """
+    Looking-at-screen heuristic computed from MTCNN boxes and landmarks
+
+    Reuses the detections of the recognition pass (no extra detector): the
+    two eye landmarks give the eye slope and separation, the box gives the
+    face size and horizontal centering. The thresholds are the ones of the
+    previous Haar cascade heuristic.
+    """
+
+    def __init__(self, slope_threshold=0.4, min_face_ratio=0.01, min_eye_distance=10,
+                 center_margin=0.1):
+        """
+        Args:
+            slope_threshold (float): Maximum |dy/dx| between the eyes
+            min_face_ratio (float): Minimum face area as a fraction of the frame
+            min_eye_distance (float): Minimum horizontal eye separation in pixels
+            center_margin (float): Fraction of the frame width on each side the
+                face box must stay clear of
+        """
+        self.slope_threshold = slope_threshold
+        self.min_face_ratio = min_face_ratio
+        self.min_eye_distance = min_eye_distance
+        self.center_margin = center_margin
+
+    def check_face(self, box, landmarks, frame_width, frame_height):
+        """
+        Evaluate one face
+
+        Args:
+            box: [x1, y1, x2, y2] face box
+            landmarks: Five [x, y] MTCNN points (left eye, right eye, nose,
+                mouth left, mouth right)
+            frame_width (int): Frame width in pixels
+            frame_height (int): Frame height in pixels
+
+        Returns:
+            dict: Eye centers, slope, eye distance and whether the face passes
+                all the looking-at-screen checks
+        """
+        x1, y1, x2, y2 = box
+        w, h = x2 - x1, y2 - y1
+
+        # Sort eye centers by x-coordinate (left to right)
+        left_eye, right_eye = sorted((landmarks[0], landmarks[1]), key=lambda e: e[0])
+        eye_distance = right_eye[0] - left_eye[0]
+        eye_slope = abs(right_eye[1] - left_eye[1]) / (eye_distance + 0.01)
+
+        face_size_ratio = (w * h) / (frame_width * frame_height)
+        face_centered = (x1 > frame_width * self.center_margin and
+                         x2 < frame_width * (1 - self.center_margin))
+
+        looking = (eye_slope < self.slope_threshold and
+                   face_size_ratio > self.min_face_ratio and
+                   face_centered and
+                   eye_distance > self.min_eye_distance)
+
+        return {
+            "eyes": [left_eye, right_eye],
+            "eye_slope": eye_slope,
+            "eye_distance": eye_distance,
+            "looking": looking
+        }
+
+    def analyze(self, faces, frame_shape):
+        """
+        Evaluate every face of a frame
+
+        Args:
+            faces (list): Results of FaceRecognizer.identify_faces (each with
+                "box" and "landmarks")
+            frame_shape (tuple): Shape of the analyzed frame
+
+        Returns:
+            dict: face_detected flag, per-face checks (list of bools) and eye
+                positions for visualization
+        """
+        frame_height, frame_width = frame_shape[:2]
+        checks = []
+        eye_positions = []
+        for face in faces:
+            if face.get("landmarks") is None:
+                continue
+            result = self.check_face(face["box"], face["landmarks"], frame_width, frame_height)
+            checks.append(result["looking"])
+            eye_positions.extend({"x": int(x), "y": int(y)} for x, y in result["eyes"])
+
+        return {
+            "face_detected": len(faces) > 0,
+            "checks": checks,
+            "eye_positions": eye_positions
+        }
@@ -0,0 +1,43 @@
+import os
+import logging
+import torch
+from eventlet import tpool
+from eventlet.semaphore import Semaphore
+
+logger = logging.getLogger(__name__)
+
+class InferencePool:
+    """
+    Bounded pool running inference in OS threads, off the eventlet hub
+
+    torch releases the GIL inside its kernels, so MTCNN and FaceNet calls
+    made through eventlet's thread pool run in parallel with each other and
+    never block the green threads serving the other clients. The semaphore
+    caps how many frames are in inference at once; extra callers wait
+    cooperatively.
+    """
+
+    def __init__(self, workers=2, torch_threads=None):
+        """
+        Args:
+            workers (int): Maximum number of frames processed concurrently
+            torch_threads (int): Intra-op threads per torch call. Defaults to
+                the CPU count divided among the workers to avoid oversubscription
+        """
+        self.workers = workers
+        self._slots = Semaphore(workers)
+        self.active = 0
+
+        if torch_threads is None:
+            torch_threads = max(1, (os.cpu_count() or 1) // workers)
+        torch.set_num_threads(torch_threads)
+        logger.info(f"Inference pool: {workers} workers x {torch_threads} torch threads")
+
+    def run(self, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) in a worker thread and wait for its result"""
+        with self._slots:
+            self.active += 1
+            try:
+                return tpool.execute(fn, *args, **kwargs)
+            finally:
+                self.active -= 1
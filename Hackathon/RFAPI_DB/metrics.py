@@ -0,0 +1,137 @@
+import math
+import time
+import threading
+
+# Bucket upper bounds in seconds: 50 us to ~60 s, each 25% above the previous
+GROWTH = 1.25
+BUCKETS = tuple(0.00005 * GROWTH ** i for i in range(64))
+
+class Histogram:
+    """Fixed-memory latency histogram with geometric buckets"""
+
+    __slots__ = ('counts', 'count', 'total', 'max', '_lock')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # last bucket: above BUCKETS[-1]
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        # Geometric buckets: the index follows from the logarithm, no search needed
+        index = 0
+        if seconds > BUCKETS[0]:
+            index = min(len(BUCKETS), math.ceil(math.log(seconds / BUCKETS[0]) / math.log(GROWTH)))
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def percentile(self, p):
+        """Approximate p-th percentile in seconds (linear within the bucket)"""
+        with self._lock:
+            counts, count, maximum = list(self.counts), self.count, self.max
+        if count == 0:
+            return 0.0
+        rank = p / 100.0 * count
+        seen = 0
+        for index, bucket_count in enumerate(counts):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = BUCKETS[index - 1] if index > 0 else 0.0
+                upper = BUCKETS[index] if index < len(BUCKETS) else maximum
+                value = lower + (upper - lower) * (rank - seen) / bucket_count
+                return min(value, maximum)
+            seen += bucket_count
+        return maximum
+
+    def summary(self):
+        """Count, mean, p50/p90/p99 and max in milliseconds"""
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "p50_ms": self.percentile(50) * 1000,
+            "p90_ms": self.percentile(90) * 1000,
+            "p99_ms": self.percentile(99) * 1000,
+            "max_ms": self.max * 1000
+        }
+
+class _StageTimer:
+    """Context manager recording the duration of its block into a Metrics"""
+
+    __slots__ = ('metrics', 'stage', 'start')
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.record(self.stage, time.perf_counter() - self.start)
+        return False
+
+class _NullTimer:
+    """Shared no-op timer returned when metrics are disabled"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_TIMER = _NullTimer()
+
+class Metrics:
+    """
+    Per-stage latency histograms
+
+    Each session owns a Metrics whose samples are also recorded into the
+    server-wide parent. When disabled, time() returns a shared no-op
+    context manager so instrumented code costs a method call per stage.
+    """
+
+    def __init__(self, enabled=True, parent=None):
+        """
+        Args:
+            enabled (bool): Record samples at all
+            parent (Metrics): Aggregate that receives every sample as well
+        """
+        self.enabled = enabled
+        self.parent = parent
+        self.stages = {}  # stage name -> Histogram
+
+    def child(self):
+        """New Metrics feeding this one, e.g. for a session"""
+        return Metrics(enabled=self.enabled, parent=self)
+
+    def time(self, stage):
+        """
+        Time a block of code
+
+        Usage:
+            with metrics.time('mtcnn'):
+                boxes = detector.detect(img)
+        """
+        if not self.enabled:
+            return NULL_TIMER
+        return _StageTimer(self, stage)
+
+    def record(self, stage, seconds):
+        if not self.enabled:
+            return
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            histogram = self.stages.setdefault(stage, Histogram())
+        histogram.record(seconds)
+        if self.parent is not None:
+            self.parent.record(stage, seconds)
+
+    def summary(self):
+        return {stage: histogram.summary() for stage, histogram in list(self.stages.items())}
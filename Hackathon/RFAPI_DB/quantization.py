@@ -0,0 +1,43 @@
+import copy
+import logging
+import torch
+from torch.ao.quantization import get_default_qconfig_mapping
+from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+
+logger = logging.getLogger(__name__)
+
+# Dynamic quantization is not offered: it only covers the final linear
+# layer of InceptionResnetV1, not the convolutions, so it is close to a no-op
+QUANTIZE_MODES = ('static',)
+
+def quantize_model(model, mode, calibration=None, batch_size=16):
+    """
+    Int8 copy of a float InceptionResnetV1 for CPU inference
+
+    'static' quantizes the whole network through FX graph mode, with
+    activation ranges observed on calibration faces.
+
+    Args:
+        model: Float model in eval mode, on the CPU
+        mode (str): 'static'
+        calibration (torch.Tensor): n x 3 x 160 x 160 aligned faces (a few
+            dozen real faces are enough)
+        batch_size (int): Faces per calibration forward pass
+
+    Returns:
+        torch.nn.Module: The quantized model (CPU only)
+    """
+    if mode not in QUANTIZE_MODES:
+        raise ValueError(f"Unknown quantization mode {mode!r}, expected one of {QUANTIZE_MODES}")
+
+    model = copy.deepcopy(model).cpu().eval()
+    if calibration is None or len(calibration) == 0:
+        raise ValueError("static quantization needs calibration faces")
+    qconfig_mapping = get_default_qconfig_mapping(torch.backends.quantized.engine)
+    prepared = prepare_fx(model, qconfig_mapping, example_inputs=(calibration[:1],))
+    with torch.no_grad():
+        for start in range(0, len(calibration), batch_size):
+            prepared(calibration[start:start + batch_size])
+    logger.info(f"Calibrated static quantization on {len(calibration)} faces "
+                f"({torch.backends.quantized.engine} backend)")
+    return convert_fx(prepared)
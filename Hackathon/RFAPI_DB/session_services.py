@@ -0,0 +1,306 @@
+"""
+Sessions, exam galleries and alerts of a Socket.IO frame server
+
+Shared by the face service (flaskws.py) and the proctoring service
+(ProctoringService/frame_service.py): they differ in the analysis they run
+on a frame, not in how sessions are scoped, frames queued or alerts written.
+"""
+import time
+import base64
+import logging
+from urllib.parse import parse_qs
+import cv2
+import numpy as np
+from eventlet import tpool
+
+logger = logging.getLogger(__name__)
+
+def decode_frame(image):
+    """
+    Decode a frame sent by the client
+
+    Args:
+        image: Raw JPEG bytes (socket.io binary attachment) or a base64
+            data URL string
+
+    Returns:
+        tuple: (BGR frame or None, True if the payload was binary)
+    """
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        img_bytes = image
+        binary = True
+    else:
+        img_bytes = base64.b64decode(image.split(',')[1])
+        binary = False
+    np_arr = np.frombuffer(img_bytes, np.uint8)
+    return cv2.imdecode(np_arr, cv2.IMREAD_COLOR), binary
+
+def encode_frame(frame, binary):
+    """JPEG of an annotated frame, as raw bytes to clients that send binary frames"""
+    _, buffer = cv2.imencode('.jpg', frame)
+    if binary:
+        return buffer.tobytes()
+    return "data:image/jpeg;base64," + base64.b64encode(buffer).decode('utf-8')
+
+def face_results(faces):
+    """Names of the recognized students and every face's box and match, as sent to clients"""
+    return {
+        "names": [face["name"] for face in faces if face["recognized"]],
+        "faces": [
+            {"box": face["box"], "name": face["name"] if face["recognized"] else None,
+             "similarity": face["similarity"]}
+            for face in faces
+        ]
+    }
+
+def parse_id(value, what, sid):
+    """Integer id sent by a client, None when missing or invalid"""
+    try:
+        return int(value) if value not in (None, '') else None
+    except (TypeError, ValueError):
+        logger.warning(f"Ignoring invalid {what} for {sid}: {value!r}")
+        return None
+
+class SessionServices:
+    """
+    Everything around the analysis of a server's frames
+
+    Scopes sessions to an exam gallery, writes their cheating intervals as
+    alerts, keeps the exam galleries and the gallery itself up to date, and
+    runs the frame loop of a session on the inference pool. The service
+    supplies the analysis as a process_frame(session, image) function.
+    """
+
+    def __init__(self, sio, sessions, recognizer, exam_galleries, alert_writer, gallery_feed,
+                 end_session=None, prewarm_minutes=30, eviction_interval=60, feed_interval=5):
+        """
+        Args:
+            sio (socketio.Server): Server the sessions are connected to
+            sessions (SessionStore): Per-connection state
+            recognizer (FaceRecognizer): Holds the full gallery
+            exam_galleries (ExamGalleries): Per-exam subsets of the gallery
+            alert_writer (AlertWriter): Batches the cheating intervals
+            gallery_feed (GalleryChangeFeed): Photo changes to apply
+            end_session: Called with a session that disconnected or was
+                evicted, defaults to recording its open cheating interval
+            prewarm_minutes (int): Exams starting this soon get their gallery
+            eviction_interval (float): Seconds between idle session sweeps
+                and exam gallery upkeep
+            feed_interval (float): Seconds between gallery change polls
+        """
+        self.sio = sio
+        self.sessions = sessions
+        self.recognizer = recognizer
+        self.exam_galleries = exam_galleries
+        self.alert_writer = alert_writer
+        self.gallery_feed = gallery_feed
+        self.end_session = end_session or self.end_cheating
+        self.prewarm_minutes = prewarm_minutes
+        self.eviction_interval = eviction_interval
+        self.feed_interval = feed_interval
+        self.inference_pool = None  # Set by start
+
+    def start(self, inference_pool):
+        """Start the alert writer and the background tasks; frames are analyzed on inference_pool"""
+        self.inference_pool = inference_pool
+        self.alert_writer.start()
+        self.sio.start_background_task(self.evict_idle_sessions)
+        self.sio.start_background_task(self.maintain_exam_galleries)
+        self.sio.start_background_task(self.apply_gallery_changes)
+
+    def stop(self):
+        """Write the alerts still buffered"""
+        self.alert_writer.stop()
+
+    def record_cheating(self, session, interval):
+        """Queue a finished cheating interval as an alert (sessions that named their student and exam)"""
+        if interval is None or session.student_id is None or session.exam_id is None:
+            return
+        self.alert_writer.add(session.student_id, session.exam_id, interval)
+
+    def end_cheating(self, session):
+        """Record the cheating interval still open when a session ends"""
+        self.record_cheating(session, session.monitor.end_cheating())
+
+    def evict_idle_sessions(self):
+        """Background task dropping sessions whose disconnect was never received"""
+        while True:
+            self.sio.sleep(self.eviction_interval)
+            for session in self.sessions.evict_idle():
+                self.end_session(session)
+                logger.info(f"Evicted idle session: {session.sid}")
+
+    def maintain_exam_galleries(self):
+        """Background task loading upcoming exams and dropping finished ones"""
+        while True:
+            try:
+                # Subsets cut from a partial gallery would miss students
+                if self.recognizer.ready.is_set():
+                    # Database round trips run in a thread so they never block the hub
+                    for exam_id in tpool.execute(self.exam_galleries.prewarm, self.prewarm_minutes):
+                        logger.info(f"Pre-warmed gallery for exam {exam_id}")
+                    tpool.execute(self.exam_galleries.evict_finished)
+            except Exception as e:
+                logger.error(f"Error maintaining exam galleries: {e}")
+            self.sio.sleep(self.eviction_interval)
+
+    def apply_gallery_changes(self):
+        """Background task applying new student photos to the live gallery"""
+        while True:
+            self.sio.sleep(self.feed_interval)
+            if not self.recognizer.ready.is_set():
+                continue
+            try:
+                # Embedding runs in a thread; recognition continues meanwhile
+                tpool.execute(self.gallery_feed.poll, self.recognizer, self.exam_galleries)
+            except Exception as e:
+                logger.error(f"Error polling gallery changes: {e}")
+
+    def gallery_for(self, session):
+        """Gallery a session's faces are matched against (runs in an inference worker)"""
+        # While the gallery is still loading, match against the faces loaded so far
+        if session.exam_id is None or not self.recognizer.ready.is_set():
+            return self.recognizer.gallery
+        try:
+            return self.exam_galleries.get(session.exam_id)
+        except Exception as e:
+            logger.error(f"Error loading gallery for exam {session.exam_id}, using the full gallery: {e}")
+            return self.recognizer.gallery
+
+    def find_faces(self, frame, session, timers):
+        """
+        Faces of a session's frame with their identities (runs in an inference worker)
+
+        The faces tracked since the last full recognition are reused, with
+        their landmarks refreshed by MTCNN on a crop around each box, unless
+        the scene changed, a track was lost or the maximum interval since the
+        last full recognition is reached.
+
+        Args:
+            frame: Decoded BGR frame
+            session (ExamSession): Session the frame belongs to
+            timers (Metrics): Stage timers of the session
+
+        Returns:
+            list: FaceRecognizer.identify_faces dicts, empty if recognition failed
+        """
+        recognizer = self.recognizer
+        with timers.time('tracking'):
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            faces = session.recognition.track(gray)
+        if faces is not None:
+            # Tracked boxes, current landmarks: gaze must not lag behind
+            with timers.time('landmarks'):
+                faces = recognizer.refresh_landmarks(frame, faces)
+        if faces is None:
+            try:
+                faces = recognizer.identify_faces(frame, self.gallery_for(session), metrics=timers)
+                session.recognition.update(gray, faces)
+            except Exception as e:
+                logger.error(f"Error during recognition: {e}")
+                faces = []
+        return faces
+
+    def set_exam(self, session, exam_id):
+        """Scope a session to an exam and start loading its gallery in the background"""
+        session.exam_id = parse_id(exam_id, "exam id", session.sid)
+        if (session.exam_id is not None and session.exam_id not in self.exam_galleries
+                and self.recognizer.ready.is_set()):
+            self.sio.start_background_task(tpool.execute, self.gallery_for, session)
+
+    def set_student(self, session, student_id):
+        """Record which student a session belongs to, needed to write its alerts"""
+        session.student_id = parse_id(student_id, "student id", session.sid)
+
+    def connect(self, sid, environ):
+        """
+        Session of a new connection, scoped by its query string:
+        /socket.io/?exam_id=42&student_id=7
+
+        Returns:
+            Session: The connection's session
+        """
+        session = self.sessions.get(sid)
+        query = parse_qs(environ.get('QUERY_STRING', ''))
+        if 'exam_id' in query:
+            self.set_exam(session, query['exam_id'][0])
+        if 'student_id' in query:
+            self.set_student(session, query['student_id'][0])
+        return session
+
+    def configure(self, session, data):
+        """
+        Apply the session settings of a config event
+
+        Returns:
+            dict: The session's settings, to echo back to the client
+        """
+        if "annotated" in data:
+            # Metadata-only clients skip the JPEG encode and most of the bandwidth
+            session.annotated = bool(data["annotated"])
+        if "exam_id" in data:
+            self.set_exam(session, data["exam_id"])
+            # A different roster invalidates the identities being tracked
+            session.recognition.since_full = session.recognition.max_interval
+        if "student_id" in data:
+            self.set_student(session, data["student_id"])
+        return {"annotated": session.annotated, "exam_id": session.exam_id, "student_id": session.student_id}
+
+    def serve_frame(self, sid, image, process_frame):
+        """
+        Analyze a frame of a session and send the response, one frame of a
+        session at a time
+
+        Args:
+            sid (str): Session the frame was sent by
+            image: The frame as sent by the client
+            process_frame: Called as process_frame(session, image) in an
+                inference worker, returns the response dict or None
+        """
+        session = self.sessions.get(sid)
+
+        # Keep at most one pending frame per session: if a frame of this session is
+        # already being processed, park this one (replacing any older pending frame)
+        item = (time.monotonic(), image)
+        if not session.frames.offer(item):
+            return
+
+        while item is not None:
+            received_at, image = item
+            try:
+                response = self.inference_pool.run(process_frame, session, image)
+            except Exception as e:
+                logger.error(f"Error processing frame from {sid}: {e}")
+                response = None
+
+            if response is not None:
+                latency = time.monotonic() - received_at
+                session.frames.record_latency(latency)
+                # Receive -> response, including the wait for a worker
+                session.metrics.record('end_to_end', latency)
+                # Queue depth, drop count and end-to-end latency of this session
+                response["stats"] = {**session.frames.stats(), **session.recognition.stats()}
+                self.sio.emit("response", response, to=sid)
+
+            # Continue with the newest frame that arrived meanwhile, if any
+            item = session.frames.next()
+
+    def disconnect(self, sid):
+        """End the session of a closed connection"""
+        session = self.sessions.remove(sid)
+        logger.info(f"Client disconnected: {sid} ({len(self.sessions)} active sessions)")
+        if session is not None:
+            self.end_session(session)
+            logger.info(f"Session stats for {sid}: {session.frames.stats()}")
+
+    def stats(self):
+        """Sessions, inference pool, alerts and gallery, for the /stats route"""
+        return {
+            "sessions": len(self.sessions),
+            "inference_workers": self.inference_pool.workers,
+            "inference_active": self.inference_pool.active,
+            "alerts": self.alert_writer.stats(),
+            "gallery": {"ready": self.recognizer.ready.is_set(), "faces": len(self.recognizer.gallery),
+                        **self.recognizer.load_progress},
+            "batching": self.recognizer.batcher.stats() if self.recognizer.batcher else None
+        }
@@ -0,0 +1,288 @@
+import time
+import zlib
+from collections import deque
+import threading
+import logging
+from tracking import RecognitionGate
+from metrics import Metrics
+
+logger = logging.getLogger(__name__)
+
+class ExamMonitoring:
+    """Cheating detection state of one connected student"""
+
+    __slots__ = ('total_frames', 'last_detailed_check', 'is_cheating', 'cheating_history',
+                 'cheating_started_at', 'consecutive_not_looking_frames', 'looking_at_screen_count')
+
+    def __init__(self, history_size=100):
+        """
+        Args:
+            history_size (int): Number of recent cheating intervals kept in
+                memory (older ones are only in the alerts table)
+        """
+        self.total_frames = 0
+        self.last_detailed_check = 0
+        self.is_cheating = False
+        # Recent cheating intervals as (start frame, end frame), bounded for long exams
+        self.cheating_history = deque(maxlen=history_size)
+        self.cheating_started_at = None  # Wall-clock start of the current interval
+        self.consecutive_not_looking_frames = 0
+        self.looking_at_screen_count = 0  # Consecutive "looking at screen" frames
+
+    def next_frame(self):
+        """
+        Count a new frame and decide whether it gets a detailed check
+
+        Returns:
+            bool: True for every frame among the first 30, then every 3rd frame
+        """
+        self.total_frames += 1
+        return self.total_frames < 30 or self.total_frames % 3 == 0
+
+    def update_gaze(self, face_detected, checks):
+        """
+        Smooth the per-face gaze checks of a frame into a looking-at-screen flag
+
+        Args:
+            face_detected (bool): Whether any face was found
+            checks (list): One bool per face with visible eyes, True when the
+                face passes the looking-at-screen checks
+
+        Returns:
+            bool: True once the checks passed on 2 consecutive frames
+        """
+        looking_at_screen = False
+        for looking in checks:
+            if looking:
+                # Increment counter for stable detection
+                self.looking_at_screen_count += 1
+                if self.looking_at_screen_count >= 2:  # Require 2 consecutive positive frames
+                    looking_at_screen = True
+            else:
+                # Decrease counter but don't go below 0
+                self.looking_at_screen_count = max(0, self.looking_at_screen_count - 1)
+                if self.looking_at_screen_count < 2:
+                    looking_at_screen = False
+
+        # If no eyes detected at all in any face, reset the counter
+        if not checks:
+            self.looking_at_screen_count = max(0, self.looking_at_screen_count - 2)
+        # If no face detected, definitely not looking at screen
+        if not face_detected:
+            looking_at_screen = False
+            self.looking_at_screen_count = 0
+        return looking_at_screen
+
+    def update_cheating(self, looking_at_screen):
+        """
+        Update the cheating flag and history after a detailed check
+
+        Returns:
+            dict: The cheating interval that just ended (see end_cheating), or None
+        """
+        self.last_detailed_check = self.total_frames
+        if not looking_at_screen:
+            self.consecutive_not_looking_frames += 1
+            # If not looking at screen for more than 5 consecutive detailed checks
+            if self.consecutive_not_looking_frames > 5:
+                if not self.is_cheating:
+                    # Record a new cheating event
+                    self.cheating_history.append((self.total_frames, self.total_frames))
+                    self.cheating_started_at = time.time()
+                else:
+                    # Update the end of the current cheating event
+                    self.cheating_history[-1] = (self.cheating_history[-1][0], self.total_frames)
+                self.is_cheating = True
+        else:
+            # Reset consecutive frame counter if looking at screen
+            self.consecutive_not_looking_frames = max(0, self.consecutive_not_looking_frames - 2)
+            # If we've had enough consecutive "looking at screen" frames, mark as not cheating
+            if self.consecutive_not_looking_frames <= 1:
+                return self.end_cheating()
+        return None
+
+    def end_cheating(self):
+        """
+        Close the current cheating interval, e.g. when the student looks back
+        or disconnects
+
+        Returns:
+            dict: start_frame, end_frame, started_at and ended_at (epoch
+                seconds) of the interval, or None if not cheating
+        """
+        if not self.is_cheating:
+            return None
+        self.is_cheating = False
+        start_frame, end_frame = self.cheating_history[-1]
+        interval = {
+            "start_frame": start_frame,
+            "end_frame": end_frame,
+            "started_at": self.cheating_started_at,
+            "ended_at": time.time()
+        }
+        self.cheating_started_at = None
+        return interval
+
+class LatestFrameSlot:
+    """
+    Per-session frame queue of depth one where the newest frame wins
+
+    At most one frame of a session is in inference and at most one waits
+    behind it; a frame arriving while another is pending replaces it and
+    the stale one is counted as dropped.
+    """
+
+    __slots__ = ('busy', 'pending', 'received', 'processed', 'dropped',
+                 'last_latency', 'total_latency', 'max_latency')
+
+    def __init__(self):
+        self.busy = False
+        self.pending = None
+        self.received = 0
+        self.processed = 0
+        self.dropped = 0
+        self.last_latency = 0.0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    @property
+    def depth(self):
+        """Frames of this session in flight or waiting (0, 1 or 2)"""
+        return int(self.busy) + int(self.pending is not None)
+
+    def offer(self, item):
+        """
+        Hand a new frame to the slot
+
+        Returns:
+            bool: True if the caller should process the frame now, False if it
+                was parked behind the frame in flight
+        """
+        self.received += 1
+        if not self.busy:
+            self.busy = True
+            return True
+        if self.pending is not None:
+            self.dropped += 1
+        self.pending = item
+        return False
+
+    def next(self):
+        """Take the pending frame after finishing one, or release the slot"""
+        item, self.pending = self.pending, None
+        if item is None:
+            self.busy = False
+        return item
+
+    def record_latency(self, seconds):
+        """Record the end-to-end latency of a processed frame"""
+        self.processed += 1
+        self.last_latency = seconds
+        self.total_latency += seconds
+        self.max_latency = max(self.max_latency, seconds)
+
+    def stats(self):
+        return {
+            "queue_depth": self.depth,
+            "received": self.received,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "latency_ms": round(self.last_latency * 1000, 1),
+            "avg_latency_ms": round(self.total_latency / self.processed * 1000, 1) if self.processed else 0.0,
+            "max_latency_ms": round(self.max_latency * 1000, 1)
+        }
+
+class ExamSession:
+    """Everything the server keeps for one socket.io connection"""
+
+    __slots__ = ('sid', 'connected_at', 'last_seen', 'monitor', 'frames', 'recognition',
+                 'annotated', 'binary', 'exam_id', 'student_id', 'metrics')
+
+    def __init__(self, sid, recognition_options=None, metrics=None):
+        now = time.monotonic()
+        self.sid = sid
+        self.connected_at = now
+        self.last_seen = now
+        self.monitor = ExamMonitoring()
+        self.frames = LatestFrameSlot()
+        self.recognition = RecognitionGate(**(recognition_options or {}))
+        self.annotated = True  # Send the annotated frame back with each response
+        self.binary = False  # Client sends raw JPEG attachments instead of data URLs
+        self.exam_id = None  # Recognition is scoped to this exam's students when set
+        self.student_id = None  # Student taking the exam, needed to write alerts
+        # Stage timers of this session, also feeding the server-wide metrics
+        self.metrics = metrics.child() if metrics is not None else Metrics(enabled=False)
+
+    def touch(self):
+        self.last_seen = time.monotonic()
+
+class SessionStore:
+    """Per-sid session registry with idle eviction"""
+
+    def __init__(self, idle_timeout=300, recognition_options=None, metrics=None, session_class=ExamSession):
+        """
+        Args:
+            idle_timeout (float): Seconds without frames after which a session
+                is considered abandoned (e.g. a missed disconnect)
+            recognition_options (dict): Keyword arguments of each session's
+                RecognitionGate
+            metrics (Metrics): Server-wide metrics each session's timers feed
+            session_class (type): ExamSession or a subclass keeping more state
+        """
+        self.idle_timeout = idle_timeout
+        self.recognition_options = recognition_options or {}
+        self.metrics = metrics
+        self.session_class = session_class
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def __contains__(self, sid):
+        return sid in self._sessions
+
+    def all(self):
+        """Snapshot of the current sessions"""
+        with self._lock:
+            return list(self._sessions.values())
+
+    def get(self, sid):
+        """Return the session of a sid, creating it on first use"""
+        with self._lock:
+            session = self._sessions.get(sid)
+            if session is None:
+                session = self._sessions[sid] = self.session_class(sid, self.recognition_options, self.metrics)
+        session.touch()
+        return session
+
+    def remove(self, sid):
+        """Drop a session. Returns the removed session or None"""
+        with self._lock:
+            return self._sessions.pop(sid, None)
+
+    def evict_idle(self, now=None):
+        """
+        Drop sessions that have not received a frame for idle_timeout seconds
+
+        Returns:
+            list: Evicted sessions
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            idle = [sid for sid, session in self._sessions.items()
+                    if now - session.last_seen > self.idle_timeout]
+            evicted = [self._sessions.pop(sid) for sid in idle]
+        if evicted:
+            logger.info(f"Evicted {len(evicted)} idle sessions")
+        return evicted
+
+def shard_for(key, num_shards):
+    """
+    Stable shard index of a session key (e.g. sid or student id)
+
+    Unlike hash(), the result is the same in every process, so a load
+    balancer or parent process can pin all frames of a session to the same
+    worker process and its in-memory state.
+    """
+    return zlib.crc32(str(key).encode('utf-8')) % num_shards
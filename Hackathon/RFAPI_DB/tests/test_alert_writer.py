@@ -0,0 +1,35 @@
+import unittest
+from unittest import mock
+import alert_writer
+from alert_writer import AlertWriter
+
+INTERVAL = {"start_frame": 10, "end_frame": 40, "started_at": 1700000000.0, "ended_at": 1700000012.0}
+
+class TestAlertWriter(unittest.TestCase):
+    def test_flush_writes_one_batch(self):
+        """Test that pending alerts go out in a single executemany"""
+        writer = AlertWriter({}, max_batch=100)
+        for student_id in range(3):
+            writer.add(student_id, 5, INTERVAL)
+        with mock.patch.object(alert_writer.mysql.connector, 'connect') as connect:
+            self.assertEqual(writer.flush(), 3)
+        cursor = connect.return_value.cursor.return_value
+        cursor.executemany.assert_called_once()
+        rows = cursor.executemany.call_args[0][1]
+        self.assertEqual([row[0] for row in rows], [0, 1, 2])
+        self.assertEqual(rows[0][2], 'looking_away')
+        self.assertEqual(len(writer), 0)
+
+    def test_failed_flush_keeps_alerts_within_bound(self):
+        """Test that a failed batch is retried later and the queue stays bounded"""
+        writer = AlertWriter({}, max_pending=4)
+        for student_id in range(6):
+            writer.add(student_id, 5, INTERVAL)
+        self.assertEqual(writer.dropped, 2)
+        with mock.patch.object(alert_writer.mysql.connector, 'connect', side_effect=OSError("down")):
+            self.assertEqual(writer.flush(), 0)
+        self.assertEqual(len(writer), 4)
+        self.assertEqual(writer.failures, 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import time
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+import torch
+from embedding_batcher import EmbeddingBatcher
+
+def faces(*ids):
+    """Tiny face tensors whose pixels all hold their id"""
+    return torch.stack([torch.full((3, 2, 2), float(i)) for i in ids])
+
+class FakeFaceNet:
+    """Embeds a face as its id repeated, recording the size of each forward pass"""
+
+    def __init__(self, gate=None, error=None):
+        self.batches = []
+        self.gate = gate
+        self.error = error
+        self.entered = threading.Event()
+
+    def __call__(self, batch):
+        self.batches.append(len(batch))
+        self.entered.set()
+        if self.gate is not None:
+            self.gate.wait(5)
+        if self.error is not None:
+            raise self.error
+        return batch[:, 0, 0, 0:1].repeat(1, 4)
+
+class TestEmbeddingBatcher(unittest.TestCase):
+    def setUp(self):
+        self.batcher = None
+
+    def tearDown(self):
+        if self.batcher is not None:
+            self.batcher.stop()
+
+    def start(self, model, **options):
+        self.batcher = EmbeddingBatcher(model, **options)
+        self.batcher.start()
+        return self.batcher
+
+    def test_flush_at_max_batch_size(self):
+        """Test a full batch is embedded at once instead of waiting for the deadline"""
+        model = FakeFaceNet()
+        batcher = self.start(model, max_batch_size=4, max_wait_ms=10000)
+        started = time.monotonic()
+        with ThreadPoolExecutor(2) as pool:
+            results = list(pool.map(batcher.embed, [faces(1, 2), faces(3, 4)]))
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual(model.batches, [4])
+        self.assertEqual(batcher.stats()["batches"], 1)
+        self.assertEqual(len(results), 2)
+
+    def test_flush_at_deadline(self):
+        """Test a lone request is embedded once the oldest request waited max_wait_ms"""
+        model = FakeFaceNet()
+        batcher = self.start(model, max_batch_size=32, max_wait_ms=50)
+        started = time.monotonic()
+        batcher.embed(faces(1))
+        self.assertGreaterEqual(time.monotonic() - started, 0.045)
+        self.assertEqual(model.batches, [1])
+
+    def test_each_caller_gets_its_own_rows(self):
+        """Test the batched embeddings are split back in each caller's order"""
+        model = FakeFaceNet()
+        batcher = self.start(model, max_batch_size=64, max_wait_ms=200)
+        requests = [faces(*range(10 * i, 10 * i + n)) for i, n in enumerate([1, 3, 2, 5])]
+        with ThreadPoolExecutor(len(requests)) as pool:
+            results = list(pool.map(batcher.embed, requests))
+        self.assertLess(len(model.batches), len(requests))
+        for request, result in zip(requests, results):
+            self.assertEqual(result[:, 0].tolist(), request[:, 0, 0, 0].tolist())
+
+    def test_model_error_reaches_every_caller(self):
+        """Test an exception in a forward pass is raised to every caller of the batch"""
+        model = FakeFaceNet(error=RuntimeError("out of memory"))
+        batcher = self.start(model, max_batch_size=4, max_wait_ms=10000)
+        with ThreadPoolExecutor(2) as pool:
+            futures = [pool.submit(batcher.embed, faces(i, i)) for i in (1, 2)]
+            for future in futures:
+                with self.assertRaisesRegex(RuntimeError, "out of memory"):
+                    future.result(5)
+        self.assertEqual(model.batches, [4])
+
+    def test_stop_fails_pending_requests(self):
+        """Test requests still queued when the batcher stops fail instead of blocking"""
+        gate = threading.Event()
+        model = FakeFaceNet(gate=gate)
+        batcher = self.start(model, max_batch_size=1, max_wait_ms=0)
+        with ThreadPoolExecutor(3) as pool:
+            first = pool.submit(batcher.embed, faces(1))
+            self.assertTrue(model.entered.wait(5))
+            pending = pool.submit(batcher.embed, faces(2))
+            while batcher._requests.qsize() < 1:
+                time.sleep(0.001)
+            stopping = pool.submit(batcher.stop)
+            while batcher._running:
+                time.sleep(0.001)
+            gate.set()
+            stopping.result(5)
+            self.assertEqual(first.result(5)[:, 0].tolist(), [1.0])
+            with self.assertRaisesRegex(RuntimeError, "stopped"):
+                pending.result(5)
+        self.assertEqual(model.batches, [1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from embedding_store import EmbeddingStore
+
+class TestEmbeddingStore(unittest.TestCase):
+    def setUp(self):
+        """Create a store in a temporary directory"""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'store')
+        self.embedding = np.arange(512, dtype=np.float32)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_round_trip(self):
+        """Test that saved embeddings are found again by id and hash"""
+        store = EmbeddingStore(self.path)
+        store.put(1, "Ada Lovelace", "hash1", self.embedding)
+        store.put(2, "No Face", "hash2", None)
+        self.assertTrue(store.save())
+
+        reloaded = EmbeddingStore(self.path)
+        self.assertEqual(reloaded.load(), 2)
+        hit, embedding = reloaded.get(1, "hash1")
+        self.assertTrue(hit)
+        np.testing.assert_array_equal(embedding, self.embedding)
+        self.assertEqual(reloaded.get(2, "hash2"), (True, None))
+        self.assertEqual([entry[0] for entry in reloaded.items()], [1])
+
+    def test_changed_photo_is_a_miss(self):
+        """Test that a different photo hash invalidates the cache entry"""
+        store = EmbeddingStore(self.path)
+        store.put(1, "Ada Lovelace", "hash1", self.embedding)
+        self.assertEqual(store.get(1, "other"), (False, None))
+        self.assertEqual(store.get(3, "hash1"), (False, None))
+
+    def test_hit_refreshes_renamed_student(self):
+        """Test that a hit with a new name replaces the cached name on disk"""
+        store = EmbeddingStore(self.path)
+        store.put(1, "Ada Byron", "hash1", self.embedding)
+        store.save()
+
+        reloaded = EmbeddingStore(self.path)
+        reloaded.load()
+        self.assertTrue(reloaded.get(1, "hash1", "Ada Byron")[0])
+        self.assertFalse(reloaded.save())
+        self.assertTrue(reloaded.get(1, "hash1", "Ada Lovelace")[0])
+        self.assertTrue(reloaded.save())
+
+        final = EmbeddingStore(self.path)
+        final.load()
+        self.assertEqual([entry[1] for entry in final.items()], ["Ada Lovelace"])
+
+    def test_prune_and_resave(self):
+        """Test that pruned students disappear after saving over a mapped store"""
+        store = EmbeddingStore(self.path)
+        store.put(1, "A", "h1", self.embedding)
+        store.put(2, "B", "h2", self.embedding + 1)
+        store.save()
+
+        reloaded = EmbeddingStore(self.path)
+        reloaded.load()
+        self.assertFalse(reloaded.save())
+        self.assertEqual(reloaded.prune([2]), 1)
+        self.assertTrue(reloaded.save())
+
+        final = EmbeddingStore(self.path)
+        self.assertEqual(final.load(), 1)
+        hit, embedding = final.get(2, "h2")
+        self.assertTrue(hit)
+        np.testing.assert_array_equal(embedding, self.embedding + 1)
+
+if __name__ == '__main__':
+    unittest.main()
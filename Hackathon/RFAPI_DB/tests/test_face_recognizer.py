@@ -0,0 +1,297 @@
+import os
+import shutil
+import hashlib
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+import cv2
+import numpy as np
+import torch
+from PIL import Image
+import mysql.connector
+from face_recognizer import FaceRecognizer
+from gallery import FaceGallery
+from embedding_store import EmbeddingStore
+from metrics import Metrics
+
+NAMES = ["Black", "Gray", "White"]
+
+def one_hot(index):
+    embedding = np.zeros(512, dtype=np.float32)
+    embedding[index] = 1
+    return embedding
+
+def frame_with_faces(*faces):
+    """BGR frame with a uniform square of the given brightness at each (x, y, brightness)"""
+    frame = np.full((240, 320, 3), 30, dtype=np.uint8)
+    for x, y, brightness in faces:
+        frame[y:y + 40, x:x + 40] = brightness
+    return frame
+
+class FakeMTCNN:
+    """Returns the given detections, one per call, recording the size of each image"""
+    image_size = 160
+    margin = 0
+    post_process = True
+
+    def __init__(self, *detections):
+        self.detections = list(detections)
+        self.calls = []
+
+    def detect(self, img, landmarks=True):
+        self.calls.append(img.size)
+        boxes = self.detections.pop(0)
+        if not boxes:
+            return None, None, None
+        probs = np.array([0.9 + i / 100 for i in range(len(boxes))])
+        points = np.array([[[x1 + i, y1 + i]] * 5 for i, (x1, y1, _, _) in enumerate(boxes)], dtype=np.float32)
+        return np.array(boxes, dtype=np.float32), probs, points
+
+class FakeFaceNet:
+    """
+    Embeds a uniform face as the one-hot of its brightness divided by step,
+    recording the size of each pass; the pass number block_at waits for release
+    """
+
+    def __init__(self, step=100, block_at=None):
+        self.step = step
+        self.block_at = block_at
+        self.batches = []
+        self.blocked = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, faces):
+        self.batches.append(len(faces))
+        if len(self.batches) == self.block_at:
+            self.blocked.set()
+            self.release.wait(5)
+        # Undo fixed_image_standardization
+        brightness = faces.mean(dim=(1, 2, 3)) * 128 + 127.5
+        return torch.stack([torch.from_numpy(one_hot(int(round(b / self.step)))) for b in brightness.tolist()])
+
+class TestFrameBatching(unittest.TestCase):
+    def setUp(self):
+        self.recognizer = FaceRecognizer.__new__(FaceRecognizer)
+        self.recognizer.device = 'cpu'
+        self.recognizer.batcher = None
+        self.recognizer.threshold = 0.5
+        self.recognizer.metrics = Metrics(enabled=False)
+        self.recognizer.recognizer = FakeFaceNet()
+        self.recognizer.gallery = FaceGallery()
+        for i, name in enumerate(NAMES):
+            self.recognizer.gallery.add(10 + i, name, one_hot(i))
+
+    def test_faces_of_a_frame_share_one_pass(self):
+        """Test several faces get one MTCNN pass and one FaceNet call, in the order of their boxes"""
+        # Not sorted by brightness, so a reordering would swap the names
+        frame = frame_with_faces((20, 20, 200), (120, 60, 0), (220, 100, 100))
+        boxes = [[20, 20, 60, 60], [120, 60, 160, 100], [220, 100, 260, 140]]
+        self.recognizer.detector = FakeMTCNN(boxes)
+
+        faces = self.recognizer.identify_faces(frame)
+        self.assertEqual(self.recognizer.detector.calls, [(320, 240)])
+        self.assertEqual(self.recognizer.recognizer.batches, [3])
+        self.assertEqual([face["box"] for face in faces], boxes)
+        self.assertEqual([face["landmarks"][0] for face in faces], [[20.0, 20.0], [121.0, 61.0], [222.0, 102.0]])
+        self.assertEqual([round(face["probability"], 2) for face in faces], [0.9, 0.91, 0.92])
+        self.assertEqual([face["name"] for face in faces], ["White", "Black", "Gray"])
+        self.assertEqual([face["student_id"] for face in faces], [12, 10, 11])
+        self.assertTrue(all(face["recognized"] for face in faces))
+
+    def test_detect_faces_crops_in_box_order(self):
+        """Test detect_faces returns one aligned crop per box, in the same order"""
+        frame = frame_with_faces((20, 20, 100), (120, 60, 200))
+        self.recognizer.detector = FakeMTCNN([[20, 20, 60, 60], [120, 60, 160, 100]])
+        boxes, probs, landmarks, faces = self.recognizer.detect_faces(Image.fromarray(frame[:, :, ::-1].copy()))
+        self.assertEqual(faces.shape, (2, 3, 160, 160))
+        self.assertEqual(len(boxes), len(probs))
+        self.assertEqual(len(boxes), len(landmarks))
+        self.assertEqual(self.recognizer.embed_faces(faces).argmax(dim=1).tolist(), [1, 2])
+
+    def test_frames_share_one_facenet_call(self):
+        """Test the faces of several frames are embedded together and split back per frame"""
+        frames = [frame_with_faces((20, 20, 100)), frame_with_faces(),
+                  frame_with_faces((120, 60, 0), (220, 100, 200))]
+        self.recognizer.detector = FakeMTCNN([[20, 20, 60, 60]], [],
+                                             [[120, 60, 160, 100], [220, 100, 260, 140]])
+
+        results = self.recognizer.identify_frames(frames)
+        self.assertEqual(len(self.recognizer.detector.calls), 3)
+        self.assertEqual(self.recognizer.recognizer.batches, [3])
+        self.assertEqual([[face["name"] for face in faces] for faces in results], [["Gray"], [], ["Black", "White"]])
+        self.assertEqual(results[2][1]["box"], [220, 100, 260, 140])
+
+    def test_no_faces_skips_facenet(self):
+        """Test FaceNet is not called when no frame has a face"""
+        self.recognizer.detector = FakeMTCNN([], [])
+        self.assertEqual(self.recognizer.identify_frames([frame_with_faces(), frame_with_faces()]), [[], []])
+        self.assertEqual(self.recognizer.recognizer.batches, [])
+
+def photo(brightness):
+    """PNG bytes of a uniform photo"""
+    return cv2.imencode('.png', np.full((60, 60, 3), brightness, dtype=np.uint8))[1].tobytes()
+
+class FakePhotoMTCNN:
+    """Crops a uniform photo into a face of the same brightness, no face for very bright photos"""
+
+    def __call__(self, img):
+        brightness = float(np.asarray(img).mean())
+        if brightness > 240:
+            return None
+        return torch.full((3, 160, 160), (brightness - 127.5) / 128)
+
+class FakeDatabase:
+    """etudiant rows served through unbuffered-style cursors, recording queries and fetches"""
+
+    def __init__(self, students):
+        self.students = students  # id -> (Nom, Prenom, Photo)
+        self.error = None
+        self.queries = []
+        self.fetches = []
+
+    def connect(self, **config):
+        if self.error is not None:
+            raise self.error
+        return FakeConnection(self)
+
+class FakeConnection:
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self, buffered=True):
+        return FakeCursor(self.db)
+
+    def close(self):
+        pass
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.rows = []
+
+    def execute(self, sql, params=None):
+        self.db.queries.append((sql, params))
+        students = self.db.students
+        if 'SHA1(Photo)' in sql:
+            self.rows = [(student_id, nom, prenom, hashlib.sha1(blob).hexdigest())
+                         for student_id, (nom, prenom, blob) in students.items()]
+        else:
+            self.rows = [(student_id, students[student_id][2]) for student_id in params]
+
+    def fetchmany(self, size):
+        self.db.fetches.append(size)
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return rows
+
+    def close(self):
+        pass
+
+class TestGalleryLoading(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.store_path = os.path.join(self.tmp_dir, 'store')
+        # Student i's face embeds to one_hot(i); student 6's photo has no face
+        self.db = FakeDatabase({i: (f"nom{i}", f"prenom{i}", photo(i * 10)) for i in range(1, 6)})
+        self.db.students[6] = ("nom6", "prenom6", photo(255))
+        connect = patch('face_recognizer.mysql.connector.connect', side_effect=self.db.connect)
+        connect.start()
+        self.addCleanup(connect.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def new_recognizer(self, store=True, facenet=None):
+        recognizer = FaceRecognizer.__new__(FaceRecognizer)
+        recognizer.device = 'cpu'
+        recognizer.batcher = None
+        recognizer.detector = FakePhotoMTCNN()
+        recognizer.recognizer = facenet or FakeFaceNet(step=10)
+        recognizer.gallery = FaceGallery()
+        recognizer.store = EmbeddingStore(self.store_path) if store else None
+        recognizer.ready = threading.Event()
+        recognizer.load_progress = {"total": 0, "cached": 0, "to_embed": 0, "embedded": 0,
+                                    "no_face": 0, "failed": 0}
+        return recognizer
+
+    def photo_queries(self):
+        return [params for sql, params in self.db.queries if 'SHA1(Photo)' not in sql]
+
+    def test_photos_streamed_in_chunks(self):
+        """Test photos are fetched with fetchmany chunk by chunk and each chunk embedded in one pass"""
+        self.db.students[7] = ("nom7", "prenom7", b"not an image")
+        recognizer = self.new_recognizer(store=False)
+        recognizer.load_known_faces(chunk_size=2, workers=2)
+
+        self.assertEqual(self.photo_queries(), [[1, 2], [3, 4], [5, 6], [7]])
+        # Hashes in blocks of 1000 rows, photos never more than a chunk at a time
+        self.assertEqual(self.db.fetches[:2], [1000, 1000])
+        self.assertEqual(set(self.db.fetches[2:]), {2})
+        self.assertEqual(recognizer.recognizer.batches, [2, 2, 1])
+        self.assertEqual(recognizer.load_progress, {"total": 7, "cached": 0, "to_embed": 7, "embedded": 5,
+                                                    "no_face": 1, "failed": 1})
+        self.assertTrue(recognizer.ready.is_set())
+        self.assertEqual(len(recognizer.gallery), 5)
+        self.assertEqual(recognizer.gallery.match(one_hot(3), k=1)[0][0][:2], (3, "Prenom3 Nom3"))
+
+    def test_store_hits_skip_embedding(self):
+        """Test unchanged photos come from the store and only changed ones are fetched and embedded"""
+        self.new_recognizer().load_known_faces(chunk_size=4)
+
+        recognizer = self.new_recognizer()
+        self.db.queries.clear()
+        recognizer.load_known_faces(chunk_size=4)
+        self.assertEqual(self.photo_queries(), [])
+        self.assertEqual(recognizer.recognizer.batches, [])
+        self.assertEqual(len(recognizer.gallery), 5)
+        self.assertEqual((recognizer.load_progress["cached"], recognizer.load_progress["to_embed"]), (6, 0))
+
+        # A new photo of student 2 looking like student 4
+        self.db.students[2] = ("nom2", "prenom2", photo(40))
+        recognizer = self.new_recognizer()
+        self.db.queries.clear()
+        recognizer.load_known_faces(chunk_size=4)
+        self.assertEqual(self.photo_queries(), [[2]])
+        self.assertEqual(recognizer.recognizer.batches, [1])
+        self.assertEqual(len(recognizer.gallery), 5)
+        self.assertEqual({key for key, _, _ in recognizer.gallery.match(one_hot(4), k=2)[0]}, {2, 4})
+
+    def test_progress_during_background_load(self):
+        """Test the gallery fills while loading and ready is only set at the end"""
+        facenet = FakeFaceNet(step=10, block_at=2)
+        recognizer = self.new_recognizer(facenet=facenet)
+        loader = threading.Thread(target=recognizer.load_known_faces, kwargs={"chunk_size": 2}, daemon=True)
+        loader.start()
+
+        self.assertTrue(facenet.blocked.wait(5))
+        # Second chunk being embedded: the first one is already usable
+        self.assertFalse(recognizer.ready.is_set())
+        self.assertEqual(len(recognizer.gallery), 2)
+        self.assertEqual({key: recognizer.load_progress[key] for key in ("total", "cached", "to_embed", "embedded")},
+                         {"total": 6, "cached": 0, "to_embed": 6, "embedded": 2})
+
+        facenet.release.set()
+        loader.join(5)
+        self.assertTrue(recognizer.ready.is_set())
+        self.assertEqual(len(recognizer.gallery), 5)
+        self.assertEqual(recognizer.load_progress["embedded"], 5)
+
+    def test_falls_back_to_store_when_mysql_fails(self):
+        """Test the last stored gallery is used when the database cannot be reached"""
+        self.new_recognizer().load_known_faces()
+
+        self.db.error = mysql.connector.Error("Can't connect to MySQL server")
+        recognizer = self.new_recognizer()
+        recognizer.load_known_faces()
+        self.assertTrue(recognizer.ready.is_set())
+        self.assertEqual(len(recognizer.gallery), 5)
+        self.assertEqual(recognizer.recognizer.batches, [])
+
+        recognizer = self.new_recognizer(store=False)
+        recognizer.load_known_faces()
+        self.assertTrue(recognizer.ready.is_set())
+        self.assertEqual(len(recognizer.gallery), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
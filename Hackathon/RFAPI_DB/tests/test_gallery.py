@@ -0,0 +1,67 @@
+import unittest
+import numpy as np
+from gallery import FaceGallery
+
+class TestFaceGallery(unittest.TestCase):
+    def setUp(self):
+        """Build a small gallery with random embeddings"""
+        rng = np.random.default_rng(0)
+        self.embeddings = rng.normal(size=(5, 512)).astype(np.float32)
+        self.gallery = FaceGallery(capacity=2)
+        for i, embedding in enumerate(self.embeddings):
+            self.gallery.add(i, f"Student {i}", embedding)
+
+    def test_grows_beyond_capacity(self):
+        """Test that adding past the preallocated capacity keeps all rows"""
+        self.assertEqual(len(self.gallery), 5)
+        self.assertEqual(self.gallery.names, [f"Student {i}" for i in range(5)])
+
+    def test_match_returns_best_and_runner_up(self):
+        """Test top-2 matching against the gallery"""
+        matches = self.gallery.match(self.embeddings[[3, 1]], k=2)
+        self.assertEqual(len(matches), 2)
+        self.assertEqual(matches[0][0][0], 3)
+        self.assertAlmostEqual(matches[0][0][2], 1.0, places=5)
+        self.assertEqual(matches[1][0][0], 1)
+        self.assertEqual(len(matches[0]), 2)
+        self.assertGreaterEqual(matches[0][0][2], matches[0][1][2])
+
+    def test_remove_keeps_other_rows(self):
+        """Test that removing a key moves the last row into its slot"""
+        self.assertTrue(self.gallery.remove(1))
+        self.assertFalse(self.gallery.remove(1))
+        self.assertNotIn(1, self.gallery)
+        matches = self.gallery.match(self.embeddings[4], k=1)
+        self.assertEqual(matches[0][0][0], 4)
+        self.assertAlmostEqual(matches[0][0][2], 1.0, places=5)
+
+    def test_subset_only_matches_selected_keys(self):
+        """Test that a subset never returns students outside of it"""
+        subset = self.gallery.subset([4, 2, 99])
+        self.assertEqual(len(subset), 2)
+        self.assertEqual(subset.keys, [4, 2])
+        matches = subset.match(self.embeddings[3], k=2)
+        self.assertTrue(all(key in (2, 4) for key, _, _ in matches[0]))
+        matches = subset.match(self.embeddings[2], k=1)
+        self.assertAlmostEqual(matches[0][0][2], 1.0, places=5)
+
+    def test_get_returns_normalized_copy(self):
+        """Test looking up a single face by key"""
+        name, vector = self.gallery.get(3)
+        self.assertEqual(name, "Student 3")
+        np.testing.assert_allclose(vector, FaceGallery.normalize(self.embeddings[3])[0], rtol=1e-5)
+        self.assertIsNone(self.gallery.get(99))
+
+    def test_add_existing_key_replaces(self):
+        """Test that re-adding a key updates it in place"""
+        self.gallery.add(2, "Renamed", self.embeddings[0])
+        self.assertEqual(len(self.gallery), 5)
+        self.assertIn("Renamed", self.gallery.names)
+
+    def test_match_empty_gallery(self):
+        """Test matching against an empty gallery"""
+        matches = FaceGallery().match(self.embeddings[:2])
+        self.assertEqual(matches, [[], []])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+import numpy as np
+from gallery import FaceGallery
+from gallery_index import IVFIndex
+
+class TestIVFIndex(unittest.TestCase):
+    def setUp(self):
+        """Build an IVF gallery on clustered random embeddings"""
+        rng = np.random.default_rng(0)
+        centers = rng.normal(size=(8, 64))
+        self.embeddings = FaceGallery.normalize(centers[rng.integers(8, size=400)] + 0.5 * rng.normal(size=(400, 64)))
+        self.index = IVFIndex(nlist=8, nprobe=2, min_train_size=200)
+        self.gallery = FaceGallery(dim=64, index=self.index)
+        for key, embedding in enumerate(self.embeddings):
+            self.gallery.add(key, str(key), embedding)
+
+    def test_trains_and_finds_entries(self):
+        """Test that every entry is assigned to one cell and finds itself"""
+        self.assertTrue(self.index.trained)
+        self.assertEqual(sum(len(cell) for cell in self.index._lists), 400)
+        matches = self.gallery.match(self.embeddings[::40], k=1)
+        self.assertEqual([m[0][0] for m in matches], list(range(0, 400, 40)))
+
+    def test_full_probe_equals_exact_search(self):
+        """Test that probing every cell returns the exact top-k"""
+        self.index.nprobe = 8
+        exact = self.gallery.subset(range(400))
+        queries = np.random.default_rng(1).normal(size=(5, 64))
+        self.assertEqual(
+            [[key for key, _, _ in m] for m in self.gallery.match(queries, k=3)],
+            [[key for key, _, _ in m] for m in exact.match(queries, k=3)])
+
+    def test_remove_keeps_cells_consistent(self):
+        """Test that swap-removal keeps the inverted lists pointing at the right rows"""
+        for key in range(0, 400, 3):
+            self.gallery.remove(key)
+        rows = sorted(row for cell in self.index._lists for row in cell)
+        self.assertEqual(rows, list(range(len(self.gallery))))
+        for key in (1, 200, 398):
+            self.assertEqual(self.gallery.match(self.embeddings[key], k=1)[0][0][0], key)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+import unittest
+from gaze import GazeAnalyzer
+from sessions import ExamMonitoring
+
+def face(box, left_eye, right_eye):
+    """Build a face result with the five MTCNN landmarks"""
+    return {"box": box, "landmarks": [left_eye, right_eye, [0, 0], [0, 0], [0, 0]]}
+
+class TestGazeAnalyzer(unittest.TestCase):
+    def setUp(self):
+        self.analyzer = GazeAnalyzer()
+        self.shape = (480, 640, 3)
+
+    def test_level_centered_face_is_looking(self):
+        """Test a centered face with level eyes passes the checks"""
+        gaze = self.analyzer.analyze([face([220, 120, 420, 360], [270, 200], [370, 205])], self.shape)
+        self.assertTrue(gaze["face_detected"])
+        self.assertEqual(gaze["checks"], [True])
+        self.assertEqual(len(gaze["eye_positions"]), 2)
+
+    def test_tilted_or_off_center_face_is_not_looking(self):
+        """Test the eye slope and centering checks"""
+        tilted = face([220, 120, 420, 360], [270, 180], [370, 240])
+        off_center = face([10, 120, 210, 360], [60, 200], [160, 200])
+        gaze = self.analyzer.analyze([tilted, off_center], self.shape)
+        self.assertEqual(gaze["checks"], [False, False])
+
+    def test_smoothing_requires_two_frames(self):
+        """Test the looking-at-screen flag needs 2 consecutive positive frames"""
+        monitor = ExamMonitoring()
+        self.assertFalse(monitor.update_gaze(True, [True]))
+        self.assertTrue(monitor.update_gaze(True, [True]))
+        self.assertFalse(monitor.update_gaze(False, []))
+        self.assertEqual(monitor.looking_at_screen_count, 0)
+
+if __name__ == '__main__':
+    unittest.main()
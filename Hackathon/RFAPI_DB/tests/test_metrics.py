@@ -0,0 +1,35 @@
+import unittest
+import numpy as np
+from metrics import Histogram, Metrics, NULL_TIMER
+
+class TestMetrics(unittest.TestCase):
+    def test_histogram_percentiles_are_close(self):
+        """Test that bucketed percentiles stay within one bucket of the exact ones"""
+        samples = np.random.default_rng(0).lognormal(-4, 1, 5000)
+        histogram = Histogram()
+        for value in samples:
+            histogram.record(float(value))
+        self.assertEqual(histogram.count, 5000)
+        for p in (50, 90, 99):
+            self.assertAlmostEqual(histogram.percentile(p) / np.percentile(samples, p), 1.0, delta=0.25)
+        self.assertEqual(histogram.percentile(100), samples.max())
+
+    def test_session_samples_reach_parent(self):
+        """Test that a child's samples are aggregated into the parent"""
+        server = Metrics()
+        session = server.child()
+        with session.time('decode'):
+            pass
+        session.record('decode', 0.01)
+        self.assertEqual(session.summary()['decode']['count'], 2)
+        self.assertEqual(server.summary()['decode']['count'], 2)
+
+    def test_disabled_records_nothing(self):
+        """Test that disabled metrics hand out the shared no-op timer"""
+        metrics = Metrics(enabled=False)
+        self.assertIs(metrics.time('decode'), NULL_TIMER)
+        metrics.record('decode', 0.01)
+        self.assertEqual(metrics.summary(), {})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+import unittest
+import torch
+from facenet_pytorch import InceptionResnetV1
+from quantization import quantize_model
+
+class TestQuantization(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Randomly initialized model, the embeddings only need to be comparable"""
+        torch.manual_seed(0)
+        cls.model = InceptionResnetV1().eval()
+        cls.faces = torch.randn(4, 3, 160, 160)
+        with torch.no_grad():
+            cls.reference = cls.model(cls.faces)
+
+    def test_static_embeddings_agree_with_float(self):
+        """Test that the int8 model gives nearly the same embeddings"""
+        quantized = quantize_model(self.model, 'static', calibration=self.faces)
+        with torch.no_grad():
+            embeddings = quantized(self.faces)
+        self.assertEqual(embeddings.shape, (4, 512))
+        cosine = torch.nn.functional.cosine_similarity(embeddings, self.reference)
+        self.assertGreater(cosine.min().item(), 0.99)
+
+    def test_static_requires_calibration(self):
+        """Test that static quantization refuses to run uncalibrated"""
+        with self.assertRaises(ValueError):
+            quantize_model(self.model, 'static')
+        with self.assertRaises(ValueError):
+            quantize_model(self.model, 'int4')
+
+    def test_dynamic_mode_is_not_offered(self):
+        """Test that dynamic quantization, a near no-op on FaceNet, is refused"""
+        with self.assertRaises(ValueError):
+            quantize_model(self.model, 'dynamic')
+
+if __name__ == "__main__":
+    unittest.main()
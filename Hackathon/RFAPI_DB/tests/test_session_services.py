@@ -0,0 +1,108 @@
+import threading
+import unittest
+from unittest import mock
+import numpy as np
+from metrics import Metrics
+from sessions import SessionStore
+from session_services import SessionServices, face_results, parse_id
+
+class DirectPool:
+    """Inference pool running the function in the calling thread"""
+    workers = 1
+    active = 0
+
+    def run(self, fn, *args):
+        return fn(*args)
+
+class TestSessionServices(unittest.TestCase):
+    def setUp(self):
+        self.sio = mock.Mock()
+        self.recognizer = mock.Mock(gallery="full gallery", ready=threading.Event())
+        self.exam_galleries = mock.MagicMock()
+        self.alert_writer = mock.Mock()
+        self.sessions = SessionStore()
+        self.services = SessionServices(self.sio, self.sessions, self.recognizer, self.exam_galleries,
+                                        self.alert_writer, mock.Mock())
+        self.services.inference_pool = DirectPool()
+
+    def test_query_string_scopes_the_session(self):
+        """Test exam and student ids are read from the connection's query string, invalid ones ignored"""
+        session = self.services.connect("a", {"QUERY_STRING": "exam_id=42&student_id=7"})
+        self.assertEqual((session.exam_id, session.student_id), (42, 7))
+        session = self.services.connect("b", {"QUERY_STRING": "exam_id=abc"})
+        self.assertIsNone(session.exam_id)
+        self.assertEqual(parse_id('', "exam id", "b"), None)
+
+    def test_configure_echoes_session_settings(self):
+        """Test the config event updates and echoes annotated, exam and student"""
+        session = self.services.connect("a", {})
+        settings = self.services.configure(session, {"annotated": False, "exam_id": "5", "student_id": 3})
+        self.assertEqual(settings, {"annotated": False, "exam_id": 5, "student_id": 3})
+        self.assertEqual(session.recognition.since_full, session.recognition.max_interval)
+
+    def test_gallery_falls_back_to_full_gallery(self):
+        """Test the full gallery is used while loading and when the exam gallery fails"""
+        session = self.services.connect("a", {"QUERY_STRING": "exam_id=42"})
+        self.assertEqual(self.services.gallery_for(session), "full gallery")
+        self.recognizer.ready.set()
+        self.exam_galleries.get.return_value = "exam gallery"
+        self.assertEqual(self.services.gallery_for(session), "exam gallery")
+        self.exam_galleries.get.side_effect = OSError("database down")
+        self.assertEqual(self.services.gallery_for(session), "full gallery")
+
+    def test_disconnect_records_open_cheating_interval(self):
+        """Test a session ending while cheating writes its interval, only with student and exam known"""
+        for sid, query in (("a", "exam_id=1&student_id=2"), ("b", "exam_id=1")):
+            session = self.services.connect(sid, {"QUERY_STRING": query})
+            for _ in range(6):
+                session.monitor.next_frame()
+                session.monitor.update_cheating(looking_at_screen=False)
+            self.services.disconnect(sid)
+        self.alert_writer.add.assert_called_once()
+        self.assertEqual(self.alert_writer.add.call_args[0][:2], (2, 1))
+        self.assertEqual(len(self.sessions), 0)
+
+    def test_serve_frame_emits_response_with_stats(self):
+        """Test a processed frame is answered with the session's stats, an undecodable one not at all"""
+        self.services.serve_frame("a", "frame", lambda session, image: {"image": image})
+        self.sio.emit.assert_called_once()
+        event, response = self.sio.emit.call_args[0]
+        self.assertEqual((event, response["image"]), ("response", "frame"))
+        self.assertIn("stats", response)
+        self.services.serve_frame("a", "frame", lambda session, image: None)
+        self.sio.emit.assert_called_once()
+
+    def test_find_faces_tracks_between_recognitions(self):
+        """Test tracked faces get fresh landmarks, lost tracks a full recognition, failures no faces"""
+        session = self.services.connect("a", {})
+        session.recognition = mock.Mock()
+        frame = np.zeros((48, 64, 3), np.uint8)
+        timers = Metrics(enabled=False)
+        tracked = [{"box": [1, 1, 10, 10]}]
+        session.recognition.track.return_value = tracked
+        self.recognizer.refresh_landmarks.return_value = tracked
+        self.assertIs(self.services.find_faces(frame, session, timers), tracked)
+        self.recognizer.identify_faces.assert_not_called()
+
+        # Track lost, or landmarks not found on the tracked box
+        for track, landmarks in ((None, None), (tracked, None)):
+            session.recognition.track.return_value = track
+            self.recognizer.refresh_landmarks.return_value = landmarks
+            self.recognizer.identify_faces.return_value = ["identified"]
+            self.assertEqual(self.services.find_faces(frame, session, timers), ["identified"])
+            self.assertEqual(self.recognizer.identify_faces.call_args[0][1], "full gallery")
+            self.assertEqual(session.recognition.update.call_args[0][1], ["identified"])
+
+        self.recognizer.identify_faces.side_effect = RuntimeError("model crashed")
+        self.assertEqual(self.services.find_faces(frame, session, timers), [])
+
+    def test_face_results(self):
+        """Test only recognized faces are named"""
+        faces = [{"box": [0, 0, 5, 5], "name": "Ali", "recognized": True, "similarity": 0.9},
+                 {"box": [9, 9, 5, 5], "name": "Unknown", "recognized": False, "similarity": 0.2}]
+        results = face_results(faces)
+        self.assertEqual(results["names"], ["Ali"])
+        self.assertEqual([face["name"] for face in results["faces"]], ["Ali", None])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+from sessions import ExamMonitoring, LatestFrameSlot, SessionStore, shard_for
+
+class TestExamMonitoring(unittest.TestCase):
+    def test_detailed_check_schedule(self):
+        """Test every frame is checked for the first 30, then every 3rd"""
+        monitor = ExamMonitoring()
+        checks = [monitor.next_frame() for _ in range(36)]
+        self.assertTrue(all(checks[:29]))
+        self.assertEqual(checks[29:], [True, False, False, True, False, False, True])
+
+    def test_cheating_after_consecutive_misses(self):
+        """Test cheating is flagged after more than 5 detailed misses and cleared again"""
+        monitor = ExamMonitoring()
+        for _ in range(6):
+            monitor.next_frame()
+            monitor.update_cheating(looking_at_screen=False)
+        self.assertTrue(monitor.is_cheating)
+        self.assertEqual(len(monitor.cheating_history), 1)
+        for _ in range(3):
+            monitor.next_frame()
+            monitor.update_cheating(looking_at_screen=True)
+        self.assertFalse(monitor.is_cheating)
+
+    def test_interval_returned_when_cheating_ends(self):
+        """Test that one interval is reported per cheating episode, history bounded"""
+        monitor = ExamMonitoring(history_size=2)
+        intervals = []
+        for _ in range(3):
+            for looking in [False] * 8 + [True] * 4:
+                monitor.next_frame()
+                interval = monitor.update_cheating(looking_at_screen=looking)
+                if interval is not None:
+                    intervals.append(interval)
+        self.assertEqual(len(intervals), 3)
+        self.assertEqual((intervals[0]["start_frame"], intervals[0]["end_frame"]), (6, 8))
+        self.assertLessEqual(intervals[0]["started_at"], intervals[0]["ended_at"])
+        self.assertEqual(len(monitor.cheating_history), 2)
+        self.assertIsNone(monitor.end_cheating())
+
+class TestLatestFrameSlot(unittest.TestCase):
+    def test_newest_pending_frame_wins(self):
+        """Test that frames arriving while one is in flight replace each other"""
+        slot = LatestFrameSlot()
+        self.assertTrue(slot.offer(1))
+        self.assertFalse(slot.offer(2))
+        self.assertFalse(slot.offer(3))
+        self.assertEqual(slot.depth, 2)
+        self.assertEqual(slot.dropped, 1)
+        self.assertEqual(slot.next(), 3)
+        self.assertIsNone(slot.next())
+        self.assertEqual(slot.depth, 0)
+        self.assertTrue(slot.offer(4))
+
+    def test_latency_stats(self):
+        """Test end-to-end latency bookkeeping"""
+        slot = LatestFrameSlot()
+        slot.record_latency(0.1)
+        slot.record_latency(0.3)
+        stats = slot.stats()
+        self.assertEqual(stats["processed"], 2)
+        self.assertEqual(stats["avg_latency_ms"], 200.0)
+        self.assertEqual(stats["max_latency_ms"], 300.0)
+
+class TestSessionStore(unittest.TestCase):
+    def test_sessions_are_isolated(self):
+        """Test that two sids never share monitoring state"""
+        store = SessionStore()
+        store.get('a').monitor.next_frame()
+        self.assertEqual(store.get('a').monitor.total_frames, 1)
+        self.assertEqual(store.get('b').monitor.total_frames, 0)
+        self.assertEqual(len(store), 2)
+
+    def test_remove_and_evict_idle(self):
+        """Test disconnect removal and idle eviction"""
+        store = SessionStore(idle_timeout=10)
+        store.get('a')
+        session_b = store.get('b')
+        self.assertIsNotNone(store.remove('a'))
+        self.assertIsNone(store.remove('a'))
+        self.assertEqual(store.evict_idle(now=session_b.last_seen + 5), [])
+        self.assertEqual(store.evict_idle(now=session_b.last_seen + 11), [session_b])
+        self.assertEqual(len(store), 0)
+
+    def test_shard_for_is_stable(self):
+        """Test that shard assignment is deterministic and in range"""
+        self.assertEqual(shard_for('sid-1', 4), shard_for('sid-1', 4))
+        self.assertTrue(all(0 <= shard_for(f'sid-{i}', 4) < 4 for i in range(50)))
+
+if __name__ == '__main__':
+    unittest.main()
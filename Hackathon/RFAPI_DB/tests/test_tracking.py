@@ -0,0 +1,82 @@
+import unittest
+import numpy as np
+from face_recognizer import FaceRecognizer
+from tracking import RecognitionGate
+
+def scene(offset=0, face=True):
+    """Gray frame with a textured 'face' patch shifted horizontally"""
+    frame = np.full((240, 320), 40, dtype=np.uint8)
+    if face:
+        patch = np.random.default_rng(1).integers(0, 255, (80, 60), dtype=np.uint8)
+        frame[60:140, 120 + offset:180 + offset] = patch
+    return frame
+
+class TestRecognitionGate(unittest.TestCase):
+    def setUp(self):
+        self.face = {"box": [120, 60, 180, 140], "landmarks": [[135, 90], [165, 90], [150, 110], [140, 125], [160, 125]]}
+
+    def test_first_frame_needs_recognition(self):
+        """Test there is nothing to track before the first full pass"""
+        self.assertIsNone(RecognitionGate().track(scene()))
+
+    def test_small_motion_is_tracked(self):
+        """Test small motion reuses the last recognition with shifted boxes"""
+        gate = RecognitionGate(change_threshold=20)
+        gate.update(scene(), [self.face])
+        faces = gate.track(scene(offset=4))
+        self.assertIsNotNone(faces)
+        self.assertAlmostEqual(faces[0]["box"][0], 124, delta=2)
+        self.assertAlmostEqual(faces[0]["landmarks"][0][0], 139, delta=2)
+        self.assertEqual(gate.stats(), {"full_recognitions": 1, "tracked": 1})
+
+    def test_scene_change_and_max_interval_force_recognition(self):
+        """Test a big change or the interval limit triggers a full pass"""
+        gate = RecognitionGate(max_interval=2)
+        gate.update(scene(), [self.face])
+        self.assertIsNone(gate.track(scene(face=False)))
+        self.assertIsNotNone(gate.track(scene()))
+        self.assertIsNotNone(gate.track(scene()))
+        self.assertIsNone(gate.track(scene()))
+
+class FakeMTCNN:
+    """Returns one face at fixed crop coordinates"""
+
+    def __init__(self, box, landmarks):
+        self.box, self.landmarks = box, landmarks
+        self.crops = []
+
+    def detect(self, img, landmarks=True):
+        self.crops.append(img.size)
+        if self.box is None:
+            return None, None, None
+        return np.array([self.box]), np.array([0.99]), np.array([self.landmarks])
+
+class TestLandmarkRefresh(unittest.TestCase):
+    def setUp(self):
+        self.face = {"box": [120, 60, 180, 140], "landmarks": [[135, 90], [165, 90], [150, 110], [140, 125], [160, 125]],
+                     "name": "Ada", "recognized": True}
+        self.recognizer = FaceRecognizer.__new__(FaceRecognizer)
+
+    def test_still_face_gets_current_landmarks(self):
+        """Test a face that stays put is tracked, but its landmarks come from the current frame"""
+        gate = RecognitionGate(change_threshold=20)
+        gate.update(scene(), [self.face])
+        tracked = gate.track(scene())
+        # Tracking alone keeps the landmarks of the full pass
+        self.assertEqual(tracked[0]["landmarks"][0], [135, 90])
+
+        # Head turned in place: the eyes moved, the box did not (crop origin is 105, 40)
+        self.recognizer.detector = FakeMTCNN([15, 20, 75, 100], [[20, 40], [50, 60], [40, 70], [30, 85], [50, 85]])
+        faces = self.recognizer.refresh_landmarks(np.zeros((240, 320, 3), dtype=np.uint8), tracked)
+        self.assertEqual(self.recognizer.detector.crops, [(90, 120)])
+        self.assertEqual(faces[0]["box"], [120, 60, 180, 140])
+        self.assertEqual(faces[0]["landmarks"][:2], [[125.0, 80.0], [155.0, 100.0]])
+        self.assertEqual(faces[0]["name"], "Ada")
+
+    def test_face_missing_from_crop_needs_recognition(self):
+        """Test a tracked box without a face asks for a full pass"""
+        self.recognizer.detector = FakeMTCNN(None, None)
+        self.assertIsNone(self.recognizer.refresh_landmarks(np.zeros((240, 320, 3), dtype=np.uint8), [self.face]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,160 @@
+import cv2
+import numpy as np
+
+class SceneChangeGate:
+    """Cheap change detector comparing downscaled grayscale frames"""
+
+    def __init__(self, size=(64, 48), threshold=6.0):
+        """
+        Args:
+            size (tuple): (width, height) of the thumbnails compared
+            threshold (float): Mean absolute gray-level difference (0-255)
+                above which the scene counts as changed
+        """
+        self.size = size
+        self.threshold = threshold
+        self.reference = None
+
+    def thumbnail(self, gray):
+        return cv2.resize(gray, self.size, interpolation=cv2.INTER_AREA)
+
+    def score(self, gray):
+        """Difference between a frame and the reference (inf without reference)"""
+        if self.reference is None:
+            return float('inf')
+        return float(cv2.absdiff(self.thumbnail(gray), self.reference).mean())
+
+    def changed(self, gray):
+        return self.score(gray) > self.threshold
+
+    def reset(self, gray):
+        """Make this frame the reference, typically after a full recognition"""
+        self.reference = self.thumbnail(gray)
+
+class FaceTracker:
+    """
+    Carries recognized faces between full recognitions by template matching
+
+    Each face box from the last recognition is kept as a grayscale template
+    and searched for in a window around its last position; boxes and
+    landmarks are shifted with it so identities and gaze stay available.
+    """
+
+    def __init__(self, scale=0.5, search_margin=0.5, min_score=0.6):
+        """
+        Args:
+            scale (float): Downscale factor applied before matching
+            search_margin (float): Search window padding as a fraction of the box size
+            min_score (float): Minimum normalized correlation to keep a track
+        """
+        self.scale = scale
+        self.search_margin = search_margin
+        self.min_score = min_score
+        self.tracks = []  # (face dict, template, [x1, y1, x2, y2] in scaled coords)
+
+    def _scaled(self, gray):
+        return cv2.resize(gray, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+
+    def reset(self, gray, faces):
+        """Start tracking the faces returned by a full recognition"""
+        small = self._scaled(gray)
+        height, width = small.shape[:2]
+        self.tracks = []
+        for face in faces:
+            x1, y1, x2, y2 = [int(round(v * self.scale)) for v in face["box"]]
+            x1, y1 = max(0, x1), max(0, y1)
+            x2, y2 = min(width, x2), min(height, y2)
+            if x2 - x1 < 4 or y2 - y1 < 4:
+                continue
+            self.tracks.append((face, small[y1:y2, x1:x2].copy(), [x1, y1, x2, y2]))
+        return len(self.tracks) == len(faces)
+
+    def update(self, gray):
+        """
+        Locate every tracked face in a new frame
+
+        Returns:
+            list: Faces with shifted boxes and landmarks, or None if any track
+                was lost (a full recognition is then needed)
+        """
+        small = self._scaled(gray)
+        height, width = small.shape[:2]
+        faces = []
+        for i, (face, template, box) in enumerate(self.tracks):
+            x1, y1, x2, y2 = box
+            pad_x = int((x2 - x1) * self.search_margin)
+            pad_y = int((y2 - y1) * self.search_margin)
+            sx1, sy1 = max(0, x1 - pad_x), max(0, y1 - pad_y)
+            sx2, sy2 = min(width, x2 + pad_x), min(height, y2 + pad_y)
+            window = small[sy1:sy2, sx1:sx2]
+            if window.shape[0] < template.shape[0] or window.shape[1] < template.shape[1]:
+                return None
+
+            result = cv2.matchTemplate(window, template, cv2.TM_CCOEFF_NORMED)
+            _, score, _, (mx, my) = cv2.minMaxLoc(result)
+            if not np.isfinite(score) or score < self.min_score:
+                return None
+
+            nx1, ny1 = sx1 + mx, sy1 + my
+            self.tracks[i] = (face, template, [nx1, ny1, nx1 + x2 - x1, ny1 + y2 - y1])
+
+            # Shift the original detection by the total displacement
+            dx = (nx1 - face["box"][0] * self.scale) / self.scale
+            dy = (ny1 - face["box"][1] * self.scale) / self.scale
+            tracked = dict(face)
+            tracked["box"] = [int(face["box"][0] + dx), int(face["box"][1] + dy),
+                              int(face["box"][2] + dx), int(face["box"][3] + dy)]
+            tracked["landmarks"] = [[x + dx, y + dy] for x, y in face["landmarks"]]
+            tracked["tracked"] = True
+            faces.append(tracked)
+        return faces
+
+class RecognitionGate:
+    """
+    Decides when a frame needs a full MTCNN + FaceNet pass
+
+    A full pass runs when the scene changed significantly since the last
+    one, when a tracked face is lost, or when max_interval checks went by
+    without one. Otherwise the tracked faces from the last pass are reused.
+    """
+
+    def __init__(self, change_threshold=6.0, max_interval=10, min_track_score=0.6):
+        """
+        Args:
+            change_threshold (float): See SceneChangeGate.threshold
+            max_interval (int): Maximum number of checks between full passes
+            min_track_score (float): See FaceTracker.min_score
+        """
+        self.gate = SceneChangeGate(threshold=change_threshold)
+        self.tracker = FaceTracker(min_score=min_track_score)
+        self.max_interval = max_interval
+        self.since_full = 0
+        self.full_passes = 0
+        self.tracked_passes = 0
+
+    def track(self, gray):
+        """
+        Try to reuse the last recognition for this frame
+
+        Returns:
+            list: Tracked faces, or None if a full recognition is needed
+        """
+        if self.since_full >= self.max_interval or self.gate.changed(gray):
+            return None
+        faces = self.tracker.update(gray)
+        if faces is not None:
+            self.since_full += 1
+            self.tracked_passes += 1
+        return faces
+
+    def update(self, gray, faces):
+        """Record the result of a full recognition"""
+        self.gate.reset(gray)
+        self.since_full = 0
+        self.full_passes += 1
+        if not self.tracker.reset(gray, faces):
+            # Some face is too small to track, recognize again next time
+            self.since_full = self.max_interval
+
+    def stats(self):
+        return {"full_recognitions": self.full_passes, "tracked": self.tracked_passes}
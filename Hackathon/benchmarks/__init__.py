@@ -0,0 +1,8 @@
+"""
+Throughput / latency benchmarks of the vision engines
+
+Each engine (object detection, face recognition, document scanning) is
+driven directly and through its server entry point, on synthetic or
+recorded inputs. Runs are written as JSON and compared with
+`python -m benchmarks compare`. See README.md.
+"""
@@ -0,0 +1,94 @@
+"""
+Benchmark the vision engines, or compare two benchmark runs
+
+Usage:
+    python -m benchmarks run [--engines objects faces scan] [--modes direct server] [--output run.json]
+    python -m benchmarks compare base.json run.json [--threshold 10]
+"""
+import sys
+import json
+import logging
+import argparse
+from .engines import ENGINES
+from .runner import MODES, run
+from .stats import compare
+
+def format_run(results):
+    lines = [f"{'case':<16}{'calls/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'peak MB':>9}{'errors':>8}"]
+    for case, result in results["cases"].items():
+        if "error" in result:
+            # Server errors end with the server's output, show its last line
+            lines.append(f"{case:<16}  {result['error'].strip().splitlines()[-1]}")
+            continue
+        latency = result.get("latency_ms", {})
+        lines.append(f"{case:<16}{result['throughput']:>9}{latency.get('p50', '-'):>9}{latency.get('p95', '-'):>9}"
+                     f"{latency.get('p99', '-'):>9}{result['peak_rss_mb'] or '-':>9}{result['errors']:>8}")
+    return '\n'.join(lines)
+
+def format_comparison(comparison):
+    lines = [f"warning: {warning}" for warning in comparison["warnings"]]
+    lines.append(f"{'case':<16}{'metric':<16}{'base':>10}{'new':>10}{'change':>9}")
+    for row in comparison["rows"]:
+        flag = "  REGRESSION" if row["regression"] else ""
+        lines.append(f"{row['case']:<16}{row['metric']:<16}{row['base']:>10}{row['new']:>10}{row['change']:>8}%{flag}")
+    lines.append(f"{comparison['regressions']} regressions")
+    return '\n'.join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Run the benchmarks")
+    run_parser.add_argument('--engines', nargs='+', choices=list(ENGINES), default=list(ENGINES))
+    run_parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    run_parser.add_argument('--iterations', type=int, default=200, help="Timed calls per case")
+    run_parser.add_argument('--warmup', type=int, default=10, help="Untimed calls per client before timing")
+    run_parser.add_argument('--inputs', type=int, default=20, help="Distinct images, used in turn")
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.add_argument('--width', type=int, default=640, help="Synthetic frame width")
+    run_parser.add_argument('--height', type=int, default=480, help="Synthetic frame height")
+    run_parser.add_argument('--frames-dir', help="Webcam images to use instead of synthetic frames")
+    run_parser.add_argument('--documents-dir', help="Document photos to use instead of synthetic ones")
+    run_parser.add_argument('--inference-size', type=int, default=320, help="Object detection input (direct mode)")
+    run_parser.add_argument('--gallery-size', type=int, default=0,
+                            help="Random identities added to the face gallery (direct mode)")
+    run_parser.add_argument('--concurrency', type=int, default=1, help="Clients sending at once (server mode)")
+    run_parser.add_argument('--output', help="JSON file of the results (default: printed)")
+
+    compare_parser = commands.add_parser("compare", help="Compare a run with a reference run")
+    compare_parser.add_argument('base')
+    compare_parser.add_argument('new')
+    compare_parser.add_argument('--threshold', type=float, default=10.0,
+                                help="Percent a metric may worsen before it is a regression")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.command == "compare":
+        with open(args.base) as f:
+            base = json.load(f)
+        with open(args.new) as f:
+            new = json.load(f)
+        comparison = compare(base, new, args.threshold)
+        print(format_comparison(comparison))
+        sys.exit(1 if comparison["regressions"] else 0)
+
+    if min(args.iterations, args.inputs, args.concurrency) < 1 or args.warmup < 0:
+        parser.error("--iterations, --inputs and --concurrency must be positive, --warmup not negative")
+    config = {
+        "iterations": args.iterations, "warmup": args.warmup, "inputs": args.inputs, "seed": args.seed,
+        "width": args.width, "height": args.height, "frames_dir": args.frames_dir,
+        "documents_dir": args.documents_dir, "inference_size": args.inference_size or None,
+        "gallery_size": args.gallery_size, "concurrency": args.concurrency
+    }
+    results = run(args.engines, args.modes, config)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+    print(format_run(results), file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
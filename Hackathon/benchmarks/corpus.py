@@ -0,0 +1,110 @@
+"""
+Benchmark inputs: synthetic webcam frames and document photos, or a local corpus
+
+Synthetic inputs only depend on the seed and size, so two runs with the
+same settings measure the same pixels. Every input is JPEG-encoded once:
+servers receive those bytes and direct runs their decoded image, and the
+fingerprint of the bytes tells whether two runs used the same inputs.
+"""
+import os
+import hashlib
+import cv2
+import numpy as np
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+# Document layout the scanner expects once the page is straightened:
+# an 800x600 card with the barcode in rows 514-586, columns 312-757
+PAGE_WIDTH, PAGE_HEIGHT = 800, 600
+BARCODE_BOX = (312, 514, 757, 586)
+
+def synthetic_frames(count, width=640, height=480, seed=0):
+    """Webcam-like frames: a lit background with desk objects and noise"""
+    rng = np.random.default_rng(seed)
+    gradient = np.linspace(60, 180, width, dtype=np.float32)
+    frames = []
+    for _ in range(count):
+        frame = np.empty((height, width, 3), np.float32)
+        frame[:] = gradient[None, :, None] * rng.uniform(0.7, 1.1, 3)
+        for _ in range(rng.integers(3, 8)):
+            color = [int(c) for c in rng.integers(0, 256, 3)]
+            x1, y1 = int(rng.integers(0, width - 40)), int(rng.integers(0, height - 40))
+            x2, y2 = x1 + int(rng.integers(20, width // 3)), y1 + int(rng.integers(20, height // 3))
+            if rng.random() < 0.5:
+                cv2.rectangle(frame, (x1, y1), (x2, y2), color, -1)
+            else:
+                cv2.ellipse(frame, ((x1 + x2) // 2, (y1 + y2) // 2), ((x2 - x1) // 2, (y2 - y1) // 2), 0, 0, 360, color, -1)
+        frame += rng.normal(0, 6, frame.shape).astype(np.float32)
+        frames.append(np.clip(frame, 0, 255).astype(np.uint8))
+    return frames
+
+def synthetic_documents(count, width=1280, height=960, seed=0):
+    """Photos of a card with text and a barcode, seen in perspective on a desk"""
+    rng = np.random.default_rng(seed)
+    documents = []
+    for _ in range(count):
+        page = np.full((PAGE_HEIGHT, PAGE_WIDTH, 3), 245, np.uint8)
+        for row in range(6):
+            words = ' '.join(''.join(chr(c) for c in rng.integers(65, 91, rng.integers(3, 9))) for _ in range(4))
+            cv2.putText(page, words, (40, 70 + row * 60), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (30, 30, 30), 2)
+        x1, y1, x2, y2 = BARCODE_BOX
+        x = x1 + 10
+        while x < x2 - 10:
+            bar = int(rng.integers(2, 7))
+            if rng.random() < 0.5:
+                page[y1 + 8:y2 - 8, x:x + bar] = 0
+            x += bar
+
+        # Page corners at random places in the middle of the photo
+        margin_x, margin_y = width * 0.12, height * 0.12
+        corners = np.float32([
+            [margin_x, margin_y], [width - margin_x, margin_y],
+            [width - margin_x, height - margin_y], [margin_x, height - margin_y]
+        ]) + (rng.uniform(-0.08, 0.08, (4, 2)) * [width, height]).astype(np.float32)
+        source = np.float32([[0, 0], [PAGE_WIDTH, 0], [PAGE_WIDTH, PAGE_HEIGHT], [0, PAGE_HEIGHT]])
+        desk = np.clip(rng.normal(70, 12, (height, width, 3)), 0, 255).astype(np.uint8)
+        photo = cv2.warpPerspective(page, cv2.getPerspectiveTransform(source, corners), (width, height),
+                                    dst=desk, borderMode=cv2.BORDER_TRANSPARENT)
+        documents.append(photo)
+    return documents
+
+def load_images(directory, limit=None):
+    """Images of a directory in name order"""
+    images = []
+    for name in sorted(os.listdir(directory)):
+        if limit is not None and len(images) >= limit:
+            break
+        if name.lower().endswith(IMAGE_EXTENSIONS):
+            image = cv2.imread(os.path.join(directory, name))
+            if image is not None:
+                images.append(image)
+    if not images:
+        raise ValueError(f"No images found in {directory}")
+    return images
+
+def load_inputs(kind, config):
+    """
+    Inputs of an engine
+
+    Args:
+        kind (str): "frames" or "documents"
+        config (dict): Run settings (inputs, seed, width, height, frames_dir,
+            documents_dir)
+
+    Returns:
+        tuple: (JPEG bytes, decoded BGR images, fingerprint)
+    """
+    directory = config.get(f"{kind}_dir")
+    if directory:
+        images = load_images(directory, config["inputs"])
+    elif kind == "frames":
+        images = synthetic_frames(config["inputs"], config["width"], config["height"], config["seed"])
+    else:
+        images = synthetic_documents(config["inputs"], seed=config["seed"])
+
+    encoded = [cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes() for image in images]
+    fingerprint = hashlib.sha1()
+    for jpeg in encoded:
+        fingerprint.update(jpeg)
+    decoded = [cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR) for jpeg in encoded]
+    return encoded, decoded, fingerprint.hexdigest()[:16]
@@ -0,0 +1,164 @@
+"""
+The engines under test, each loadable in-process or served by its own entry point
+"""
+import io
+import os
+import sys
+import json
+import base64
+import threading
+import contextlib
+import urllib.error
+import urllib.request
+import numpy as np
+
+HACKATHON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def use_service(service_dir):
+    """Make a service's flat modules importable (each case runs in its own process)"""
+    if service_dir not in sys.path:
+        sys.path.insert(0, service_dir)
+
+class SocketIOClient:
+    """Sends frame events and waits for the server's response to each"""
+
+    def __init__(self, url, config=None, timeout=60):
+        import socketio
+        self.timeout = timeout
+        self.answered = threading.Event()
+        self.client = socketio.Client(reconnection=False)
+        self.client.on('response', lambda data: self.answered.set())
+        self.client.connect(url, wait_timeout=timeout)
+        if config:
+            self.client.emit('config', config)
+
+    @property
+    def transport(self):
+        return self.client.transport()
+
+    @staticmethod
+    def payload(jpeg):
+        return {"image": "data:image/jpeg;base64," + base64.b64encode(jpeg).decode('ascii')}
+
+    def send(self, payload):
+        self.answered.clear()
+        self.client.emit('frame', payload)
+        if not self.answered.wait(self.timeout):
+            raise TimeoutError(f"No response within {self.timeout}s")
+
+    def close(self):
+        self.client.disconnect()
+
+class HTTPClient:
+    """POSTs JSON documents; 4xx answers are results, 5xx and timeouts errors"""
+
+    transport = "http"
+
+    def __init__(self, url, fields=None, timeout=60):
+        self.url = url
+        self.fields = fields or {}
+        self.timeout = timeout
+
+    def payload(self, jpeg):
+        return json.dumps({"base64": base64.b64encode(jpeg).decode('ascii'), **self.fields}).encode('utf-8')
+
+    def send(self, payload):
+        request = urllib.request.Request(self.url, data=payload, headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+        except urllib.error.HTTPError as e:
+            if e.code >= 500:
+                raise
+
+    def close(self):
+        pass
+
+class Engine:
+    """
+    One engine: load() builds it in-process, server_code serves its real app
+
+    server_code is Python run in the service directory with the port to
+    listen on; it serves the same app object as the service's entry point.
+    """
+
+    name = None
+    inputs = "frames"
+    service_dir = None
+    server_code = None
+
+    def __init__(self, config):
+        self.config = config
+
+    def load(self):
+        """Load the models, returning a function analyzing one decoded BGR image"""
+        raise NotImplementedError
+
+    def client(self, url):
+        """Client of a running server, see SocketIOClient"""
+        raise NotImplementedError
+
+class ObjectsEngine(Engine):
+    """ObjectDetectionAPI: MediaPipe detection on frames downscaled like the server's"""
+
+    name = "objects"
+    service_dir = os.path.join(HACKATHON_DIR, 'ObjectDetectionAPI')
+    server_code = ("import eventlet, flaskws; flaskws.start_worker(); "
+                   "eventlet.wsgi.server(eventlet.listen(('127.0.0.1', {port})), flaskws.app, log_output=False)")
+
+    def load(self):
+        use_service(self.service_dir)
+        from objectDetection import ObjectDetector
+        from preprocessing import FramePreprocessor
+        detector = ObjectDetector(model_path=os.path.join(self.service_dir, 'efficientdet_lite0.tflite'))
+        preprocessor = FramePreprocessor(self.config["inference_size"])
+        return lambda frame: detector.detect(frame, preprocessor=preprocessor)
+
+    def client(self, url):
+        # Per-frame responses instead of object events only
+        return SocketIOClient(url, config={"per_frame": True})
+
+class FacesEngine(Engine):
+    """RFAPI_DB: MTCNN + FaceNet recognition against the cached gallery"""
+
+    name = "faces"
+    service_dir = os.path.join(HACKATHON_DIR, 'RFAPI_DB')
+    server_code = ObjectsEngine.server_code
+
+    def load(self):
+        use_service(self.service_dir)
+        from face_recognizer import FaceRecognizer
+        recognizer = FaceRecognizer(students_dir=os.path.join(self.service_dir, "students_database"), threshold=0.7,
+                                    store_path=os.path.join(self.service_dir, "embeddings_store"))
+        # Random identities so matching costs what it would for a school
+        rng = np.random.default_rng(self.config["seed"])
+        for index in range(self.config["gallery_size"]):
+            recognizer.gallery.add(f"benchmark-{index}", f"Student {index}", rng.normal(size=512).astype(np.float32))
+        return recognizer.identify_faces
+
+    def client(self, url):
+        return SocketIOClient(url)
+
+class ScanEngine(Engine):
+    """BarCodeReader: document straightening and barcode decoding"""
+
+    name = "scan"
+    inputs = "documents"
+    service_dir = os.path.join(HACKATHON_DIR, 'BarCodeReader')
+    server_code = "from app import app; app.run(host='127.0.0.1', port={port})"
+
+    def load(self):
+        use_service(self.service_dir)
+        from scan import DocScanner
+        scanner = DocScanner()
+
+        def scan(document):
+            # The scanner prints every decoded value
+            with contextlib.redirect_stdout(io.StringIO()):
+                return scanner.scan(document)
+        return scan
+
+    def client(self, url):
+        return HTTPClient(url + '/verifyBarcode', fields={"cne": "benchmark"})
+
+ENGINES = {engine.name: engine for engine in (ObjectsEngine, FacesEngine, ScanEngine)}
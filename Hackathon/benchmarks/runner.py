@@ -0,0 +1,243 @@
+"""
+Runs each benchmark case in a fresh process and collects the results
+
+A case is one engine driven one way:
+  - direct: the engine is loaded in the case's process and called on the
+    decoded images one after the other
+  - server: the service's app is started in a child process on a free
+    port and sent the JPEG images by `concurrency` clients, each waiting
+    for the answer to one image before sending the next
+
+Peak RSS is that of the process holding the models, so fresh processes
+keep one case's memory out of the next one's numbers.
+"""
+import os
+import sys
+import time
+import queue
+import socket
+import logging
+import platform
+import tempfile
+import threading
+import subprocess
+import multiprocessing
+from datetime import datetime, timezone
+from importlib import metadata
+from .corpus import load_inputs
+from .engines import ENGINES
+from .stats import summarize, peak_rss_mb, process_peak_rss_mb
+
+logger = logging.getLogger(__name__)
+
+MODES = ("direct", "server")
+
+# Installed versions recorded with each run
+PACKAGES = ("numpy", "opencv-python", "opencv-python-headless", "opencv-contrib-python", "torch", "facenet-pytorch", "mediapipe", "flask", "python-socketio", "eventlet")
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+class ServerProcess:
+    """A service's app served in a child process, started for one case"""
+
+    def __init__(self, engine, startup_timeout=300):
+        self.engine = engine
+        self.startup_timeout = startup_timeout
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.process = None
+        self.log = tempfile.TemporaryFile(mode='w+')
+
+    def start(self):
+        """
+        Start the server and wait until it accepts connections
+
+        Returns:
+            float: Seconds until it was ready (models loaded at import time)
+        """
+        started = time.perf_counter()
+        self.process = subprocess.Popen([sys.executable, '-c', self.engine.server_code.format(port=self.port)],
+                                        cwd=self.engine.service_dir, stdout=self.log, stderr=subprocess.STDOUT)
+        while time.perf_counter() - started < self.startup_timeout:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"{self.engine.name} server exited with {self.process.returncode}:\n{self.output()}")
+            try:
+                socket.create_connection(('127.0.0.1', self.port), timeout=1).close()
+                return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.2)
+        raise TimeoutError(f"{self.engine.name} server not ready after {self.startup_timeout}s:\n{self.output()}")
+
+    def output(self, lines=20):
+        self.log.seek(0)
+        return ''.join(self.log.readlines()[-lines:])
+
+    def peak_rss_mb(self):
+        return process_peak_rss_mb(self.process.pid)
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self.log.close()
+
+def timed_calls(call, items, warmup, iterations):
+    """
+    Call `call` on the items in turn, `warmup` untimed times then `iterations` timed ones
+
+    Returns:
+        tuple: (latencies of the successful timed calls, elapsed seconds, timed calls that failed)
+    """
+    errors = 0
+    for index in range(warmup):
+        try:
+            call(items[index % len(items)])
+        except Exception as e:
+            logger.warning(f"Warmup call failed: {e}")
+
+    latencies = []
+    started = time.perf_counter()
+    for index in range(iterations):
+        before = time.perf_counter()
+        try:
+            call(items[index % len(items)])
+        except Exception as e:
+            errors += 1
+            if errors == 1:
+                logger.warning(f"Call failed: {e}")
+            continue
+        latencies.append(time.perf_counter() - before)
+    return latencies, time.perf_counter() - started, errors
+
+def run_direct(engine, images, config):
+    started = time.perf_counter()
+    analyze = engine.load()
+    load_s = time.perf_counter() - started
+    latencies, elapsed, errors = timed_calls(analyze, images, config["warmup"], config["iterations"])
+    return {"load_s": round(load_s, 2), **summarize(latencies, elapsed, errors), "peak_rss_mb": peak_rss_mb()}
+
+def run_server(engine, jpegs, config):
+    server = ServerProcess(engine)
+    try:
+        load_s = server.start()
+        clients = [engine.client(server.url) for _ in range(config["concurrency"])]
+        payloads = [clients[0].payload(jpeg) for jpeg in jpegs]
+
+        # Each client warms up, then all send their share of the calls together
+        shares = [config["iterations"] // len(clients) + (index < config["iterations"] % len(clients))
+                  for index in range(len(clients))]
+        outcomes = [None] * len(clients)
+        started = []
+        barrier = threading.Barrier(len(clients), action=lambda: started.append(time.perf_counter()))
+
+        def drive(index):
+            items = payloads[index:] + payloads[:index]
+            timed_calls(clients[index].send, items, config["warmup"], 0)
+            barrier.wait()
+            outcomes[index] = timed_calls(clients[index].send, items, 0, shares[index])
+
+        threads = [threading.Thread(target=drive, args=(index,)) for index in range(len(clients))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started[0]
+
+        latencies = [latency for outcome in outcomes for latency in outcome[0]]
+        errors = sum(outcome[2] for outcome in outcomes)
+        transport = clients[0].transport
+        for client in clients:
+            client.close()
+        return {"load_s": round(load_s, 2), **summarize(latencies, elapsed, errors),
+                "peak_rss_mb": server.peak_rss_mb(), "transport": transport}
+    finally:
+        server.stop()
+
+def run_case(engine_name, mode, config, results):
+    """Body of a case process: puts (result, inputs fingerprint) on results"""
+    logging.basicConfig(level=logging.WARNING)
+    fingerprint = None
+    try:
+        engine = ENGINES[engine_name](config)
+        jpegs, images, fingerprint = load_inputs(engine.inputs, config)
+        if mode == "direct":
+            result = run_direct(engine, images, config)
+        else:
+            result = run_server(engine, jpegs, config)
+    except Exception as e:
+        result = {"error": f"{type(e).__name__}: {e}"}
+    results.put((result, fingerprint))
+
+def wait_result(process, results, timeout):
+    """Result of a case process, or an error once it died or timed out without one"""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return results.get(timeout=1)
+        except queue.Empty:
+            if not process.is_alive():
+                # Anything it sent before exiting is already readable
+                try:
+                    return results.get(timeout=1)
+                except queue.Empty:
+                    return {"error": f"case process exited with {process.exitcode}"}, None
+            if time.monotonic() > deadline:
+                return {"error": f"no result after {timeout}s"}, None
+
+def run(engines, modes, config, case_timeout=1800):
+    """
+    Run every engine x mode case, each in a spawned process
+
+    Returns:
+        dict: {"meta": run settings and environment, "cases": {"engine/mode": result}}
+    """
+    context = multiprocessing.get_context('spawn')
+    cases = {}
+    inputs = {}
+    for engine_name in engines:
+        for mode in modes:
+            case = f"{engine_name}/{mode}"
+            logger.info(f"Running {case}")
+            results = context.Queue()
+            process = context.Process(target=run_case, args=(engine_name, mode, config, results), name=case)
+            process.start()
+            result, fingerprint = wait_result(process, results, case_timeout)
+            process.join(10)
+            if process.is_alive():
+                process.kill()
+            cases[case] = result
+            if fingerprint is not None:
+                inputs[ENGINES[engine_name].inputs] = fingerprint
+            logger.info(f"{case}: {result}")
+    return {"meta": environment(config, inputs), "cases": cases}
+
+def environment(config, inputs):
+    versions = {}
+    for package in PACKAGES:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "created": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        "commit": commit,
+        "config": config,
+        "inputs": inputs,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "packages": versions
+    }
@@ -0,0 +1,107 @@
+"""
+Latency summaries, peak memory and the comparison of two runs
+"""
+import sys
+import numpy as np
+
+# Metrics compared between runs: (path in a case result, higher is better)
+COMPARED_METRICS = [
+    ("throughput", True),
+    ("latency_ms.p50", False),
+    ("latency_ms.p95", False),
+    ("latency_ms.p99", False),
+    ("peak_rss_mb", False)
+]
+
+# Settings that make two runs incomparable when they differ
+COMPARABLE_META = ("config", "inputs", "cpu_count", "platform", "python")
+
+def summarize(latencies, elapsed, errors=0):
+    """
+    Args:
+        latencies (list): Seconds taken by each successful call
+        elapsed (float): Wall time of all the timed calls in seconds
+        errors (int): Calls that failed
+
+    Returns:
+        dict: Calls, errors, throughput (calls per second) and latency
+            percentiles in milliseconds
+    """
+    summary = {"calls": len(latencies), "errors": errors, "elapsed_s": round(elapsed, 3),
+               "throughput": round(len(latencies) / elapsed, 2) if elapsed > 0 else 0.0}
+    if latencies:
+        values = np.asarray(latencies) * 1000
+        p50, p95, p99 = (float(value) for value in np.percentile(values, [50, 95, 99]))
+        summary["latency_ms"] = {"p50": round(p50, 2), "p95": round(p95, 2), "p99": round(p99, 2),
+                                 "mean": round(float(values.mean()), 2), "max": round(float(values.max()), 2)}
+    return summary
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB, None where unavailable (Windows)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def process_peak_rss_mb(pid):
+    """Peak resident memory of another process in MB (Linux /proc), None if unknown"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+def metric(result, path):
+    value = result
+    for key in path.split('.'):
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+def compare(base, new, threshold=10.0):
+    """
+    Compare the cases two runs have in common
+
+    Args:
+        base (dict): Reference run
+        new (dict): Run checked for regressions
+        threshold (float): Change in percent beyond which a worse metric is
+            a regression
+
+    Returns:
+        dict: rows (case, metric, base, new, change in percent, regression),
+            regressions (count) and warnings (settings that differ)
+    """
+    warnings = []
+    for key in COMPARABLE_META:
+        before, after = base["meta"].get(key), new["meta"].get(key)
+        if key == "inputs":
+            # Only the inputs of engines both runs measured
+            shared = set(before) & set(after)
+            before, after = {kind: before[kind] for kind in shared}, {kind: after[kind] for kind in shared}
+        if before != after:
+            warnings.append(f"{key} differs: {before} vs {after}")
+    rows = []
+    for case in sorted(set(base["cases"]) & set(new["cases"])):
+        base_result, new_result = base["cases"][case], new["cases"][case]
+        if "error" in base_result or "error" in new_result:
+            warnings.append(f"{case}: not compared, a run failed")
+            continue
+        for path, higher_is_better in COMPARED_METRICS:
+            before, after = metric(base_result, path), metric(new_result, path)
+            if before is None or after is None:
+                continue
+            change = (after - before) / before * 100 if before else 0.0
+            worse = -change if higher_is_better else change
+            rows.append({"case": case, "metric": path, "base": before, "new": after,
+                         "change": round(change, 1), "regression": worse > threshold})
+    for case in sorted(set(base["cases"]) ^ set(new["cases"])):
+        warnings.append(f"{case}: only in one run")
+    return {"rows": rows, "regressions": sum(row["regression"] for row in rows), "warnings": warnings}
@@ -0,0 +1,56 @@
+import unittest
+from benchmarks.corpus import load_inputs
+from benchmarks.stats import summarize, compare
+
+def run_result(throughput, p95, rss=500.0, config=None):
+    return {
+        "meta": {"config": config or {"iterations": 100}, "inputs": {"frames": "abc"}, "cpu_count": 4,
+                 "platform": "Linux", "python": "3.11"},
+        "cases": {"objects/direct": {"throughput": throughput, "peak_rss_mb": rss,
+                                     "latency_ms": {"p50": 10.0, "p95": p95, "p99": 30.0}}}
+    }
+
+class TestSummarize(unittest.TestCase):
+    def test_percentiles_and_throughput(self):
+        summary = summarize([i / 1000 for i in range(1, 101)], elapsed=2.0, errors=3)
+        self.assertEqual(summary["calls"], 100)
+        self.assertEqual(summary["errors"], 3)
+        self.assertEqual(summary["throughput"], 50.0)
+        self.assertAlmostEqual(summary["latency_ms"]["p50"], 50.5)
+        self.assertAlmostEqual(summary["latency_ms"]["p99"], 99.01)
+        self.assertEqual(summary["latency_ms"]["max"], 100.0)
+
+    def test_no_successful_call(self):
+        summary = summarize([], elapsed=1.0, errors=5)
+        self.assertEqual(summary["throughput"], 0.0)
+        self.assertNotIn("latency_ms", summary)
+
+class TestCompare(unittest.TestCase):
+    def test_regressions_beyond_threshold(self):
+        comparison = compare(run_result(100.0, 20.0), run_result(85.0, 21.0), threshold=10)
+        flagged = {row["metric"] for row in comparison["rows"] if row["regression"]}
+        # 15% fewer calls per second is a regression, 5% slower p95 is not
+        self.assertEqual(flagged, {"throughput"})
+        self.assertEqual(comparison["regressions"], 1)
+        self.assertEqual(comparison["warnings"], [])
+
+    def test_improvements_are_not_regressions(self):
+        comparison = compare(run_result(100.0, 20.0, rss=500.0), run_result(150.0, 10.0, rss=300.0))
+        self.assertEqual(comparison["regressions"], 0)
+
+    def test_different_settings_are_reported(self):
+        comparison = compare(run_result(100.0, 20.0), run_result(100.0, 20.0, config={"iterations": 10}))
+        self.assertEqual(len(comparison["warnings"]), 1)
+
+class TestInputs(unittest.TestCase):
+    def test_synthetic_inputs_are_reproducible(self):
+        config = {"inputs": 3, "seed": 1, "width": 160, "height": 120}
+        jpegs, images, fingerprint = load_inputs("frames", config)
+        self.assertEqual(len(jpegs), 3)
+        self.assertEqual(images[0].shape, (120, 160, 3))
+        self.assertEqual(load_inputs("frames", config)[2], fingerprint)
+        self.assertNotEqual(load_inputs("frames", {**config, "seed": 2})[2], fingerprint)
+        self.assertEqual(len(load_inputs("documents", config)[1]), 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,8 @@
+"""
+Pre-fork server for the vision services
+
+The models are loaded and warmed up once in a parent process, which then
+forks the serving workers: they share the model weights copy-on-write
+instead of each loading its own copy. See README.md.
+"""
+from .worker import worker_settings, service_app, WorkerSettings
@@ -0,0 +1,47 @@
+"""
+Serve a vision service from pre-forked workers sharing its models
+
+Usage:
+    python -m prefork faces [--workers 4] [--port 5000] [--ready-file /run/faces.ready]
+"""
+import os
+import sys
+import logging
+import argparse
+from .server import PreforkServer
+
+HACKATHON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Service name: (directory, module defining app and the pre-fork hooks)
+SERVICES = {
+    "objects": ("ObjectDetectionAPI", "flaskws"),
+    "faces": ("RFAPI_DB", "flaskws"),
+    "proctoring": ("ProctoringService", "frame_service")
+}
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m prefork", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('service', choices=list(SERVICES))
+    parser.add_argument('--workers', type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument('--host', default='', help="Address to listen on (default: all interfaces)")
+    parser.add_argument('--port', type=int, default=int(os.getenv('PORT', 5000)))
+    parser.add_argument('--ready-file', help="Written once every worker is warmed up, removed on shutdown")
+    parser.add_argument('--shutdown-timeout', type=float, default=30,
+                        help="Seconds workers get to stop before they are killed")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    ready_file = os.path.abspath(args.ready_file) if args.ready_file else None
+    directory, module_name = SERVICES[args.service]
+    service_dir = os.path.join(HACKATHON_DIR, directory)
+    # The services open their models and data relative to their directory
+    os.chdir(service_dir)
+    sys.path.insert(0, service_dir)
+
+    server = PreforkServer(module_name, workers=args.workers, host=args.host, port=args.port,
+                           ready_file=ready_file, shutdown_timeout=args.shutdown_timeout)
+    sys.exit(server.run())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,251 @@
+"""
+Load once, fork the workers, signal readiness once they are all warm
+"""
+import gc
+import os
+import json
+import time
+import select
+import signal
+import socket
+import logging
+import importlib
+import eventlet
+import eventlet.wsgi
+from eventlet import greenio, hubs
+
+logger = logging.getLogger(__name__)
+
+STOP_SIGNALS = {signal.SIGTERM, signal.SIGINT}
+
+def call_hook(module, name):
+    """Call module.name() if the module defines it"""
+    hook = getattr(module, name, None)
+    if hook is not None:
+        hook()
+
+def notify_systemd(state):
+    """Send a state (e.g. READY=1) to systemd when running as a Type=notify unit"""
+    address = os.environ.get('NOTIFY_SOCKET')
+    if not address:
+        return
+    if address.startswith('@'):
+        # Abstract namespace socket
+        address = '\0' + address[1:]
+    with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+        sock.sendto(state.encode('ascii'), address)
+
+class PreforkServer:
+    """
+    Serves a service's WSGI app from forked workers sharing one listening socket
+
+    The parent imports the service module and calls its warm_up() hook, so
+    the models are loaded and have run an inference before any worker
+    exists. Forked workers share those pages copy-on-write: each one costs
+    its runtime state, not another copy of the weights. Every worker then
+    calls start_worker() (threads, per-process models, its own warm-up
+    inference) and reports to the parent, which signals readiness once all
+    of them have.
+
+    The service module defines app and optionally the hooks:
+        warm_up(): Load and exercise the models, in the parent before the fork
+        start_worker(): Start threads and background tasks and warm up, in
+            each worker after the fork
+        stop_worker(): Flush buffered state, in each worker on shutdown
+            once it has stopped serving
+
+    The module sees the number of workers in the PREFORK_WORKERS environment
+    variable while it is imported; worker_settings() derives from it the
+    settings of a worker (single threaded torch until the fork, websocket
+    only clients, its share of the CPUs).
+    """
+
+    def __init__(self, module_name, workers=None, host='', port=5000, ready_file=None,
+                 backlog=128, shutdown_timeout=30):
+        """
+        Args:
+            module_name (str): Service module defining app and the hooks
+            workers (int): Worker processes, defaults to the CPU count
+            host (str): Address to listen on, '' for all interfaces
+            port (int): Port to listen on, 0 for a free one
+            ready_file (str): File written once all workers are ready (with
+                the port and the worker pids) and removed on shutdown
+            backlog (int): Connections queued before a worker accepts them
+            shutdown_timeout (float): Seconds workers get to exit on SIGTERM
+                before they are killed
+        """
+        self.module_name = module_name
+        self.workers = workers or os.cpu_count() or 1
+        self.address = (host, port)
+        self.ready_file = ready_file
+        self.backlog = backlog
+        self.shutdown_timeout = shutdown_timeout
+        self.module = None
+        self.listener = None
+        self.children = {}  # pid -> worker index
+        self.ready = set()  # pids of the workers that finished starting
+        self.stopping = False
+        self._ready_r = self._ready_w = None
+        self._stop_r = self._stop_w = None  # In a worker: written to on SIGTERM
+
+    def run(self):
+        """
+        Load the service, fork the workers and supervise them until SIGTERM
+        or SIGINT. A worker exiting after startup is replaced by a new fork.
+
+        Returns:
+            int: Exit status, 1 if a worker failed to start
+        """
+        os.environ['PREFORK_WORKERS'] = str(self.workers)
+        started = time.monotonic()
+        self.module = importlib.import_module(self.module_name)
+        call_hook(self.module, 'warm_up')
+        logger.info(f"{self.module_name} loaded and warmed up in {time.monotonic() - started:.1f}s")
+
+        # Bound only now, so no connection waits on a server still loading
+        self.listener = self.bind()
+
+        # Everything allocated so far lives as long as the workers: moved out
+        # of the collector's reach, its pages are not written by (and copied
+        # into) each worker when it collects garbage
+        gc.collect()
+        gc.freeze()
+
+        self._ready_r, self._ready_w = os.pipe()
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        try:
+            for index in range(self.workers):
+                self.spawn(index)
+            return self.supervise()
+        finally:
+            # Out of the load balancer first, then stop serving
+            self.remove_ready_file()
+            notify_systemd("STOPPING=1")
+            self.stop_workers()
+
+    def bind(self):
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind(self.address)
+        listener.listen(self.backlog)
+        return listener
+
+    def spawn(self, index):
+        """Fork worker number index"""
+        # Held back until the worker has replaced the parent's handlers
+        signal.pthread_sigmask(signal.SIG_BLOCK, STOP_SIGNALS)
+        pid = os.fork()
+        if pid == 0:
+            status = 0
+            try:
+                self._serve(index)
+            except BaseException:
+                logger.exception(f"Worker {index} failed")
+                status = 1
+            # Never return into the parent's code
+            os._exit(status)
+        signal.pthread_sigmask(signal.SIG_UNBLOCK, STOP_SIGNALS)
+        self.children[pid] = index
+        logger.info(f"Started worker {index} (pid {pid})")
+
+    def _serve(self, index):
+        """Body of a worker process"""
+        self._stop_r, self._stop_w = os.pipe()
+        # Ctrl+C reaches the whole process group: the parent stops the workers
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, self._on_worker_stop)
+        signal.pthread_sigmask(signal.SIG_UNBLOCK, STOP_SIGNALS)
+        os.close(self._ready_r)
+        # A hub created in the parent would share its epoll descriptor with every worker
+        hubs._threadlocal.__dict__.pop('hub', None)
+
+        call_hook(self.module, 'start_worker')
+        os.write(self._ready_w, f"{os.getpid()}\n".encode('ascii'))
+        connections = eventlet.GreenPool()
+        server = eventlet.spawn(eventlet.wsgi.server, greenio.GreenSocket(self.listener), self.module.app,
+                                custom_pool=connections)
+        # Also woken if the server fails, which then raises from server.wait()
+        server.link(lambda _: os.write(self._stop_w, b'\0'))
+        hubs.trampoline(self._stop_r, read=True)
+
+        # Stop accepting, then end the open connections (socket.io websockets
+        # never end by themselves, the server would wait for them)
+        server.kill(SystemExit)
+        for connection in list(connections.coroutines_running):
+            connection.kill()
+        server.wait()
+        # Off the signal handler, with nothing left to serve
+        call_hook(self.module, 'stop_worker')
+
+    def _on_worker_stop(self, signum, frame):
+        # Only wakes _serve: the handler may run in the middle of any greenlet
+        os.write(self._stop_w, b'\0')
+
+    def _on_stop(self, signum, frame):
+        self.stopping = True
+
+    def supervise(self):
+        """Collect the workers' ready messages and replace the workers that exit"""
+        signalled = False
+        while not self.stopping:
+            readable, _, _ = select.select([self._ready_r], [], [], 1.0)
+            if readable:
+                for pid in os.read(self._ready_r, 4096).split():
+                    self.ready.add(int(pid))
+            for pid, code in self.reap():
+                index = self.children.pop(pid)
+                if pid not in self.ready:
+                    logger.error(f"Worker {index} (pid {pid}) exited with status {code} before it was ready")
+                    return 1
+                self.ready.discard(pid)
+                logger.warning(f"Worker {index} (pid {pid}) exited with status {code}, starting a new one")
+                self.spawn(index)
+            if not signalled and len(self.ready) == self.workers:
+                self.signal_ready()
+                signalled = True
+        return 0
+
+    def reap(self):
+        """Yield (pid, exit code) of the workers that exited, without waiting"""
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            if pid in self.children:
+                yield pid, os.waitstatus_to_exitcode(status)
+
+    def signal_ready(self):
+        port = self.listener.getsockname()[1]
+        logger.info(f"Ready: {self.workers} workers serving on port {port}")
+        if self.ready_file:
+            partial = f"{self.ready_file}.part"
+            with open(partial, 'w') as f:
+                json.dump({"pid": os.getpid(), "port": port, "workers": sorted(self.ready)}, f)
+            os.replace(partial, self.ready_file)
+        notify_systemd("READY=1")
+
+    def remove_ready_file(self):
+        if self.ready_file and os.path.exists(self.ready_file):
+            os.remove(self.ready_file)
+
+    def stop_workers(self):
+        """SIGTERM the workers, then SIGKILL those still running after shutdown_timeout"""
+        if not self.children:
+            return
+        logger.info(f"Stopping {len(self.children)} workers")
+        for pid in self.children:
+            os.kill(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.shutdown_timeout
+        while self.children and time.monotonic() < deadline:
+            for pid, _ in self.reap():
+                self.children.pop(pid)
+            time.sleep(0.1)
+        for pid in self.children:
+            logger.warning(f"Worker {self.children[pid]} (pid {pid}) did not stop, killing it")
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        self.children.clear()
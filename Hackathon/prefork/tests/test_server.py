@@ -0,0 +1,138 @@
+import os
+import sys
+import json
+import time
+import shutil
+import signal
+import socket
+import tempfile
+import unittest
+import subprocess
+import urllib.request
+
+HACKATHON_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Stands in for a service: the "model" records the process that loaded it
+SERVICE = '''
+import os
+import json
+
+model = None
+started = False
+
+def warm_up():
+    global model
+    model = {"loaded_by": os.getpid()}
+
+def start_worker():
+    global started
+    if os.environ.get("FAIL_START"):
+        raise RuntimeError("worker cannot start")
+    started = True
+
+def stop_worker():
+    # Records that the worker flushed, and after closing its connections
+    with open(os.path.join(os.environ["STOPPED_DIR"], str(os.getpid())), "w") as f:
+        f.write("stopped")
+
+def app(environ, start_response):
+    if environ["PATH_INFO"] == "/crash":
+        os._exit(3)
+    start_response("200 OK", [("Content-Type", "application/json")])
+    return [json.dumps({"pid": os.getpid(), "started": started, "workers": os.environ["PREFORK_WORKERS"],
+                        **model}).encode()]
+'''
+
+class TestPreforkServer(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        with open(os.path.join(self.directory, 'fake_service.py'), 'w') as f:
+            f.write(SERVICE)
+        self.ready_file = os.path.join(self.directory, 'ready.json')
+        self.server = None
+
+    def tearDown(self):
+        if self.server is not None and self.server.poll() is None:
+            self.server.kill()
+            self.server.wait()
+        shutil.rmtree(self.directory)
+
+    def start(self, **env):
+        code = (f"import sys, logging; sys.path.insert(0, {self.directory!r}); logging.basicConfig(level=logging.INFO)\n"
+                "from prefork.server import PreforkServer\n"
+                f"sys.exit(PreforkServer('fake_service', workers=2, host='127.0.0.1', port=0, "
+                f"ready_file={self.ready_file!r}, shutdown_timeout=5).run())")
+        env = {**os.environ, "STOPPED_DIR": self.directory, **env}
+        self.server = subprocess.Popen([sys.executable, '-c', code], cwd=HACKATHON_DIR, env=env,
+                                       stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+
+    def wait_ready(self, timeout=30):
+        deadline = time.monotonic() + timeout
+        while not os.path.exists(self.ready_file):
+            self.assertIsNone(self.server.poll(), "server exited before it was ready")
+            self.assertLess(time.monotonic(), deadline, "server not ready in time")
+            time.sleep(0.1)
+        with open(self.ready_file) as f:
+            return json.load(f)
+
+    def get(self, port, path='/'):
+        with urllib.request.urlopen(f'http://127.0.0.1:{port}{path}', timeout=10) as response:
+            return json.load(response)
+
+    def stop(self):
+        self.server.send_signal(signal.SIGTERM)
+        _, errors = self.server.communicate(timeout=30)
+        return errors
+
+    def test_workers_share_the_model_loaded_by_the_parent(self):
+        self.start()
+        ready = self.wait_ready()
+        self.assertEqual(ready["pid"], self.server.pid)
+        self.assertEqual(len(ready["workers"]), 2)
+        for _ in range(4):
+            answer = self.get(ready["port"])
+            self.assertIn(answer["pid"], ready["workers"])
+            self.assertEqual(answer["loaded_by"], self.server.pid)
+            self.assertTrue(answer["started"])
+            self.assertEqual(answer["workers"], "2")
+        self.stop()
+        self.assertEqual(self.server.returncode, 0)
+        self.assertFalse(os.path.exists(self.ready_file))
+
+    def test_workers_flush_with_connections_open(self):
+        """Test SIGTERM stops workers holding idle connections at once, each running stop_worker"""
+        self.start()
+        ready = self.wait_ready()
+        # Like an idle websocket: a connection that never completes a request
+        idle = [socket.create_connection(('127.0.0.1', ready["port"])) for _ in range(4)]
+        for connection in idle:
+            connection.sendall(b"GET / HTTP/1.1\r\n")
+        started = time.monotonic()
+        errors = self.stop()
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual(self.server.returncode, 0)
+        self.assertNotIn("did not stop", errors)
+        for pid in ready["workers"]:
+            self.assertTrue(os.path.exists(os.path.join(self.directory, str(pid))))
+        for connection in idle:
+            connection.close()
+
+    def test_worker_that_exits_is_replaced(self):
+        self.start()
+        ready = self.wait_ready()
+        with self.assertRaises(Exception):
+            self.get(ready["port"], '/crash')
+        # The replacement forks from the loaded parent, answers follow at once
+        for _ in range(4):
+            self.assertEqual(self.get(ready["port"])["loaded_by"], self.server.pid)
+        # The parent checks on its workers every second
+        time.sleep(1.5)
+        self.assertIn("starting a new one", self.stop())
+
+    def test_worker_failing_to_start_stops_the_server(self):
+        self.start(FAIL_START="1")
+        self.assertEqual(self.server.wait(timeout=30), 1)
+        self.assertFalse(os.path.exists(self.ready_file))
+
+if __name__ == '__main__':
+    unittest.main()
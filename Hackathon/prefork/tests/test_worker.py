@@ -0,0 +1,46 @@
+import os
+import unittest
+from unittest import mock
+from prefork import worker_settings, service_app
+
+class TestWorkerSettings(unittest.TestCase):
+    def test_single_process(self):
+        """Test a service served alone keeps every transport and all the CPUs"""
+        with mock.patch.dict(os.environ, {"PREFORK_WORKERS": "0"}), mock.patch.object(os, 'cpu_count', return_value=8):
+            settings = worker_settings()
+        self.assertEqual(settings, (0, {}, 8))
+
+    def test_workers_split_cpus_and_take_websockets_only(self):
+        """Test pre-forked workers share the CPUs and only accept websocket clients"""
+        with mock.patch.dict(os.environ, {"PREFORK_WORKERS": "3"}), mock.patch.object(os, 'cpu_count', return_value=8):
+            settings = worker_settings()
+        self.assertEqual(settings.workers, 3)
+        self.assertEqual(settings.socket_options, {"transports": ["websocket"]})
+        self.assertEqual(settings.cpus, 2)
+        with mock.patch.dict(os.environ, {"PREFORK_WORKERS": "16"}), mock.patch.object(os, 'cpu_count', return_value=8):
+            self.assertEqual(worker_settings().cpus, 1)
+
+    def test_pools_sized_from_the_process_cpus(self):
+        """Test the inference threads split the process's CPUs and pools default to one instance per CPU"""
+        with mock.patch.dict(os.environ, {"PREFORK_WORKERS": "2"}), mock.patch.object(os, 'cpu_count', return_value=8):
+            settings = worker_settings()
+        self.assertEqual(settings.torch_threads(2), 2)
+        self.assertEqual(settings.torch_threads(8), 1)
+        with mock.patch.dict(os.environ, {"DETECTOR_POOL_SIZE": "0"}):
+            self.assertEqual(settings.pool_size('DETECTOR_POOL_SIZE'), 4)
+        with mock.patch.dict(os.environ, {"DETECTOR_POOL_SIZE": "3"}):
+            self.assertEqual(settings.pool_size('DETECTOR_POOL_SIZE'), 3)
+
+    def test_service_app(self):
+        """Test a pre-forked service's Socket.IO server only accepts websocket clients"""
+        with mock.patch.dict(os.environ, {"PREFORK_WORKERS": "2"}):
+            settings, sio, app = service_app(__name__)
+        self.assertEqual(settings.workers, 2)
+        self.assertEqual(sio.eio.transports, ["websocket"])
+        self.assertEqual(app.import_name, __name__)
+        with mock.patch.dict(os.environ, {"PREFORK_WORKERS": "0"}):
+            _, sio, _ = service_app(__name__)
+        self.assertIn("polling", sio.eio.transports)
+
+if __name__ == '__main__':
+    unittest.main()
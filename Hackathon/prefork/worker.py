@@ -0,0 +1,63 @@
+"""
+Settings of a service process, served alone or as a pre-fork worker
+"""
+import os
+import sys
+from collections import namedtuple
+import socketio
+from flask import Flask
+
+class WorkerSettings(namedtuple('WorkerSettings', ['workers', 'socket_options', 'cpus'])):
+    __slots__ = ()
+
+    def torch_threads(self, inference_threads):
+        """Torch threads of each of a process's inference threads, which split its CPUs"""
+        return max(1, self.cpus // inference_threads)
+
+    def pool_size(self, variable):
+        """Size of a per-process pool: the environment variable if set, else one per CPU of the process"""
+        return int(os.environ.get(variable, 0)) or self.cpus
+
+def worker_settings():
+    """
+    How the calling service process is served, read from PREFORK_WORKERS
+
+    Under the pre-fork server, torch (if the service has imported it) is
+    made single threaded: workers forked from a process with a torch thread
+    pool deadlock in it, so the parent loads and warms up on one thread and
+    each worker sizes its own pool from cpus.
+
+    Returns:
+        WorkerSettings:
+            workers (int): Worker processes, 0 when served by a single process
+            socket_options (dict): socketio.Server keyword arguments. Each
+                worker has its own sessions: with several, a client must stay
+                on one, which only websocket connections do (polling requests
+                are spread), so only the websocket transport is accepted
+            cpus (int): CPUs of this process, its share when pre-forked
+    """
+    workers = int(os.environ.get('PREFORK_WORKERS', 0))
+    if workers and 'torch' in sys.modules:
+        sys.modules['torch'].set_num_threads(1)
+    socket_options = {"transports": ["websocket"]} if workers > 1 else {}
+    cpus = max(1, (os.cpu_count() or 1) // (workers or 1))
+    return WorkerSettings(workers, socket_options, cpus)
+
+def service_app(import_name):
+    """
+    Socket.IO server and Flask app of a service
+
+    The service is served alone, or by the pre-fork server, which imports
+    its module and warms up the models before forking the workers.
+
+    Args:
+        import_name (str): The service module's __name__
+
+    Returns:
+        tuple: (WorkerSettings, socketio.Server, Flask app serving both)
+    """
+    settings = worker_settings()
+    sio = socketio.Server(cors_allowed_origins="*", **settings.socket_options)
+    app = Flask(import_name)
+    app.wsgi_app = socketio.WSGIApp(sio, app.wsgi_app)
+    return settings, sio, app